@@ -0,0 +1,201 @@
+# dashboard/benchmarks.py
+
+"""
+In-process benchmarks for the main API endpoints.
+
+Each scenario is requested through DRF's test client against the configured
+database, so the numbers include URL routing, authentication, serialization
+and every SQL query, but no network. Every request runs inside a transaction
+that is rolled back afterwards, so write scenarios such as order placement can
+be repeated without changing the data set.
+
+Results are compared against a stored JSON baseline. A scenario regresses when
+its p95 latency exceeds the baseline by more than the tolerance (and by more
+than a few milliseconds of noise), or when it issues more queries than the
+baseline did. Timings depend on the machine, so no baseline is kept in the
+repository: record one with `manage.py run_benchmarks --save-baseline` on the
+machine that will run the comparisons, after `manage.py
+generate_synthetic_data`. Comparing without a baseline is an error.
+"""
+
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Cart, CartItem
+from products.models import Product
+from users.models import User
+
+DEFAULT_TOLERANCE = 0.5  # Allowed p95 slowdown relative to the baseline
+NOISE_FLOOR_MS = 5  # Slowdowns smaller than this are timer and scheduler noise
+
+
+class BenchmarkSetupError(Exception):
+    """Raised when the database lacks the data a scenario needs."""
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    url: Callable
+    data: Optional[Callable] = None
+    prepare: Optional[Callable] = None
+    admin: bool = False
+    expected_status: int = 200
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    queries: int
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fill_cart(context):
+    cart, _ = Cart.objects.get_or_create(user=context['user'])
+    CartItem.objects.filter(cart=cart).delete()
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, quantity=1) for product in context['products']
+    ])
+
+
+def build_context():
+    """Pick the users and rows the scenarios run against."""
+    user = (
+        User.objects.filter(is_staff=False, orders__isnull=False, addresses__isnull=False)
+        .order_by('id').first()
+    )
+    admin = User.objects.filter(is_staff=True).order_by('id').first()
+    if user is None:
+        raise BenchmarkSetupError("No customer with orders and an address; run generate_synthetic_data first.")
+    products = list(Product.objects.filter(stock__gte=1000).order_by('id')[:3])
+    if not products:
+        raise BenchmarkSetupError("No products with enough stock; run generate_synthetic_data first.")
+    return {
+        'user': user,
+        'admin': admin,
+        'address': user.addresses.order_by('id').first(),
+        'products': products,
+    }
+
+
+SCENARIOS = [
+    Scenario('product-list', 'get', lambda c: reverse('product-list-create')),
+    Scenario(
+        'product-list-filtered', 'get',
+        lambda c: reverse('product-list-create') + f"?category={c['products'][0].category_id}&in_stock=true&max_price=500",
+    ),
+    Scenario('product-search', 'get', lambda c: reverse('product-search') + '?q=' + c['products'][0].name.split()[0][:4]),
+    Scenario('product-detail', 'get', lambda c: reverse('product-detail', args=[c['products'][0].id])),
+    Scenario('cart', 'get', lambda c: reverse('cart'), prepare=fill_cart),
+    Scenario(
+        'cart-item-add', 'post', lambda c: reverse('cart-item-add'),
+        data=lambda c: {'product': c['products'][0].id, 'quantity': 1}, expected_status=201,
+    ),
+    Scenario(
+        'order-place', 'post', lambda c: reverse('order-place'), prepare=fill_cart,
+        data=lambda c: {'payment_method': 'COD', 'address_id': c['address'].id}, expected_status=201,
+    ),
+    Scenario('order-list', 'get', lambda c: reverse('order-list')),
+    Scenario('prescription-list', 'get', lambda c: reverse('prescription-list')),
+    Scenario('notification-list', 'get', lambda c: reverse('notification-list')),
+    Scenario('dashboard', 'get', lambda c: reverse('dashboard_data')),
+    Scenario('admin-order-list', 'get', lambda c: reverse('admin-order-list'), admin=True),
+]
+
+
+def run_scenario(scenario, context, iterations, warmup=2):
+    client = APIClient()
+    user = context['admin'] if scenario.admin else context['user']
+    client.force_authenticate(user)
+    url = scenario.url(context)
+    data = scenario.data(context) if scenario.data else None
+
+    timings = []
+    queries = 0
+    for iteration in range(warmup + iterations):
+        with transaction.atomic():
+            if scenario.prepare:
+                scenario.prepare(context)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, scenario.method)(url, data, format='json')
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        if response.status_code != scenario.expected_status:
+            raise BenchmarkSetupError(
+                f"{scenario.name}: expected {scenario.expected_status}, got {response.status_code}: "
+                f"{getattr(response, 'data', b'')!r:.200}"
+            )
+        if iteration >= warmup:
+            timings.append(elapsed * 1000)
+            queries = max(queries, len(captured.captured_queries))
+
+    return Result(
+        name=scenario.name,
+        iterations=iterations,
+        p50_ms=round(statistics.median(timings), 2),
+        p95_ms=round(percentile(timings, 0.95), 2),
+        p99_ms=round(percentile(timings, 0.99), 2),
+        max_ms=round(max(timings), 2),
+        queries=queries,
+    )
+
+
+def run(iterations=20, names=None):
+    """Run the selected scenarios (all by default) and return their Results."""
+    context = build_context()
+    selected = [s for s in SCENARIOS if not names or s.name in names]
+    results = []
+    # The test client sends Host: testserver
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for scenario in selected:
+            if scenario.admin and context['admin'] is None:
+                continue
+            results.append(run_scenario(scenario, context, iterations))
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return a list of human-readable regressions against `baseline`."""
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        if result.queries > previous['queries']:
+            regressions.append(f"{result.name}: {result.queries} queries, baseline {previous['queries']}")
+        allowed = max(previous['p95_ms'] * (1 + tolerance), previous['p95_ms'] + NOISE_FLOOR_MS)
+        if result.p95_ms > allowed:
+            regressions.append(f"{result.name}: p95 {result.p95_ms}ms, baseline {previous['p95_ms']}ms")
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_baseline(results, path):
+    with open(path, 'w') as handle:
+        json.dump({result.name: asdict(result) for result in results}, handle, indent=2, sort_keys=True)
+        handle.write('\n')
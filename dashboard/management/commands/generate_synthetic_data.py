@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.synthetic import PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, products, carts, orders, prescriptions and notifications for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders-per-user', type=int, default=5)
+        parser.add_argument('--cart-items-per-user', type=int, default=3)
+        parser.add_argument('--prescriptions-per-user', type=int, default=1)
+        parser.add_argument('--notifications-per-user', type=int, default=5)
+        parser.add_argument('--days', type=int, default=90, help="Spread timestamps over this many days.")
+        parser.add_argument('--prefix', default='synth', help="Username prefix for generated users.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = generate(
+            users=options['users'],
+            products=options['products'],
+            orders_per_user=options['orders_per_user'],
+            cart_items_per_user=options['cart_items_per_user'],
+            prescriptions_per_user=options['prescriptions_per_user'],
+            notifications_per_user=options['notifications_per_user'],
+            days=options['days'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+        )
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary} in {time.perf_counter() - started:.1f}s. Users log in with password '{PASSWORD}'."
+        ))
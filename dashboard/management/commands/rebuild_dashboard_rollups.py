@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import rollups
+from dashboard.models import DailyRevenue, DashboardTotals, OrderStatusCount, ProductSales
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard rollup tables from orders and products."
+
+    def handle(self, *args, **options):
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups: {DashboardTotals.get_totals().total_products} products, "
+            f"{OrderStatusCount.objects.count()} statuses, {DailyRevenue.objects.count()} days, "
+            f"{ProductSales.objects.count()} products sold."
+        ))
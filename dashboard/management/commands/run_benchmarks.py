@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints in-process and compare against a stored baseline; "
+        "record one first with --save-baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--scenario', action='append', dest='scenarios', help="Run only this scenario (repeatable).")
+        parser.add_argument('--baseline', default='benchmarks/baseline.json', help="Baseline JSON file.")
+        parser.add_argument('--save-baseline', action='store_true', help="Write these results as the new baseline.")
+        parser.add_argument(
+            '--tolerance', type=float, default=benchmarks.DEFAULT_TOLERANCE,
+            help="Allowed p95 slowdown as a fraction of the baseline (0.5 = 50%%).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmarks.run(iterations=options['iterations'], names=options['scenarios'])
+        except benchmarks.BenchmarkSetupError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'scenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'queries':>9}")
+        for result in results:
+            self.stdout.write(
+                f"{result.name:<20}{result.p50_ms:>10}{result.p95_ms:>10}{result.p99_ms:>10}"
+                f"{result.max_ms:>10}{result.queries:>9}"
+            )
+
+        path = options['baseline']
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            benchmarks.save_baseline(results, path)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {path}"))
+            return
+
+        if not os.path.exists(path):
+            # Timings depend on the machine, so no baseline ships with the code
+            raise CommandError(
+                f"No baseline at {path}. Run with --save-baseline on this machine, against the "
+                f"generate_synthetic_data data set, to record one."
+            )
+
+        regressions = benchmarks.compare(results, benchmarks.load_baseline(path), options['tolerance'])
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0005_remove_product_attributes_productattribute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_orders', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DashboardTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_products', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50, unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units_sold', models.IntegerField(db_index=True, default=0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollup', to='products.product')),
+            ],
+        ),
+    ]
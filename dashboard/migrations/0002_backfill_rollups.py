@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    """Fill the rollup tables from existing orders, as dashboard.rollups.rebuild() does."""
+    Product = apps.get_model('products', 'Product')
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderStatus = apps.get_model('orders', 'OrderStatus')
+    DashboardTotals = apps.get_model('dashboard', 'DashboardTotals')
+    OrderStatusCount = apps.get_model('dashboard', 'OrderStatusCount')
+    DailyRevenue = apps.get_model('dashboard', 'DailyRevenue')
+    ProductSales = apps.get_model('dashboard', 'ProductSales')
+
+    DashboardTotals.objects.update_or_create(id=1, defaults={'total_products': Product.objects.count()})
+
+    OrderStatusCount.objects.all().delete()
+    OrderStatusCount.objects.bulk_create([
+        OrderStatusCount(status=row['status'], count=row['count'])
+        for row in OrderStatus.objects.values('status').annotate(count=Count('id'))
+    ])
+
+    DailyRevenue.objects.all().delete()
+    completed = Order.objects.filter(latest_status__status='Completed')
+    if timezone.is_aware(timezone.now()):
+        days = completed.annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+    else:
+        days = completed.annotate(date=TruncDate('created_at'))
+    DailyRevenue.objects.bulk_create([
+        DailyRevenue(date=row['date'], revenue=row['revenue'] or Decimal('0'), completed_orders=row['orders'])
+        for row in days.values('date').annotate(revenue=Sum('total_amount'), orders=Count('id'))
+    ])
+
+    ProductSales.objects.all().delete()
+    ProductSales.objects.bulk_create([
+        ProductSales(product_id=row['product'], units_sold=row['units'])
+        for row in OrderItem.objects.values('product').annotate(units=Sum('quantity'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('orders', '0007_alter_orderstatus_order_alter_orderstatus_status'),
+    ]
+
+    operations = [
+        # Existing deployments would otherwise show zeros until the rollups are rebuilt
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
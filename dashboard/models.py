@@ -1,3 +1,45 @@
 from django.db import models
+from products.models import Product
 
-# Create your models here.
+# Rollup tables read by dashboard_data. They are filled from existing orders by
+# migration 0002, maintained incrementally by the receivers in
+# dashboard/signals.py and can be rebuilt from scratch with
+# `manage.py rebuild_dashboard_rollups`.
+
+
+class DashboardTotals(models.Model):
+    total_products = models.IntegerField(default=0)
+
+    @classmethod
+    def get_totals(cls):
+        # Ensures only one record exists and fetches it
+        totals, created = cls.objects.get_or_create(id=1)
+        return totals
+
+    def __str__(self):
+        return f"Products: {self.total_products}"
+
+
+class DailyRevenue(models.Model):
+    date = models.DateField(unique=True)  # Date the order was placed
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_orders = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: ₹{self.revenue}"
+
+
+class OrderStatusCount(models.Model):
+    status = models.CharField(max_length=50, unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+
+class ProductSales(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='sales_rollup')
+    units_sold = models.IntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.units_sold}"
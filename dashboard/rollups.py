@@ -0,0 +1,104 @@
+# dashboard/rollups.py
+
+"""
+Incremental updates and full rebuilds of the dashboard rollup tables.
+
+Every update is a relative F() expression, so concurrent writers never lose
+each other's changes.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem, OrderStatus
+from products.models import Product
+from .models import DashboardTotals, DailyRevenue, OrderStatusCount, ProductSales
+
+
+def increment(model, lookup, **deltas):
+    """Add `deltas` to the row matching `lookup`, creating it if needed."""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**lookup).update(**changes)
+
+
+def order_date(order):
+    created_at = order.created_at
+    return timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+
+
+def change_status_count(status, delta):
+    if status:
+        increment(OrderStatusCount, {'status': status}, count=delta)
+
+
+def change_revenue(order, sign):
+    increment(
+        DailyRevenue, {'date': order_date(order)},
+        revenue=order.total_amount * sign, completed_orders=sign,
+    )
+
+
+def change_total_products(delta):
+    DashboardTotals.get_totals()
+    DashboardTotals.objects.filter(id=1).update(total_products=F('total_products') + delta)
+
+
+def add_units_sold(units_by_product):
+    """
+    Add sold units for many products at once: one insert for products seen
+    for the first time and one UPDATE for all of them.
+    """
+    units_by_product = {pk: units for pk, units in units_by_product.items() if units}
+    if not units_by_product:
+        return
+    ProductSales.objects.bulk_create(
+        [ProductSales(product_id=product_id) for product_id in units_by_product],
+        ignore_conflicts=True,
+    )
+    ProductSales.objects.filter(product_id__in=units_by_product).update(
+        units_sold=Case(
+            *[When(product_id=pk, then=F('units_sold') + units) for pk, units in units_by_product.items()],
+            default=F('units_sold'),
+            output_field=models.IntegerField(),
+        )
+    )
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every rollup table from the order and product tables."""
+    DashboardTotals.objects.update_or_create(id=1, defaults={'total_products': Product.objects.count()})
+
+    OrderStatusCount.objects.all().delete()
+    OrderStatusCount.objects.bulk_create([
+        OrderStatusCount(status=row['status'], count=row['count'])
+        for row in OrderStatus.objects.values('status').annotate(count=Count('id'))
+    ])
+
+    DailyRevenue.objects.all().delete()
+    completed = Order.objects.filter(latest_status__status='Completed')
+    if timezone.is_aware(timezone.now()):
+        days = completed.annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+    else:
+        days = completed.annotate(date=TruncDate('created_at'))
+    DailyRevenue.objects.bulk_create([
+        DailyRevenue(date=row['date'], revenue=row['revenue'] or Decimal('0'), completed_orders=row['orders'])
+        for row in days.values('date').annotate(revenue=Sum('total_amount'), orders=Count('id'))
+    ])
+
+    ProductSales.objects.all().delete()
+    ProductSales.objects.bulk_create([
+        ProductSales(product_id=row['product'], units_sold=row['units'])
+        for row in OrderItem.objects.values('product').annotate(units=Sum('quantity'))
+    ])
@@ -0,0 +1,103 @@
+# dashboard/signals.py
+
+"""
+Receivers that keep the dashboard rollup tables in step with orders,
+order statuses, order items and products. Connected in DashboardConfig.ready().
+"""
+
+from collections import Counter
+
+from orders.signals import order_items_created
+from products.signals import products_imported
+from . import rollups
+
+COMPLETED = 'Completed'
+
+
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._previous_status = None
+        return
+    instance._previous_status = (
+        sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+def order_status_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_status', None)
+    if previous == instance.status:
+        return
+    rollups.change_status_count(previous, -1)
+    rollups.change_status_count(instance.status, 1)
+    if previous == COMPLETED:
+        rollups.change_revenue(instance.order, -1)
+    if instance.status == COMPLETED:
+        rollups.change_revenue(instance.order, 1)
+    instance._previous_status = instance.status
+
+
+def order_status_deleted(sender, instance, **kwargs):
+    rollups.change_status_count(instance.status, -1)
+    if instance.status == COMPLETED:
+        rollups.change_revenue(instance.order, -1)
+
+
+def remember_previous_quantity(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._previous_sale = None
+        return
+    instance._previous_sale = (
+        sender.objects.filter(pk=instance.pk).values_list('product_id', 'quantity').first()
+    )
+
+
+def order_item_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    units = Counter({instance.product_id: instance.quantity})
+    previous = getattr(instance, '_previous_sale', None)
+    if previous:
+        units.subtract({previous[0]: previous[1]})
+    rollups.add_units_sold(units)
+    instance._previous_sale = (instance.product_id, instance.quantity)
+
+
+def order_item_deleted(sender, instance, **kwargs):
+    rollups.add_units_sold({instance.product_id: -instance.quantity})
+
+
+def order_items_bulk_created(sender, order, items, **kwargs):
+    units = Counter()
+    for item in items:
+        units[item.product_id] += item.quantity
+    rollups.add_units_sold(units)
+
+
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.change_total_products(1)
+
+
+def product_deleted(sender, instance, **kwargs):
+    rollups.change_total_products(-1)
+
+
+def products_bulk_created(sender, product_ids, created, **kwargs):
+    rollups.change_total_products(created)
+
+
+def connect():
+    from django.db.models.signals import post_delete, post_save, pre_save
+
+    pre_save.connect(remember_previous_status, sender='orders.OrderStatus', dispatch_uid='dashboard_status_pre_save')
+    post_save.connect(order_status_saved, sender='orders.OrderStatus', dispatch_uid='dashboard_status_saved')
+    post_delete.connect(order_status_deleted, sender='orders.OrderStatus', dispatch_uid='dashboard_status_deleted')
+    pre_save.connect(remember_previous_quantity, sender='orders.OrderItem', dispatch_uid='dashboard_item_pre_save')
+    post_save.connect(order_item_saved, sender='orders.OrderItem', dispatch_uid='dashboard_item_saved')
+    post_delete.connect(order_item_deleted, sender='orders.OrderItem', dispatch_uid='dashboard_item_deleted')
+    order_items_created.connect(order_items_bulk_created, dispatch_uid='dashboard_items_bulk_created')
+    post_save.connect(product_saved, sender='products.Product', dispatch_uid='dashboard_product_saved')
+    post_delete.connect(product_deleted, sender='products.Product', dispatch_uid='dashboard_product_deleted')
+    products_imported.connect(products_bulk_created, dispatch_uid='dashboard_products_imported')
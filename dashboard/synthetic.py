@@ -0,0 +1,194 @@
+# dashboard/synthetic.py
+
+"""
+Synthetic data for load testing and benchmarks.
+
+Everything is written with bulk_create in batches, so generating tens of
+thousands of rows takes seconds rather than minutes. bulk_create does not send
+post_save, so new products are announced with the products_imported signal
+and the dashboard rollups are rebuilt once at the end.
+"""
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import Notification
+from orders.models import Cart, CartItem, Order, OrderItem, OrderStatus, Payment
+from prescriptions.models import Prescription, PrescriptionItem
+from products.models import Brand, Category, Product, ProductAttribute
+from products.signals import products_imported
+from settings.models import OrderSettings
+from users.models import Address, User
+from . import rollups
+
+BATCH_SIZE = 1000
+PASSWORD = 'synthetic-pass'
+
+CATEGORIES = ['Medicines', 'Wellness', 'Personal Care', 'Baby Care', 'Devices', 'Ayurveda']
+BRANDS = ['Cipla', 'Sun Pharma', 'Himalaya', 'Dabur', 'Abbott', 'Mankind', 'Lupin', 'Zydus']
+FORMS = ['Tablet', 'Syrup', 'Capsule', 'Gel', 'Drops', 'Powder', 'Spray']
+NAMES = [
+    'Paracetamol', 'Ibuprofen', 'Cetirizine', 'Amoxicillin', 'Azithromycin', 'Pantoprazole',
+    'Metformin', 'Atorvastatin', 'Vitamin C', 'Vitamin D3', 'Calcium', 'Omega 3', 'Ashwagandha',
+    'Multivitamin', 'Cough Relief', 'Antacid', 'Zinc', 'Iron', 'Folic Acid', 'Probiotic',
+]
+SIZES = [('size', '10 tablets', '0.00'), ('size', '30 tablets', '40.00'), ('size', '100ml', '0.00'),
+         ('size', '200ml', '35.00'), ('pack', 'Pack of 2', '60.00')]
+CITIES = ['Mumbai', 'Pune', 'Delhi', 'Bengaluru', 'Chennai', 'Hyderabad', 'Kolkata']
+ORDER_STATUSES = ['Pending', 'Approved', 'On Route', 'Completed', 'Completed', 'Completed', 'Cancelled']
+PRESCRIPTION_STATUSES = ['Pending', 'Pending', 'Approved', 'Dispatched', 'Completed', 'Rejected']
+
+
+def spread(objects, field, days, rng, now):
+    """Spread auto_now_add timestamps over the last `days` days."""
+    for obj in objects:
+        setattr(obj, field, now - timedelta(seconds=rng.randrange(days * 86400)))
+
+
+@transaction.atomic
+def generate(users=100, products=500, orders_per_user=5, cart_items_per_user=3,
+             prescriptions_per_user=1, notifications_per_user=5, days=90, prefix='synth', seed=0):
+    """Create a realistic data set and return the number of rows created per model."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    start = User.objects.filter(username__startswith=f'{prefix}-').count()
+    counts = {}
+
+    order_settings = OrderSettings.get_order_settings()
+    if not order_settings.cod_enabled:
+        order_settings.cod_enabled = True
+        order_settings.save(update_fields=['cod_enabled'])
+
+    categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+    brands = [Brand.objects.get_or_create(name=name)[0] for name in BRANDS]
+
+    product_rows = Product.objects.bulk_create([
+        Product(
+            category=rng.choice(categories),
+            brand=rng.choice(brands),
+            name=f"{rng.choice(NAMES)} {rng.choice(FORMS)} {rng.randrange(50, 1000, 50)}mg",
+            description="Synthetic product for load testing.",
+            price=Decimal(rng.randrange(2000, 90000)) / 100,
+            stock=rng.randrange(50, 5000),
+        )
+        for _ in range(products)
+    ], batch_size=BATCH_SIZE)
+    attributes = ProductAttribute.objects.bulk_create([
+        ProductAttribute(product=product, name=name, value=value, additional_price=Decimal(extra))
+        for product in product_rows
+        for name, value, extra in rng.sample(SIZES, 2)
+    ], batch_size=BATCH_SIZE)
+    attributes_by_product = {}
+    for attribute in attributes:
+        attributes_by_product.setdefault(attribute.product_id, []).append(attribute)
+    products_imported.send(
+        sender=Product, product_ids=[product.id for product in product_rows], created=len(product_rows)
+    )
+    catalog = product_rows or list(Product.objects.all()[:products or 500])
+    counts['products'] = len(product_rows)
+
+    password = make_password(PASSWORD)
+    user_rows = User.objects.bulk_create([
+        User(
+            email=f'{prefix}-{index}@example.com', username=f'{prefix}-{index}', password=password,
+            name=f'Synthetic User {index}', phone_number=f'98{index:08d}'[:15],
+            wallet_balance=Decimal(rng.randrange(0, 500000)) / 100,
+        )
+        for index in range(start, start + users)
+    ], batch_size=BATCH_SIZE)
+    counts['users'] = len(user_rows)
+
+    addresses = Address.objects.bulk_create([
+        Address(
+            user=user, address_type='home', street_address=f'{rng.randrange(1, 400)} Main Road',
+            city=rng.choice(CITIES), state='Maharashtra', postal_code=f'4{rng.randrange(10000, 99999)}',
+            country='India',
+        )
+        for user in user_rows
+    ], batch_size=BATCH_SIZE)
+
+    if not catalog:
+        return counts
+
+    def pick_line():
+        product = rng.choice(catalog)
+        attribute = rng.choice(attributes_by_product.get(product.id, [None]))
+        return product, attribute, rng.randint(1, 4)
+
+    carts = Cart.objects.bulk_create([Cart(user=user) for user in user_rows], batch_size=BATCH_SIZE)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, selected_attribute=attribute, quantity=quantity)
+        for cart in carts
+        for product, attribute, quantity in (pick_line() for _ in range(cart_items_per_user))
+    ], batch_size=BATCH_SIZE)
+
+    order_lines = []
+    orders = []
+    for user, address in zip(user_rows, addresses):
+        for _ in range(orders_per_user):
+            lines = [pick_line() for _ in range(rng.randint(1, 4))]
+            total = sum(
+                ((product.price + (attribute.additional_price if attribute else 0)) * quantity
+                 for product, attribute, quantity in lines),
+                Decimal('0'),
+            )
+            orders.append(Order(user=user, delivery_address=address, total_amount=total))
+            order_lines.append(lines)
+    orders = Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+    spread(orders, 'created_at', days, rng, now)
+    Order.objects.bulk_update(orders, ['created_at'], batch_size=BATCH_SIZE)
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, selected_attribute=attribute, quantity=quantity, price=product.price)
+        for order, lines in zip(orders, order_lines)
+        for product, attribute, quantity in lines
+    ], batch_size=BATCH_SIZE)
+    OrderStatus.objects.bulk_create([
+        OrderStatus(order=order, status=rng.choice(ORDER_STATUSES)) for order in orders
+    ], batch_size=BATCH_SIZE)
+    Payment.objects.bulk_create([
+        Payment(
+            user_id=order.user_id, order=order, amount=order.total_amount,
+            payment_method=rng.choice(['COD', 'Wallet', 'Razorpay']),
+            payment_status=rng.choice(['Pending', 'Completed']),
+        )
+        for order in orders
+    ], batch_size=BATCH_SIZE)
+    counts['orders'] = len(orders)
+
+    prescriptions = Prescription.objects.bulk_create([
+        Prescription(
+            user=user, image='prescriptions/synthetic.jpg', status=rng.choice(PRESCRIPTION_STATUSES),
+            total_amount=Decimal(rng.randrange(10000, 300000)) / 100,
+        )
+        for user in user_rows
+        for _ in range(prescriptions_per_user)
+    ], batch_size=BATCH_SIZE)
+    spread(prescriptions, 'created_at', days, rng, now)
+    Prescription.objects.bulk_update(prescriptions, ['created_at'], batch_size=BATCH_SIZE)
+    PrescriptionItem.objects.bulk_create([
+        PrescriptionItem(prescription=prescription, product=rng.choice(catalog), quantity=rng.randint(1, 3))
+        for prescription in prescriptions
+        for _ in range(rng.randint(1, 3))
+    ], batch_size=BATCH_SIZE)
+    counts['prescriptions'] = len(prescriptions)
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user=user, title='Order Status Update', message='Your order status has been updated.',
+            is_read=rng.random() < 0.5,
+        )
+        for user in user_rows
+        for _ in range(notifications_per_user)
+    ], batch_size=BATCH_SIZE)
+    spread(notifications, 'created_at', days, rng, now)
+    Notification.objects.bulk_update(notifications, ['created_at'], batch_size=BATCH_SIZE)
+    counts['notifications'] = len(notifications)
+
+    rollups.rebuild()
+    return counts
@@ -1,3 +1,120 @@
+import importlib
+import os
+import shutil
+import tempfile
+from dataclasses import asdict
+from decimal import Decimal
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem, OrderStatus
+from products.models import Category, Product
+from users.models import User
+from . import benchmarks, synthetic
+from .models import DailyRevenue, DashboardTotals, OrderStatusCount, ProductSales
+
+
+class DashboardRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='rollup@example.com', username='rollup', password='pass',
+            name='Rollup', phone_number='9876543210',
+        )
+        category = Category.objects.create(name='Rollups')
+        cls.products = [
+            Product.objects.create(category=category, name=f'Rollup {index}', price=Decimal('10.00'), stock=50)
+            for index in range(2)
+        ]
+
+    def place(self, total, quantities):
+        order = Order.objects.create(user=self.user, total_amount=Decimal(total))
+        OrderStatus.objects.create(order=order, status='Pending')
+        for product, quantity in zip(self.products, quantities):
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        return order
+
+    def snapshot(self):
+        return (
+            DashboardTotals.get_totals().total_products,
+            dict(OrderStatusCount.objects.values_list('status', 'count')),
+            sorted(DailyRevenue.objects.values_list('revenue', 'completed_orders')),
+            dict(ProductSales.objects.values_list('product_id', 'units_sold')),
+        )
+
+    def test_rollups_follow_orders_and_match_a_rebuild(self):
+        first = self.place('30.00', [1, 2])
+        second = self.place('50.00', [4, 1])
+        OrderStatus.update_status(first, 'Completed')
+        OrderStatus.update_status(second, 'Completed')
+        OrderStatus.update_status(second, 'Cancelled')
+        item = second.items.get(product=self.products[0])
+        item.quantity = 3
+        item.save()
+
+        self.assertEqual(OrderStatusCount.objects.get(status='Completed').count, 1)
+        self.assertEqual(OrderStatusCount.objects.get(status='Pending').count, 0)
+        self.assertEqual(ProductSales.objects.get(product=self.products[0]).units_sold, 4)
+
+        client = APIClient()
+        with self.assertNumQueries(5):
+            response = client.get(reverse('dashboard_data'))
+        self.assertEqual(response.data['totalProducts'], 2)
+        self.assertEqual(response.data['newOrders'], 0)
+        self.assertEqual(response.data['totalRevenue'], Decimal('30.00'))
+        self.assertEqual(response.data['popularProducts'][0]['id'], self.products[0].id)
+
+        incremental = self.snapshot()
+        call_command('rebuild_dashboard_rollups', stdout=StringIO())
+        rebuilt = self.snapshot()
+        # The rebuild drops zero rows the incremental path leaves behind
+        incremental[1].pop('Pending')
+        self.assertEqual(incremental, rebuilt)
+
+    def test_migration_backfills_existing_orders(self):
+        order = self.place('30.00', [1, 2])
+        OrderStatus.update_status(order, 'Completed')
+        call_command('rebuild_dashboard_rollups', stdout=StringIO())
+        expected = self.snapshot()
+        for model in (DashboardTotals, OrderStatusCount, DailyRevenue, ProductSales):
+            model.objects.all().delete()
+
+        migration = importlib.import_module('dashboard.migrations.0002_backfill_rollups')
+        migration.backfill_rollups(apps, None)
+
+        self.assertEqual(self.snapshot(), expected)
+
+
+class SyntheticDataBenchmarkTests(TestCase):
+    def test_generated_data_supports_every_benchmark_scenario(self):
+        counts = synthetic.generate(users=3, products=5, orders_per_user=2, notifications_per_user=2)
+        self.assertEqual(counts['orders'], 6)
+        self.assertEqual(OrderStatusCount.objects.aggregate(total=Sum('count'))['total'], 6)
+
+        results = benchmarks.run(iterations=1)
+
+        by_name = {result.name: result for result in results}
+        self.assertIn('order-place', by_name)
+        self.assertEqual(by_name['order-list'].queries, 2)
+        baseline = {result.name: asdict(result) for result in results}
+        self.assertEqual(benchmarks.compare(results, baseline), [])
+        baseline['order-list']['queries'] = 1
+        self.assertEqual(len(benchmarks.compare(results, baseline)), 1)
+
+    def test_comparing_without_a_baseline_asks_for_one(self):
+        synthetic.generate(users=2, products=3, orders_per_user=1, notifications_per_user=1)
+        path = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        options = {'iterations': 1, 'scenarios': ['order-list'], 'baseline': path, 'stdout': StringIO()}
+
+        with self.assertRaisesMessage(CommandError, 'Run with --save-baseline'):
+            call_command('run_benchmarks', **options)
 
-# Create your tests here.
+        call_command('run_benchmarks', save_baseline=True, **options)
+        call_command('run_benchmarks', tolerance=100, **options)
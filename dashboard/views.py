@@ -1,24 +1,35 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from products.models import Product
-from orders.models import Order
 from products.serializers import ProductSerializer
 from django.db.models import Sum
+from .models import DashboardTotals, DailyRevenue, OrderStatusCount
+
+POPULAR_PRODUCTS = 5
+
 
 @api_view(['GET'])
 def dashboard_data(request):
-    total_products = Product.objects.count()
+    # Every figure comes from the rollup tables kept up to date by
+    # dashboard/signals.py, so the cost does not grow with order history.
+    total_products = DashboardTotals.get_totals().total_products
 
-    new_orders = Order.objects.filter(latest_status__status="Pending").count()
+    new_orders = OrderStatusCount.objects.filter(status="Pending").values_list('count', flat=True).first() or 0
 
-    total_revenue = Order.objects.filter(latest_status__status="Completed").aggregate(
-        Sum("total_amount")
-    )["total_amount__sum"] or 0
+    total_revenue = DailyRevenue.objects.aggregate(Sum("revenue"))["revenue__sum"] or 0
 
-    # Dynamically calculate popular products
-    popular_products = Product.objects.annotate(
-        total_sales=Sum('orderitem__quantity')
-    ).order_by('-total_sales')[:5]
+    popular_products = list(
+        Product.objects.filter(sales_rollup__units_sold__gt=0)
+        .prefetch_related('attributes')
+        .order_by('-sales_rollup__units_sold', 'id')[:POPULAR_PRODUCTS]
+    )
+    if len(popular_products) < min(POPULAR_PRODUCTS, total_products):
+        # Fewer products have sold than we show; pad with unsold ones
+        popular_products += list(
+            Product.objects.exclude(id__in=[product.id for product in popular_products])
+            .prefetch_related('attributes')
+            .order_by('id')[:POPULAR_PRODUCTS - len(popular_products)]
+        )
 
     serialized_popular_products = ProductSerializer(popular_products, many=True).data
 
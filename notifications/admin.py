@@ -1,9 +1,10 @@
 # notifications/admin.py
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Notification
-from .utils import send_push_notification
+from .models import Notification, PushNotificationOutbox
+from .utils import queue_push_notification
 
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'created_at', 'is_read', 'image_preview')
@@ -38,45 +39,49 @@ class NotificationAdmin(admin.ModelAdmin):
 
     send_notification.short_description = "Send selected in-app notifications"
 
-    # Action to send push notifications
+    # Action to queue push notifications for background delivery
     def send_push_notification(self, request, queryset):
-        notifications_sent = 0
-        failed_notifications = 0
+        notifications_queued = 0
 
         for notification in queryset:
-            try:
-                # Customize push notification details
-                title = notification.title
-                message = notification.message
-                image_url = request.build_absolute_uri(notification.image.url) if notification.image else None
-                launch_url = notification.launch_url
-
-                # Send push notification to all active devices
-                send_push_notification(title=title, message=message, image_url=image_url, launch_url=launch_url)
-                notifications_sent += 1
-            except Exception as e:
-                failed_notifications += 1
-                self.message_user(
-                    request, f"Failed to send push notification '{notification.title}': {str(e)}", level="error"
-                )
+            image_url = request.build_absolute_uri(notification.image.url) if notification.image else None
+            queue_push_notification(
+                title=notification.title,
+                message=notification.message,
+                image_url=image_url,
+                launch_url=notification.launch_url,
+            )
+            notifications_queued += 1
 
-        self.message_user(request, f"{notifications_sent} push notification(s) sent successfully.")
-        if failed_notifications:
-            self.message_user(request, f"{failed_notifications} push notification(s) failed.", level="error")
+        self.message_user(request, f"{notifications_queued} push notification(s) queued for delivery.")
 
     send_push_notification.short_description = "Send selected push notifications to all devices"
 
-    # Automatically send a push notification on save if it's a new notification
+    # Automatically queue a push notification on save if it's a new notification
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        
+
         if not change:  # Only send push notification on creation, not update
             image_url = request.build_absolute_uri(obj.image.url) if obj.image else None
-            launch_url = obj.launch_url
-            try:
-                send_push_notification(obj.title, obj.message, image_url=image_url, launch_url=launch_url)
-                self.message_user(request, f"Push notification '{obj.title}' sent successfully on creation.")
-            except Exception as e:
-                self.message_user(request, f"Failed to send push notification '{obj.title}': {str(e)}", level="error")
+            queue_push_notification(obj.title, obj.message, image_url=image_url, launch_url=obj.launch_url)
+            self.message_user(request, f"Push notification '{obj.title}' queued for delivery.")
 
 admin.site.register(Notification, NotificationAdmin)
+
+
+@admin.register(PushNotificationOutbox)
+class PushNotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('title', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('title', 'message')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_notifications']
+
+    # Action to put dead-lettered notifications back in the queue
+    def retry_notifications(self, request, queryset):
+        retried = queryset.filter(status='Failed').update(
+            status='Pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{retried} push notification(s) queued for retry.")
+
+    retry_notifications.short_description = "Retry selected failed push notifications"
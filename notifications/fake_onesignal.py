@@ -0,0 +1,70 @@
+# notifications/fake_onesignal.py
+
+"""
+A local stub of the OneSignal notifications endpoint.
+
+It accepts POSTs to /api/v1/notifications and records every payload, so the
+outbox worker can be exercised in tests and load tests without the network.
+Point ONESIGNAL_API_URL at `server.api_url`.
+"""
+
+import json
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOneSignalHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        status_code = self.server.status_code
+        if status_code < 300:
+            with self.server.lock:
+                self.server.received.append(payload)
+            body = {'id': str(uuid.uuid4()), 'recipients': 1}
+        else:
+            body = {'errors': ['Simulated failure']}
+
+        raw = json.dumps(body).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+class FakeOneSignalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, status_code=200, verbose=False):
+        super().__init__(address, FakeOneSignalHandler)
+        self.status_code = status_code
+        self.verbose = verbose
+        self.received = []
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def api_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1/notifications"
+
+
+def start_fake_onesignal(host='127.0.0.1', port=0, **options):
+    """Start a fake OneSignal endpoint on a background thread and return the server."""
+    server = FakeOneSignalServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
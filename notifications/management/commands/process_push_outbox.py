@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued push notifications from the outbox in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None, help="Parallel requests per batch.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument('--once', action='store_true', help="Exit once nothing is due instead of polling.")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_batch(batch_size=options['batch_size'], concurrency=options['concurrency'])
+            if any(result.values()):
+                self.stdout.write(
+                    f"sent={result['sent']} retried={result['retried']} failed={result['failed']}"
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from notifications.fake_onesignal import FakeOneSignalServer
+
+
+class Command(BaseCommand):
+    help = "Run a local stub of the OneSignal notifications endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument('--status-code', type=int, default=200, help="HTTP status returned for every request.")
+        parser.add_argument('--verbose', action='store_true', help="Log every request.")
+
+    def handle(self, *args, **options):
+        server = FakeOneSignalServer(
+            (options['host'], options['port']),
+            status_code=options['status_code'],
+            verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake OneSignal listening; set ONESIGNAL_API_URL to {server.api_url}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
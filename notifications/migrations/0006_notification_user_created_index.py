@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_remove_notification_image_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+        ),
+    ]
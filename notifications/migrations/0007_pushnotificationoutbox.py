@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notification_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushNotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('image_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('launch_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Sent', 'Sent'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='push_outbox_due_idx')],
+            },
+        ),
+    ]
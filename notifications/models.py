@@ -8,7 +8,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .utils import send_push_notification
+from django.utils import timezone
+from .utils import queue_push_notification
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,11 @@ class Notification(models.Model):
     image = models.ImageField(upload_to='notification_images/', null=True, blank=True)
     launch_url = models.URLField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
@@ -33,6 +39,40 @@ class Notification(models.Model):
             return f"{settings.MEDIA_URL}{self.image}"
         return None
 
+class PushNotificationOutbox(models.Model):
+    """
+    A push notification waiting to be delivered to OneSignal.
+
+    Rows are written inside the caller's transaction and delivered later by
+    `manage.py process_push_outbox`. A row that keeps failing is moved to
+    Failed (dead-lettered) after PUSH_OUTBOX_MAX_ATTEMPTS attempts.
+    """
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    image_url = models.URLField(max_length=500, null=True, blank=True)
+    launch_url = models.URLField(max_length=500, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='push_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.status}"
+
+
 @receiver(post_save, sender=Notification)
 def order_status_update_notification(sender, instance, created, **kwargs):
     if not created:
@@ -42,9 +82,5 @@ def order_status_update_notification(sender, instance, created, **kwargs):
         image_url = instance.image.url if instance.image else None
         launch_url = instance.launch_url
         
-        try:
-            # Send push notification when the order status updates
-            send_push_notification(title=title, message=message, image_url=image_url, launch_url=launch_url)
-            logger.info(f"Push notification '{title}' sent successfully.")
-        except Exception as e:
-            logger.error(f"Failed to send push notification: {str(e)}")
\ No newline at end of file
+        # Queue a push notification when the notification is updated
+        queue_push_notification(title=title, message=message, image_url=image_url, launch_url=launch_url)
\ No newline at end of file
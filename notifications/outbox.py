@@ -0,0 +1,113 @@
+# notifications/outbox.py
+
+"""
+Background delivery of queued push notifications.
+
+Workers claim due rows in batches, deliver them concurrently over the pooled
+OneSignal session and record the outcome of the whole batch with a single
+bulk update. A claimed row is leased by pushing its next_attempt_at into the
+future, so rows held by a worker that dies are picked up again once the lease
+runs out; rows are never lost.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PushNotificationOutbox
+from .utils import send_push_notification
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_CONCURRENCY = 8
+LEASE = timedelta(minutes=5)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 30s, 1m, 2m, ... capped at one hour."""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            PushNotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='Pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if entries:
+            PushNotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+                next_attempt_at=now + LEASE
+            )
+    return entries
+
+
+def deliver(entry):
+    """Send one entry. Returns (delivered, permanent_failure, error)."""
+    try:
+        response = send_push_notification(
+            title=entry.title,
+            message=entry.message,
+            image_url=entry.image_url,
+            launch_url=entry.launch_url,
+        )
+    except requests.RequestException as e:
+        return False, False, str(e)
+
+    if response.status_code < 300:
+        return True, False, ''
+    # Other 4xx responses mean OneSignal rejected the payload; retrying won't help.
+    permanent = 400 <= response.status_code < 500 and response.status_code != 429
+    return False, permanent, f"{response.status_code}: {response.text[:500]}"
+
+
+def process_batch(batch_size=None, max_attempts=None, concurrency=None):
+    """
+    Claim and deliver one batch of due notifications.
+
+    Returns a dict with the number of entries sent, rescheduled and failed.
+    """
+    batch_size = batch_size or getattr(settings, 'PUSH_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = max_attempts or getattr(settings, 'PUSH_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    concurrency = concurrency or getattr(settings, 'PUSH_OUTBOX_CONCURRENCY', DEFAULT_CONCURRENCY)
+
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+    entries = claim_batch(batch_size)
+    if not entries:
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(deliver, entries))
+
+    now = timezone.now()
+    for entry, (delivered, permanent, error) in zip(entries, outcomes):
+        entry.attempts += 1
+        if delivered:
+            entry.status = 'Sent'
+            entry.sent_at = now
+            entry.last_error = ''
+            result['sent'] += 1
+        elif permanent or entry.attempts >= max_attempts:
+            entry.status = 'Failed'
+            entry.last_error = error
+            result['failed'] += 1
+            logger.error(f"Push notification {entry.id} dead-lettered after {entry.attempts} attempt(s): {error}")
+        else:
+            entry.next_attempt_at = now + retry_delay(entry.attempts)
+            entry.last_error = error
+            result['retried'] += 1
+
+    PushNotificationOutbox.objects.bulk_update(
+        entries, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return result
@@ -0,0 +1,8 @@
+# notifications/pagination.py
+
+from settings.pagination import FeedCursorPagination
+
+
+class NotificationCursorPagination(FeedCursorPagination):
+    """Notifications by (created_at, id), newest first."""
+    ordering = ('-created_at', '-id')
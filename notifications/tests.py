@@ -1,3 +1,91 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderStatus
+from users.models import User
+from . import utils
+from .fake_onesignal import start_fake_onesignal
+from .models import Notification, PushNotificationOutbox
+from .outbox import process_batch
+
+
+class NotificationFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='feed@example.com', username='feed', password='pass',
+            name='Feed', phone_number='9876543210',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, count):
+        return [Notification.objects.create(user=self.user, title=f'N{index}', message='-') for index in range(count)]
+
+    def test_pages_are_stable_while_notifications_arrive(self):
+        notifications = self.notify(5)
+        # Two share a timestamp; the cursor's offset keeps them apart
+        Notification.objects.filter(pk=notifications[2].pk).update(created_at=notifications[3].created_at)
+        url = reverse('notification-list')
+
+        first = self.client.get(url, {'page_size': 2}).data
+        self.assertIsNone(first['previous'])
+        self.notify(1)  # Arrives between page loads
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+
+        seen = [row['id'] for page in (first, second, third) for row in page['results']]
+        self.assertEqual(sorted(seen), sorted(notification.pk for notification in notifications))
+        self.assertIsNone(third['next'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual([row['id'] for row in back['results']], [row['id'] for row in first['results']])
+
+
+class PushNotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.server = start_fake_onesignal()
+        # Cleanups run last first: close the pooled session, stop the server, close its socket
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        # Each test gets a fresh pooled session
+        utils.reset_session()
+        self.addCleanup(utils.reset_session)
+
+    def test_status_change_queues_one_notification(self):
+        user = User.objects.create_user(
+            email='outbox@example.com', username='outbox', password='pass',
+            name='Outbox', phone_number='9876543210',
+        )
+        order = Order.objects.create(user=user, total_amount=Decimal('10.00'))
+        OrderStatus.objects.create(order=order, status='Pending')
+
+        OrderStatus.update_status(order, 'Approved')
+
+        self.assertEqual(Notification.objects.filter(user=user).count(), 1)
+        self.assertEqual(PushNotificationOutbox.objects.filter(status='Pending').count(), 1)
+
+        with override_settings(ONESIGNAL_API_URL=self.server.api_url):
+            result = process_batch()
+
+        self.assertEqual(result, {'sent': 1, 'retried': 0, 'failed': 0})
+        self.assertEqual(PushNotificationOutbox.objects.get().status, 'Sent')
+        self.assertEqual(self.server.received[0]['headings'], {'en': 'Order Status Update'})
+
+    def test_failing_notification_is_retried_then_dead_lettered(self):
+        self.server.status_code = 503
+        entry = utils.queue_push_notification(title='Offer', message='Flat 10% off')
+
+        with override_settings(ONESIGNAL_API_URL=self.server.api_url, PUSH_OUTBOX_MAX_ATTEMPTS=2):
+            self.assertEqual(process_batch()['retried'], 1)
+            entry.refresh_from_db()
+            self.assertEqual(entry.attempts, 1)
+            self.assertEqual(entry.status, 'Pending')
+
+            PushNotificationOutbox.objects.update(next_attempt_at=entry.created_at)
+            self.assertEqual(process_batch()['failed'], 1)
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'Failed')
+        self.assertIn('503', entry.last_error)
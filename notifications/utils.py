@@ -1,14 +1,46 @@
 # notifications/utils.py
 
+import threading
+
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+ONESIGNAL_API_URL = "https://onesignal.com/api/v1/notifications"
+DEFAULT_TIMEOUT = (3.05, 10)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_onesignal_session():
+    """Return the process-wide keep-alive session used to talk to OneSignal."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                pool_size = getattr(settings, 'PUSH_OUTBOX_CONCURRENCY', 8)
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                session.headers.update({
+                    "Content-Type": "application/json; charset=utf-8",
+                    "Authorization": f"Basic {settings.ONESIGNAL_API_KEY}",
+                })
+                _session = session
+    return _session
+
+
+def reset_session():
+    """Close and drop the shared session so the next call builds a new one."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
 
-def send_push_notification(title, message, image_url=None, launch_url=None):
-    headers = {
-        "Content-Type": "application/json; charset=utf-8",
-        "Authorization": f"Basic {settings.ONESIGNAL_API_KEY}",
-    }
 
+def build_push_payload(title, message, image_url=None, launch_url=None):
     payload = {
         "app_id": settings.ONESIGNAL_APP_ID,
         "included_segments": ["All"],
@@ -23,9 +55,36 @@ def send_push_notification(title, message, image_url=None, launch_url=None):
     if launch_url:
         payload["url"] = launch_url
 
-    response = requests.post("https://onesignal.com/api/v1/notifications", json=payload, headers=headers)
-    
-    if response.status_code == 200:
-        print("Push notification sent successfully.")
-    else:
-        print(f"Failed to send push notification: {response.status_code}, {response.text}")
+    return payload
+
+
+def queue_push_notification(title, message, image_url=None, launch_url=None):
+    """
+    Queue a push notification for background delivery.
+
+    The outbox row is written in the caller's transaction, so a notification
+    is only delivered if the change that triggered it is committed, and the
+    request never waits on OneSignal.
+    """
+    from .models import PushNotificationOutbox
+
+    return PushNotificationOutbox.objects.create(
+        title=title,
+        message=message,
+        image_url=image_url,
+        launch_url=launch_url,
+    )
+
+
+def send_push_notification(title, message, image_url=None, launch_url=None):
+    """
+    Deliver a push notification to OneSignal right away and return the response.
+
+    Request handlers should use queue_push_notification instead; this is what
+    the outbox worker calls.
+    """
+    return get_onesignal_session().post(
+        getattr(settings, 'ONESIGNAL_API_URL', ONESIGNAL_API_URL),
+        json=build_push_payload(title, message, image_url=image_url, launch_url=launch_url),
+        timeout=getattr(settings, 'ONESIGNAL_TIMEOUT', DEFAULT_TIMEOUT),
+    )
@@ -5,13 +5,15 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response  # Import Response
 from .models import Notification
 from .serializers import NotificationSerializer
+from .pagination import NotificationCursorPagination
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user).order_by('-created_at', '-id')
 
 class MarkAsReadView(generics.UpdateAPIView):
     queryset = Notification.objects.all()
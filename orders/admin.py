@@ -1,21 +1,11 @@
 from django.contrib import admin
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-import qrcode
-import io
-from .models import Cart, CartItem, Order, OrderItem, OrderStatus, Payment
-from PIL import Image
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-import io
-import qrcode
-from PIL import Image
+from django.http import FileResponse
+from .models import Cart, CartItem, Order, OrderItem, OrderStatus, Payment, StockReservation
 from django.conf import settings
 import os
+import tempfile
+from .exports import OrderExporter
+from .slips import slip_data, write_slips_pdf, write_slips_zip
 
 # Inlined OrderItem model to display items in the Order admin
 class OrderItemInline(admin.TabularInline):
@@ -23,6 +13,9 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('product', 'quantity', 'price', 'get_selected_attribute')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'selected_attribute')
+
     # Custom method to display selected product attribute in the order item
     def get_selected_attribute(self, obj):
         if obj.selected_attribute:
@@ -44,138 +37,59 @@ class OrderStatusInline(admin.TabularInline):
     readonly_fields = ('updated_at',)
     fields = ('status', 'updated_at')  # Expose the status and updated_at field
 
-def generate_pdf_with_qrcode(order):
-    # Create a BytesIO buffer to hold the PDF data
-    buffer = io.BytesIO()
+def collect_slip_data(queryset):
+    # One prefetched pass over the selected orders, read in chunks as the slips are written
+    orders = Order.objects.with_details().filter(pk__in=queryset.values('pk')).order_by('id')
+    return (slip_data(order) for order in orders.iterator(chunk_size=500))
 
-    # Generate a QR code
-    qr_data = f"Order ID: {order.id}, User: {order.user.username}, Amount: {order.total_amount}"
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill='black', back_color='white')
-    
-    # Create a BytesIO buffer for the QR code image
-    qr_buffer = io.BytesIO()
-    
-    # Save the QR code image to the buffer
-    img.save(qr_buffer, format="PNG")  # Specify the image format explicitly
-    qr_buffer.seek(0)  # Move to the start of the BytesIO object
-    
-    # Create the PDF using ReportLab
-    pdf = canvas.Canvas(buffer)
-    pdf.drawString(100, 750, "Order Slip")
-    pdf.drawString(100, 730, f"Order ID: {order.id}")
-    pdf.drawString(100, 710, f"User: {order.user.username}")
-    pdf.drawString(100, 690, f"Total Amount: {order.total_amount}")
-    
-    # Insert the QR code into the PDF
-    pdf.drawInlineImage(qr_buffer, 100, 600, width=100, height=100)
 
-    # Close and save the PDF
-    pdf.showPage()
-    pdf.save()
+def slip_logo_path():
+    return os.path.join(settings.MEDIA_ROOT, 'logo_files', 'Medzy_BW.jpg')
+
 
-    # Return a response with the PDF
-    buffer.seek(0)
-    return HttpResponse(buffer, content_type='application/pdf')
-# Custom method to generate a PDF order slip
+def slip_workers():
+    return getattr(settings, 'ORDER_SLIP_WORKERS', min(4, os.cpu_count() or 1))
+
+
+# Custom action to print the slips of all selected orders as one PDF
 def print_order_slip(modeladmin, request, queryset):
-    for order in queryset:
-        # Create a PDF in memory
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Set a font
-        p.setFont("Helvetica", 10)
-
-        # Create the section boxes and lines
-
-        # Sender's Address (From Section)
-        p.drawString(50, 730, "From:")
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(50, 715, "Near Airport")
-        p.drawString(50, 700, "Shivaji Terminal")
-        p.drawString(50, 685, "Air Strip Number 32")
-        p.drawString(50, 670, "Mumbai - 400001, India")
-
-        # Logo on the right side
-        p.setFont("Helvetica", 10)
-        logo_path = f"{settings.MEDIA_ROOT}/logo_files/Medzy_BW.jpg"
-        try:
-            p.drawImage(logo_path, 400, 680, width=1.5 * inch, height=1.5 * inch, preserveAspectRatio=True)
-        except Exception as e:
-            p.drawString(400, 720, "Logo not found")
-        
-        # Customer Information (To Section)
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(50, 640, "To:")
-        p.setFont("Helvetica", 10)
-        p.drawString(50, 625, f"{order.user.name}")
-        p.drawString(50, 610, f"{order.delivery_address.street_address}")
-        p.drawString(50, 595, f"{order.delivery_address.city}, {order.delivery_address.postal_code}")
-        p.drawString(50, 580, f"{order.user.phone_number}")
-
-        # QR Code (On the right side of To)
-        qr_data = f"Order ID: {order.id}, Total Amount: ₹{order.total_amount}, Customer: {order.user.username}"
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        img = qr.make_image(fill='black', back_color='white')
-
-        # Convert the PIL image to an ImageReader object for ReportLab
-        qr_buffer = io.BytesIO()
-        img.save(qr_buffer, format="PNG")
-        qr_buffer.seek(0)
-        qr_img = ImageReader(qr_buffer)
-        p.drawImage(qr_img, 400, 580, width=100, height=100)
-
-        # Draw Border between sections
-        p.line(50, 570, width - 50, 570)  # Separator line
-
-        # Ordered Items Section (Full Width)
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(50, 555, "Ordered Items:")
-        y_position = 540
-        for item in order.items.all():
-            item_details = f"{item.quantity}x {item.product.name} ({item.selected_attribute.value if item.selected_attribute else 'No Attribute'})"
-            p.drawString(50, y_position, item_details)
-            y_position -= 15
-        
-        # Draw border around Ordered Items Section
-        p.line(50, 570, 50, y_position)  # Left line
-        p.line(width - 50, 570, width - 50, y_position)  # Right line
-        p.line(50, y_position, width - 50, y_position)  # Bottom line
-        
-        # Order Summary Section (Full Width)
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(50, y_position - 20, "Order Summary:")
-        p.setFont("Helvetica", 10)
-        p.drawString(50, y_position - 35, f"Order ID: {order.id}")
-        p.drawString(50, y_position - 50, f"Total Amount: ₹{order.total_amount}")
-        p.drawString(50, y_position - 65, f"Payment Method: {order.payment.payment_method}")
-        
-        # Draw border around the Order Summary
-        p.line(50, y_position - 20, width - 50, y_position - 20)  # Top line
-        p.line(50, y_position - 85, width - 50, y_position - 85)  # Bottom line
-        p.line(50, y_position - 20, 50, y_position - 85)  # Left line
-        p.line(width - 50, y_position - 20, width - 50, y_position - 85)  # Right line
-
-        # Finalize and save the PDF
-        p.showPage()
-        p.save()
-        
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="Order_{order.id}_Slip.pdf"'
-        return response
+    output = tempfile.TemporaryFile()
+    write_slips_pdf(collect_slip_data(queryset), output, slip_logo_path(), workers=slip_workers())
+    output.seek(0)
+    first_ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:2])
+    filename = f"Order_{first_ids[0]}_Slip.pdf" if len(first_ids) == 1 else "Order_Slips.pdf"
+    return FileResponse(output, as_attachment=True, filename=filename, content_type='application/pdf')
 
 
 print_order_slip.short_description = "Print Order Slip"
 
 
+# Custom action to download one PDF slip per selected order in a zip
+def download_order_slips_zip(modeladmin, request, queryset):
+    output = tempfile.TemporaryFile()
+    write_slips_zip(collect_slip_data(queryset), output, slip_logo_path(), workers=slip_workers())
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename="Order_Slips.zip", content_type='application/zip')
+
+
+download_order_slips_zip.short_description = "Download Order Slips (zip)"
+
+
+# Custom actions streaming the selected orders with their items and payments
+def export_orders_csv(modeladmin, request, queryset):
+    return OrderExporter(queryset).response('csv', 'orders')
+
+
+export_orders_csv.short_description = "Export selected orders as CSV"
+
+
+def export_orders_ndjson(modeladmin, request, queryset):
+    return OrderExporter(queryset).response('ndjson', 'orders')
+
+
+export_orders_ndjson.short_description = "Export selected orders as NDJSON"
+
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -191,36 +105,45 @@ class OrderAdmin(admin.ModelAdmin):
     )
     search_fields = ('user__username', 'user__email')
     ordering = ('-created_at',)
-    list_filter = ('created_at',)
+    list_filter = ('created_at', 'latest_status__status', 'payment__payment_method', 'payment__payment_status')
     
-    actions = [print_order_slip]  # Add the custom action
+    actions = [print_order_slip, download_order_slips_zip, export_orders_csv, export_orders_ndjson]  # Add the custom actions
+
+    # Payment and status are joined in get_queryset, so the columns below
+    # read them from the row instead of querying per order.
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'payment', 'latest_status')
 
     # Display the latest order status
     def get_current_status(self, obj):
-        return obj.latest_status.status if hasattr(obj, 'latest_status') and obj.latest_status else 'No Status'
-        get_current_status.short_description = 'Status'
+        latest_status = getattr(obj, 'latest_status', None)
+        return latest_status.status if latest_status else 'No Status'
+    get_current_status.short_description = 'Status'
+    get_current_status.admin_order_field = 'latest_status__status'
 
     # Custom method to display payment method
     def get_payment_method(self, obj):
-        payment = Payment.objects.filter(order=obj).first()
+        payment = getattr(obj, 'payment', None)
         return payment.payment_method if payment else 'N/A'
     get_payment_method.short_description = 'Payment Method'
+    get_payment_method.admin_order_field = 'payment__payment_method'
 
     # Custom method to display payment status
     def get_payment_status(self, obj):
-        payment = Payment.objects.filter(order=obj).first()
+        payment = getattr(obj, 'payment', None)
         return payment.payment_status if payment else 'N/A'
     get_payment_status.short_description = 'Payment Status'
+    get_payment_status.admin_order_field = 'payment__payment_status'
 
     # Custom method to display payment ID
     def get_payment_id(self, obj):
-        payment = Payment.objects.filter(order=obj).first()
+        payment = getattr(obj, 'payment', None)
         return payment.payment_id if payment else 'N/A'
     get_payment_id.short_description = 'Payment ID'
 
     # Custom method to show ordered items
     def get_ordered_items(self, obj):
-        items = obj.items.all()
+        items = obj.items.select_related('product', 'selected_attribute')
         return ', '.join([f'{item.quantity}x {item.product.name} ({item.selected_attribute.value if item.selected_attribute else "No Attribute"})' for item in items])
     get_ordered_items.short_description = 'Ordered Items'
 
@@ -294,3 +217,13 @@ class PaymentAdmin(admin.ModelAdmin):
             'fields': ('payment_status', 'payment_id', 'created_at'),
         }),
     )
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'product', 'quantity', 'status', 'expires_at', 'created_at', 'released_at')
+    search_fields = ('product__name', 'order__id')
+    list_filter = ('status',)
+    ordering = ('-created_at',)
+    list_select_related = ('order', 'order__user', 'product')
+    readonly_fields = ('order', 'product', 'quantity', 'status', 'expires_at', 'created_at', 'released_at')
@@ -0,0 +1,76 @@
+# orders/exports.py
+
+"""
+Streaming order exports; see settings/exports.py for the mechanics.
+
+NDJSON has one order per line with its items, payment, status and delivery
+address nested. CSV has one row per order item, repeating the order columns,
+and a single row with empty item columns for an order without items.
+"""
+
+from settings.exports import Exporter
+
+ORDER_COLUMNS = (
+    'Order ID', 'Created At', 'User ID', 'User Name', 'User Email', 'Status', 'Total Amount',
+    'Payment Method', 'Payment Status', 'Payment ID', 'Payment Amount',
+    'Street Address', 'City', 'State', 'Postal Code', 'Country',
+)
+ITEM_COLUMNS = ('Item ID', 'Product ID', 'Product', 'Attribute', 'Quantity', 'Price')
+ADDRESS_FIELDS = ('street_address', 'city', 'state', 'postal_code', 'country')
+
+
+class OrderExporter(Exporter):
+    header = ORDER_COLUMNS + ITEM_COLUMNS
+
+    def prepare(self, queryset):
+        return queryset.with_details().order_by('id')
+
+    def record(self, order):
+        payment = getattr(order, 'payment', None)
+        latest_status = getattr(order, 'latest_status', None)
+        address = order.delivery_address
+        return {
+            'id': order.id,
+            'created_at': order.created_at,
+            'user': {'id': order.user.id, 'name': order.user.name, 'email': order.user.email},
+            'status': latest_status.status if latest_status else None,
+            'total_amount': order.total_amount,
+            'payment': {
+                'method': payment.payment_method,
+                'status': payment.payment_status,
+                'payment_id': payment.payment_id,
+                'amount': payment.amount,
+            } if payment else None,
+            'delivery_address': {field: getattr(address, field) for field in ADDRESS_FIELDS} if address else None,
+            'items': [
+                {
+                    'id': item.id,
+                    'product_id': item.product_id,
+                    'product': item.product.name,
+                    'attribute': (
+                        f"{item.selected_attribute.name}: {item.selected_attribute.value}"
+                        if item.selected_attribute else None
+                    ),
+                    'quantity': item.quantity,
+                    'price': item.price,
+                }
+                for item in order.items.all()
+            ],
+        }
+
+    def rows(self, record):
+        payment = record['payment'] or {}
+        address = record['delivery_address'] or {}
+        order_row = (
+            record['id'], record['created_at'].isoformat(), record['user']['id'], record['user']['name'] or '',
+            record['user']['email'] or '', record['status'] or '', record['total_amount'],
+            payment.get('method', ''), payment.get('status', ''), payment.get('payment_id') or '',
+            payment.get('amount', ''),
+            *(address.get(field) or '' for field in ADDRESS_FIELDS),
+        )
+        if not record['items']:
+            yield order_row + ('',) * len(ITEM_COLUMNS)
+        for item in record['items']:
+            yield order_row + (
+                item['id'], item['product_id'], item['product'], item['attribute'] or '', item['quantity'], item['price'],
+            )
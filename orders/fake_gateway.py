@@ -0,0 +1,122 @@
+# orders/fake_gateway.py
+
+"""
+A local stand-in for the Razorpay orders API.
+
+It implements just enough of the API for checkout to run without the network:
+POST /v1/orders and GET /v1/orders/<id>. Point RAZORPAY_BASE_URL at it and
+start it with `manage.py run_fake_razorpay`, or start it in-process from a
+test or load-test script with `start_fake_gateway()`.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeRazorpayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status_code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate_gateway(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self.send_json(503, {'error': {'code': 'SERVER_ERROR', 'description': 'Simulated failure'}})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        if self.path.rstrip('/') != '/v1/orders':
+            self.send_json(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+            return
+        if not self.simulate_gateway():
+            return
+
+        try:
+            data = json.loads(raw_body or b'{}')
+            amount = int(data['amount'])
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'amount is required'}})
+            return
+        if amount < 100:
+            self.send_json(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Order amount less than minimum amount allowed'}})
+            return
+
+        order = {
+            'id': f"order_{uuid.uuid4().hex[:14]}",
+            'entity': 'order',
+            'amount': amount,
+            'amount_paid': 0,
+            'amount_due': amount,
+            'currency': data.get('currency', 'INR'),
+            'receipt': data.get('receipt'),
+            'notes': data.get('notes', []),
+            'status': 'created',
+            'attempts': 0,
+            'created_at': int(time.time()),
+        }
+        with self.server.lock:
+            self.server.orders[order['id']] = order
+        self.send_json(200, order)
+
+    def do_GET(self):
+        prefix = '/v1/orders/'
+        if not self.path.startswith(prefix):
+            self.send_json(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Not found'}})
+            return
+        if not self.simulate_gateway():
+            return
+        with self.server.lock:
+            order = self.server.orders.get(self.path[len(prefix):].rstrip('/'))
+        if order is None:
+            self.send_json(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}})
+        else:
+            self.send_json(200, order)
+
+
+class FakeRazorpayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0, verbose=False):
+        super().__init__(address, FakeRazorpayHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.verbose = verbose
+        self.orders = {}
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients that hit their timeout close the socket mid-response.
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_fake_gateway(host='127.0.0.1', port=0, **options):
+    """Start a fake gateway on a background thread and return the server."""
+    server = FakeRazorpayServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,147 @@
+# orders/gateway.py
+
+"""
+Shared Razorpay gateway client.
+
+Every view that talks to Razorpay goes through this module instead of building
+its own razorpay.Client. The client is created once per process and reuses a
+pooled keep-alive requests session, so checkout does not pay for a new TLS
+handshake on every order. Each call has a connect/read timeout, and failures
+that are safe to repeat are retried with exponential backoff.
+
+Settings (all optional):
+    RAZORPAY_BASE_URL       Override the API host, e.g. to point at the fake
+                            server started by `manage.py run_fake_razorpay`.
+    RAZORPAY_TIMEOUT        (connect, read) timeout in seconds.
+    RAZORPAY_MAX_RETRIES    Retries for connection errors and retryable
+                            responses.
+    RAZORPAY_POOL_SIZE      Keep-alive connections held per process.
+"""
+
+import logging
+import threading
+from decimal import Decimal
+
+import razorpay
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from razorpay.constants.url import URL
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_POOL_SIZE = 10
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class GatewayUnavailable(Exception):
+    """Raised when Razorpay cannot be reached, does not answer in time or fails with a server error."""
+
+
+class GatewayRejected(Exception):
+    """Raised when Razorpay refuses a request as invalid, e.g. an amount below its minimum."""
+
+
+class GatewaySession(requests.Session):
+    """A requests session that applies a default timeout to every request."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session():
+    timeout = getattr(settings, 'RAZORPAY_TIMEOUT', DEFAULT_TIMEOUT)
+    max_retries = getattr(settings, 'RAZORPAY_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+    pool_size = getattr(settings, 'RAZORPAY_POOL_SIZE', DEFAULT_POOL_SIZE)
+
+    # Connection failures happen before the request is sent and are always
+    # retried. Read errors and 5xx/429 responses are only retried for
+    # idempotent methods, so a slow order creation is never submitted twice.
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+    session = GatewaySession(timeout)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_client():
+    """Return the process-wide Razorpay client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = razorpay.Client(
+                    session=build_session(),
+                    auth=(settings.RAZORPAY_API_KEY, settings.RAZORPAY_API_SECRET),
+                    base_url=getattr(settings, 'RAZORPAY_BASE_URL', URL.BASE_URL),
+                )
+    return _client
+
+
+def reset_client():
+    """Drop the shared client so the next call picks up changed settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
+
+
+def to_paise(amount):
+    """Convert a rupee amount (Decimal, str or float) to integer paise."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1')))
+
+
+def create_order(amount, currency='INR', receipt=None, notes=None):
+    """
+    Create a Razorpay order for `amount` rupees and return the order dict.
+
+    Raises GatewayRejected for requests Razorpay rejects and
+    GatewayUnavailable when the gateway cannot be reached in time or answers
+    with a server or gateway error.
+    """
+    data = {
+        'amount': to_paise(amount),
+        'currency': currency,
+        'payment_capture': 1,
+    }
+    if receipt:
+        data['receipt'] = str(receipt)
+    if notes:
+        data['notes'] = notes
+
+    try:
+        return get_client().order.create(data)
+    except razorpay.errors.BadRequestError as e:
+        raise GatewayRejected(str(e)) from e
+    except (requests.RequestException, razorpay.errors.ServerError, razorpay.errors.GatewayError) as e:
+        logger.error(f"Razorpay order creation failed: {e}")
+        raise GatewayUnavailable(str(e)) from e
+
+
+# Async variants for ASGI deployments. The pooled session is shared with the
+# sync API; calls run on a worker thread so the event loop is never blocked.
+acreate_order = sync_to_async(create_order, thread_sensitive=False)
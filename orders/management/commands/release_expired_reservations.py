@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = "Return the stock of expired reservation holds (unpaid online orders) in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=30.0, help="Seconds to sleep when nothing has expired.")
+        parser.add_argument('--once', action='store_true', help="Exit once nothing has expired instead of polling.")
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired(batch_size=options['batch_size'])
+            if released:
+                self.stdout.write(f"released={released}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
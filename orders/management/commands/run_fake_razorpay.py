@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from orders.fake_gateway import FakeRazorpayServer
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Razorpay orders API for load-testing checkout without the network."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=int, default=0, help="Delay added to every response.")
+        parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests answered with a 503.")
+        parser.add_argument('--verbose', action='store_true', help="Log every request.")
+
+    def handle(self, *args, **options):
+        server = FakeRazorpayServer(
+            (options['host'], options['port']),
+            latency=options['latency_ms'] / 1000,
+            failure_rate=options['failure_rate'],
+            verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Razorpay listening on {server.base_url}; set RAZORPAY_BASE_URL to this address."
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
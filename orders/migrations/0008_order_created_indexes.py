@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_alter_orderstatus_order_alter_orderstatus_status'),
+        ('users', '0007_wallettransaction_user_timestamp_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ),
+    ]
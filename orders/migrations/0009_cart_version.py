@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_cart_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderstatus',
+            index=models.Index(fields=['status'], name='orderstatus_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_method'], name='payment_method_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_status'], name='payment_status_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_admin_filter_indexes'),
+        ('products', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('Held', 'Held'), ('Committed', 'Committed'), ('Released', 'Released')], default='Held', max_length=10)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='reservation_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Completed', 'Completed'), ('Failed', 'Failed'), ('Refund Pending', 'Refund Pending')], default='Pending', max_length=20),
+        ),
+    ]
@@ -8,7 +8,7 @@ from coupons.models import Coupon
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from notifications.models import Notification
-from notifications.utils import send_push_notification
+from notifications.utils import queue_push_notification
 import logging
 
 
@@ -19,10 +19,16 @@ User = get_user_model()
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0)  # Bumped on every change to the cart's items
 
     def __str__(self):
         return f"Cart - {self.user.username}"
 
+    @staticmethod
+    def bump_version(cart_id):
+        """Mark the cart's items as changed so cached pricing is recomputed."""
+        Cart.objects.filter(pk=cart_id).update(version=models.F('version') + 1)
+
 # orders/models.py
 
 class CartItem(models.Model):
@@ -35,12 +41,37 @@ class CartItem(models.Model):
     def __str__(self):
         return f"{self.quantity} of {self.product.name} in {self.cart.user.username}'s cart"
 
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Load everything OrderSerializer renders in a fixed number of queries:
+        one joined query for orders, user, address, payment and status, plus
+        one prefetch for items with their product and selected attribute.
+        """
+        return self.select_related(
+            'user', 'delivery_address', 'payment', 'latest_status'
+        ).prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=OrderItem.objects.select_related('product', 'selected_attribute'),
+            )
+        )
+
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     delivery_address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.user.username}"
 
@@ -56,6 +87,37 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+class StockReservation(models.Model):
+    """
+    Stock taken from a product for an order; see orders/reservations.py.
+
+    Held reservations belong to orders awaiting online payment and are
+    returned to stock by `manage.py release_expired_reservations` once
+    expires_at passes. Committed stock is sold; Released stock was returned.
+    """
+    STATUS_CHOICES = [
+        ('Held', 'Held'),
+        ('Committed', 'Committed'),
+        ('Released', 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Held')
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id} - {self.status}"
+
+
 class OrderStatus(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -68,6 +130,11 @@ class OrderStatus(models.Model):
     status = models.CharField(max_length=50, choices=STATUS_CHOICES)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='orderstatus_status_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.order.id} - {self.status}"
 
@@ -83,22 +150,34 @@ class OrderStatus(models.Model):
 
 @receiver(post_save, sender='orders.OrderStatus')
 def send_order_status_update_notification(sender, instance, created, **kwargs):
+        # This is the single place a status change notifies the user; views
+        # that change a status rely on it instead of notifying themselves.
         if not created:  # only for updates
             user = instance.order.user
-            title = "Order Status Update"
-            message = f"Your order #{instance.order.id} status has been updated to {instance.status}."
-            
+            if instance.status == 'Cancelled':
+                title = "Order Cancelled"
+                message = f"Your order #{instance.order.id} has been cancelled."
+            else:
+                title = "Order Status Update"
+                message = f"Your order #{instance.order.id} status has been updated to {instance.status}."
 
             # Create in-app notification
             Notification.objects.create(
                 user=user,
                 title=title,
                 message=message,
-                
             )
-            
-            # Send push notification
-            send_push_notification(title=title, message=message)
+
+            # Queue push notification; the outbox worker delivers it
+            queue_push_notification(title=title, message=message)
+
+
+@receiver(post_save, sender='orders.OrderStatus')
+def release_stock_of_cancelled_order(sender, instance, **kwargs):
+    # Covers both customer cancellations and admin status changes
+    if instance.status == 'Cancelled':
+        from .reservations import release_order
+        release_order(instance.order)
 class Payment(models.Model):
     PAYMENT_METHODS = [
         ('COD', 'Cash on Delivery'),
@@ -110,6 +189,7 @@ class Payment(models.Model):
         ('Pending', 'Pending'),
         ('Completed', 'Completed'),
         ('Failed', 'Failed'),
+        ('Refund Pending', 'Refund Pending'),  # Paid, but the order could not be fulfilled
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
@@ -120,5 +200,11 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_method'], name='payment_method_idx'),
+            models.Index(fields=['payment_status'], name='payment_status_idx'),
+        ]
+
     def __str__(self):
         return f"Payment for Order {self.order.id} - {self.payment_status}"
\ No newline at end of file
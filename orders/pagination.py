@@ -0,0 +1,8 @@
+# orders/pagination.py
+
+from settings.pagination import FeedCursorPagination
+
+
+class OrderCursorPagination(FeedCursorPagination):
+    """Orders by (created_at, id), newest first."""
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,102 @@
+# orders/pricing.py
+
+"""
+Cart pricing shared by checkout and the coupon preview.
+
+A cart is priced from a single query. The database computes each line's unit
+price (product price plus the selected attribute's additional price) and the
+line total, and the lines are summed in exact Decimal arithmetic. The result
+is cached under the cart's version, which every cart mutation bumps, and the
+catalog version (settings/catalog.py), which every product and attribute
+change bumps, so repeated previews of an unchanged cart do not touch the cart
+tables at all and a price change is picked up at once.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce
+
+from settings import catalog
+from .models import CartItem
+
+CENT = Decimal('0.01')
+CACHE_TIMEOUT = 60 * 15
+
+money_field = DecimalField(max_digits=12, decimal_places=2)
+
+
+@dataclass(frozen=True)
+class CartLine:
+    item_id: int
+    product_id: int
+    product_name: str
+    product_price: Decimal
+    selected_attribute_id: int
+    quantity: int
+    unit_price: Decimal
+    line_total: Decimal
+
+
+@dataclass(frozen=True)
+class CartPricing:
+    lines: tuple
+    subtotal: Decimal
+
+    def apply_coupon(self, coupon):
+        """Return (discount, total) for this cart with `coupon` applied."""
+        discount = coupon_discount(coupon, self.subtotal)
+        return discount, self.subtotal - discount
+
+
+def coupon_discount(coupon, subtotal):
+    """
+    Return the discount `coupon` gives on `subtotal`, rounded to paise and
+    never more than the subtotal. Validity is the caller's responsibility.
+    """
+    if coupon.discount_type == 'percentage':
+        discount = (subtotal * coupon.discount_amount / 100).quantize(CENT)
+    elif coupon.discount_type == 'flat':
+        discount = coupon.discount_amount
+    else:
+        raise ValueError("Invalid discount type.")
+    return min(discount, subtotal)
+
+
+def cache_key(cart):
+    return f"cart-pricing:{cart.pk}:{cart.version}:{catalog.current_version()}"
+
+
+def price_cart(cart, use_cache=True):
+    """
+    Price every line of `cart` and return a CartPricing.
+
+    Checkout passes use_cache=False so it prices exactly the rows it has locked.
+    """
+    key = cache_key(cart)
+    if use_cache:
+        pricing = cache.get(key)
+        if pricing is not None:
+            return pricing
+
+    unit_price = ExpressionWrapper(
+        F('product__price') + Coalesce(F('selected_attribute__additional_price'), Value(Decimal('0'))),
+        output_field=money_field,
+    )
+    rows = (
+        CartItem.objects.filter(cart_id=cart.pk)
+        .annotate(unit_price=unit_price)
+        .annotate(line_total=ExpressionWrapper(F('unit_price') * F('quantity'), output_field=money_field))
+        .order_by('id')
+        .values_list(
+            'id', 'product_id', 'product__name', 'product__price', 'selected_attribute_id',
+            'quantity', 'unit_price', 'line_total',
+        )
+    )
+    lines = tuple(CartLine(*row) for row in rows)
+    pricing = CartPricing(lines=lines, subtotal=sum((line.line_total for line in lines), Decimal('0')))
+
+    cache.set(key, pricing, CACHE_TIMEOUT)
+    return pricing
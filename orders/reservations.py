@@ -0,0 +1,181 @@
+# orders/reservations.py
+
+"""
+Stock reservations.
+
+Stock is taken with one conditional UPDATE that decrements every product of
+an order only where `stock >= requested quantity`. No product row is read
+under a lock first. When fewer rows change than were requested, the
+statement's savepoint is rolled back and the shortages are reported, so
+stock never goes below zero. Checkout runs it as its last write, so a
+popular product's row stays locked only from that statement until commit.
+
+Every product taken is recorded as a StockReservation. Orders paid online
+hold their stock for RESERVATION_HOLD_MINUTES; a verified payment commits the
+hold, and `manage.py release_expired_reservations` returns expired holds to
+stock in bulk. Cancelling an order returns its stock.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from products.models import Product
+from products.signals import stock_changed
+from .models import OrderStatus, StockReservation
+
+DEFAULT_HOLD_MINUTES = 15
+DEFAULT_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        super().__init__("Insufficient stock")
+        self.shortages = shortages
+
+
+def shortages(requested):
+    """
+    Return the products whose stock cannot cover `requested`
+    ({product id: quantity}). A plain read that takes no locks.
+    """
+    available = {
+        product_id: (name, stock)
+        for product_id, name, stock in Product.objects.filter(id__in=requested).values_list('id', 'name', 'stock')
+    }
+    return [
+        {
+            "product_id": product_id,
+            "name": available.get(product_id, ('', 0))[0],
+            "requested": quantity,
+            "available": available.get(product_id, ('', 0))[1],
+        }
+        for product_id, quantity in requested.items()
+        if available.get(product_id, ('', 0))[1] < quantity
+    ]
+
+
+def per_product(cases):
+    return Case(*cases, output_field=models.PositiveIntegerField())
+
+
+def take(requested):
+    """Decrement stock for every product in `requested`, or raise InsufficientStock and change nothing."""
+    if not requested:
+        return
+    with transaction.atomic():
+        updated = Product.objects.filter(
+            id__in=requested,
+            stock__gte=per_product([When(id=product_id, then=Value(quantity)) for product_id, quantity in requested.items()]),
+        ).update(
+            stock=per_product([When(id=product_id, then=F('stock') - quantity) for product_id, quantity in requested.items()])
+        )
+        if updated != len(requested):
+            transaction.set_rollback(True)
+    if updated != len(requested):
+        raise InsufficientStock(shortages(requested))
+
+
+def give_back(quantities):
+    """Increment stock for every product in `quantities` in one statement."""
+    if not quantities:
+        return
+    Product.objects.filter(id__in=quantities).update(
+        stock=per_product([When(id=product_id, then=F('stock') + quantity) for product_id, quantity in quantities.items()])
+    )
+    stock_changed.send(sender=Product, product_ids=list(quantities))
+
+
+def reserve(order, requested, hold=False):
+    """
+    Take stock for `order` and record it. With hold=True the reservation
+    expires unless commit() is called first, e.g. once an online payment is
+    verified.
+    """
+    take(requested)
+    expires_at = None
+    if hold:
+        expires_at = timezone.now() + timedelta(
+            minutes=getattr(settings, 'RESERVATION_HOLD_MINUTES', DEFAULT_HOLD_MINUTES)
+        )
+    StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order, product_id=product_id, quantity=quantity,
+            status='Held' if hold else 'Committed', expires_at=expires_at,
+        )
+        for product_id, quantity in requested.items()
+    ])
+    stock_changed.send(sender=Product, product_ids=list(requested))
+
+
+def commit(order):
+    """
+    Confirm the order's held stock. If the hold had already expired, take
+    the stock again; returns False when it is no longer available or the
+    order has been cancelled.
+    """
+    with transaction.atomic():
+        if OrderStatus.objects.filter(order=order, status='Cancelled').exists():
+            return False
+        if StockReservation.objects.filter(order=order, status='Held').update(status='Committed', expires_at=None):
+            return True
+        released = list(StockReservation.objects.filter(order=order, status='Released'))
+        if not released:
+            return True
+        # Only holds released by the expiry sweep are taken again; stock
+        # returned for any other reason stays returned
+        if any(reservation.expires_at is None or reservation.released_at < reservation.expires_at
+               for reservation in released):
+            return False
+        requested = Counter()
+        for reservation in released:
+            requested[reservation.product_id] += reservation.quantity
+        try:
+            take(requested)
+        except InsufficientStock:
+            return False
+        StockReservation.objects.filter(id__in=[reservation.id for reservation in released]).update(
+            status='Committed', released_at=None,
+        )
+    stock_changed.send(sender=Product, product_ids=list(requested))
+    return True
+
+
+def release(reservations):
+    """Return the stock of the given reservations that are not released yet; returns how many were."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            reservations.select_for_update(skip_locked=True)
+            .exclude(status='Released')
+            .values_list('id', 'product_id', 'quantity')
+        )
+        if not rows:
+            return 0
+        StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status='Released', released_at=now)
+        quantities = Counter()
+        for _, product_id, quantity in rows:
+            quantities[product_id] += quantity
+        give_back(quantities)
+    return len(rows)
+
+
+def release_order(order):
+    return release(StockReservation.objects.filter(order=order))
+
+
+def release_expired(batch_size=None):
+    """Release one batch of expired holds; returns how many were released."""
+    batch_size = batch_size or getattr(settings, 'RESERVATION_SWEEP_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    due = list(
+        StockReservation.objects.filter(status='Held', expires_at__lte=timezone.now())
+        .order_by('expires_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not due:
+        return 0
+    return release(StockReservation.objects.filter(id__in=due, status='Held'))
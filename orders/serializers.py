@@ -1,5 +1,4 @@
 # orders/serializers.py
-from users.models import User
 from users.serializers import UserSerializer
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem, OrderStatus, Product, ProductAttribute, Payment, Address
@@ -72,21 +71,20 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'user', 'total_amount', 'delivery_address', 'items', 'payment_details', 'latest_status','created_at']
 
+    # The getters below read the relations loaded by Order.objects.with_details()
+    # instead of querying per order.
     def get_user(self, obj):
-        # Fetch the full user details
-        user = User.objects.filter(id=obj.user.id).first()
-        if user:
-            return {"id": user.id, "name": user.name, "email": user.email}
-        return None
+        user = obj.user
+        return {"id": user.id, "name": user.name, "email": user.email}
 
     def get_payment_details(self, obj):
-        payment = Payment.objects.filter(order=obj).first()
-        if payment:
-            return PaymentSerializer(payment).data
-        return None
+        try:
+            return PaymentSerializer(obj.payment).data
+        except Payment.DoesNotExist:
+            return None
 
     def get_latest_status(self, obj):
-        latest_status = OrderStatus.objects.filter(order=obj).order_by('-updated_at').first()
-        if latest_status:
-            return OrderStatusSerializer(latest_status).data
-        return None
+        try:
+            return OrderStatusSerializer(obj.latest_status).data
+        except OrderStatus.DoesNotExist:
+            return None
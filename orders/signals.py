@@ -0,0 +1,7 @@
+# orders/signals.py
+
+from django.dispatch import Signal
+
+# Sent after order items are created with bulk_create, which does not send
+# post_save. Arguments: order, items.
+order_items_created = Signal()
@@ -0,0 +1,196 @@
+# orders/slips.py
+
+"""
+Batch rendering of order slips.
+
+Order data is read once from a prefetched queryset and flattened into plain
+dicts, so the CPU-heavy part of the work (QR codes and, for zips, whole slip
+PDFs) can be farmed out to a process pool. The logo is decoded once per
+process rather than once per slip. Slips are consumed as an iterator, a
+window at a time, and output goes to a temporary file on disk that is
+streamed back to the client, so memory stays flat for large batches.
+"""
+
+import io
+import itertools
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+# Batches smaller than this are rendered in-process; starting a pool costs
+# more than it saves.
+POOL_THRESHOLD = 20
+PAGE_WIDTH, PAGE_HEIGHT = letter
+
+_logo_cache = {}
+
+
+def slip_data(order):
+    """Flatten an order loaded with Order.objects.with_details() into a dict."""
+    address = order.delivery_address
+    payment = getattr(order, 'payment', None)  # missing reverse one-to-one raises an AttributeError subclass
+    return {
+        'id': order.id,
+        'name': order.user.name,
+        'username': order.user.username,
+        'phone_number': order.user.phone_number,
+        'street_address': address.street_address if address else '',
+        'city_line': f"{address.city}, {address.postal_code}" if address else '',
+        'total_amount': str(order.total_amount),
+        'payment_method': payment.payment_method if payment else 'N/A',
+        'items': [
+            f"{item.quantity}x {item.product.name} ({item.selected_attribute.value if item.selected_attribute else 'No Attribute'})"
+            for item in order.items.all()
+        ],
+    }
+
+
+def build_qr_png(data):
+    qr_data = f"Order ID: {data['id']}, Total Amount: ₹{data['total_amount']}, Customer: {data['username']}"
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    img = qr.make_image(fill='black', back_color='white')
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_logo(logo_path):
+    """Return the logo as an ImageReader, decoding it at most once per process."""
+    if logo_path not in _logo_cache:
+        try:
+            _logo_cache[logo_path] = ImageReader(logo_path) if logo_path and os.path.exists(logo_path) else None
+        except Exception:
+            _logo_cache[logo_path] = None
+    return _logo_cache[logo_path]
+
+
+def draw_slip(p, data, qr_png, logo):
+    """Draw one order slip on the current page of canvas `p`."""
+    width = PAGE_WIDTH
+
+    # Set a font
+    p.setFont("Helvetica", 10)
+
+    # Sender's Address (From Section)
+    p.drawString(50, 730, "From:")
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, 715, "Near Airport")
+    p.drawString(50, 700, "Shivaji Terminal")
+    p.drawString(50, 685, "Air Strip Number 32")
+    p.drawString(50, 670, "Mumbai - 400001, India")
+
+    # Logo on the right side
+    p.setFont("Helvetica", 10)
+    if logo is not None:
+        p.drawImage(logo, 400, 680, width=1.5 * inch, height=1.5 * inch, preserveAspectRatio=True)
+    else:
+        p.drawString(400, 720, "Logo not found")
+
+    # Customer Information (To Section)
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, 640, "To:")
+    p.setFont("Helvetica", 10)
+    p.drawString(50, 625, f"{data['name']}")
+    p.drawString(50, 610, f"{data['street_address']}")
+    p.drawString(50, 595, f"{data['city_line']}")
+    p.drawString(50, 580, f"{data['phone_number']}")
+
+    # QR Code (On the right side of To)
+    p.drawImage(ImageReader(io.BytesIO(qr_png)), 400, 580, width=100, height=100)
+
+    # Draw Border between sections
+    p.line(50, 570, width - 50, 570)  # Separator line
+
+    # Ordered Items Section (Full Width)
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, 555, "Ordered Items:")
+    y_position = 540
+    for item_details in data['items']:
+        p.drawString(50, y_position, item_details)
+        y_position -= 15
+
+    # Draw border around Ordered Items Section
+    p.line(50, 570, 50, y_position)  # Left line
+    p.line(width - 50, 570, width - 50, y_position)  # Right line
+    p.line(50, y_position, width - 50, y_position)  # Bottom line
+
+    # Order Summary Section (Full Width)
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, y_position - 20, "Order Summary:")
+    p.setFont("Helvetica", 10)
+    p.drawString(50, y_position - 35, f"Order ID: {data['id']}")
+    p.drawString(50, y_position - 50, f"Total Amount: ₹{data['total_amount']}")
+    p.drawString(50, y_position - 65, f"Payment Method: {data['payment_method']}")
+
+    # Draw border around the Order Summary
+    p.line(50, y_position - 20, width - 50, y_position - 20)  # Top line
+    p.line(50, y_position - 85, width - 50, y_position - 85)  # Bottom line
+    p.line(50, y_position - 20, 50, y_position - 85)  # Left line
+    p.line(width - 50, y_position - 20, width - 50, y_position - 85)  # Right line
+
+    p.showPage()
+
+
+def render_single_slip(data, logo_path):
+    """Render one slip as a standalone PDF and return (order id, pdf bytes)."""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    draw_slip(p, data, build_qr_png(data), load_logo(logo_path))
+    p.save()
+    return data['id'], buffer.getvalue()
+
+
+def _render_single_slip(args):
+    return render_single_slip(*args)
+
+
+def _pool(workers):
+    # 'spawn' keeps workers independent of the web server's threads and
+    # database connections.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _map(function, items, workers, chunksize=16):
+    """
+    map() over a process pool, or in-process for small batches. `items` may
+    be an iterator; the pool is handed one window of it at a time, since
+    Executor.map() would otherwise read it to the end up front.
+    """
+    items = iter(items)
+    window = list(itertools.islice(items, POOL_THRESHOLD))
+    if workers <= 1 or len(window) < POOL_THRESHOLD:
+        yield from map(function, itertools.chain(window, items))
+        return
+    with _pool(workers) as executor:
+        while window:
+            yield from executor.map(function, window, chunksize=chunksize)
+            window = list(itertools.islice(items, workers * chunksize * 4))
+
+
+def write_slips_pdf(slips, output, logo_path, workers=1):
+    """Write every slip in `slips` as one page of a single PDF to `output`."""
+    logo = load_logo(logo_path)
+    p = canvas.Canvas(output, pagesize=letter)
+    # The QR codes run at most one window ahead of the pages drawn
+    slips, pending = itertools.tee(slips)
+    for data, qr_png in zip(slips, _map(build_qr_png, pending, workers)):
+        draw_slip(p, data, qr_png, logo)
+    p.save()
+
+
+def write_slips_zip(slips, output, logo_path, workers=1):
+    """Write one PDF per slip into a zip archive on `output`."""
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        jobs = ((data, logo_path) for data in slips)
+        for order_id, pdf in _map(_render_single_slip, jobs, workers, chunksize=4):
+            archive.writestr(f"Order_{order_id}_Slip.pdf", pdf)
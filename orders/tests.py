@@ -1,3 +1,471 @@
-from django.test import TestCase
+import csv
+import hashlib
+import hmac
+import json
+import re
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from coupons.models import Coupon
+from products.models import Category, Product, ProductAttribute
+from users.models import User, Address
+from . import gateway, reservations, slips
+from .exports import OrderExporter
+from .fake_gateway import start_fake_gateway
+from .models import Cart, CartItem, Order, OrderItem, OrderStatus, Payment, StockReservation
+from .signals import order_items_created
+
+
+class OrderFixtures:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='buyer@example.com', username='buyer', password='pass',
+            name='Buyer', phone_number='9876543210',
+        )
+        cls.address = Address.objects.create(user=cls.user, address_type='home', city='Mumbai')
+        category = Category.objects.create(name='Medicines')
+        cls.products = []
+        for index in range(3):
+            product = Product.objects.create(
+                category=category, name=f'Product {index}', price=Decimal('10.00'), stock=100,
+            )
+            ProductAttribute.objects.create(
+                product=product, name='size', value='100ml', additional_price=Decimal('2.50'),
+            )
+            cls.products.append(product)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.user, total_amount=Decimal('37.50'), delivery_address=self.address,
+            )
+            OrderStatus.objects.create(order=order, status='Pending')
+            Payment.objects.create(
+                user=self.user, order=order, payment_method='COD', amount=order.total_amount,
+            )
+            for product in self.products:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=1, price=product.price,
+                    selected_attribute=product.attributes.first(),
+                )
+
+
+class OrderListQueryCountTests(OrderFixtures, TestCase):
+    def test_order_list_query_count_is_independent_of_page_size(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.create_orders(2)
+        with self.assertNumQueries(2):
+            response = client.get(reverse('order-list'))
+        self.assertEqual(response.status_code, 200)
+
+        self.create_orders(8)
+        with self.assertNumQueries(2):
+            response = client.get(reverse('order-list'))
+        self.assertEqual(response.status_code, 200)
+
+        order = response.data['results'][0]
+        self.assertEqual(order['user']['email'], self.user.email)
+        self.assertEqual(order['payment_details']['payment_method'], 'COD')
+        self.assertEqual(order['latest_status']['status'], 'Pending')
+        self.assertEqual(len(order['items']), 3)
+        self.assertEqual(order['items'][0]['total_price'], 12.5)
+
+
+class OrderAdminQueryCountTests(OrderFixtures, TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pass',
+            name='Admin', phone_number='9876543210',
+        )
+        self.client.force_login(admin_user)
+
+    def changelist_queries(self, query=''):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:orders_order_changelist') + query)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_query_count_is_independent_of_page_size(self):
+        self.create_orders(2)
+        small_page = self.changelist_queries()
+        self.create_orders(20)
+        self.assertEqual(self.changelist_queries(), small_page)
+        self.assertLessEqual(small_page, 12)
+
+    def test_payment_and_status_filters(self):
+        self.create_orders(3)
+        filtered = self.changelist_queries('?payment__payment_status__exact=Pending&latest_status__status__exact=Pending')
+        self.assertLessEqual(filtered, 12)
+
+
+def page_count(pdf):
+    return len(re.findall(rb'/Type /Page\b', pdf))
+
+
+class OrderSlipTests(OrderFixtures, TestCase):
+    def slip(self, order_id):
+        return {
+            'id': order_id, 'name': 'Buyer', 'username': 'buyer', 'phone_number': '9876543210',
+            'street_address': '1 Road', 'city_line': 'Mumbai, 400001', 'total_amount': '37.50',
+            'payment_method': 'COD', 'items': ['1x Product 0 (100ml)'],
+        }
+
+    def render(self, write, count, workers):
+        with tempfile.TemporaryFile() as output:
+            # A generator, as the admin actions pass
+            write((self.slip(order_id) for order_id in range(1, count + 1)), output, None, workers=workers)
+            output.seek(0)
+            return output.read()
+
+    def test_pdf_has_one_page_per_slip(self):
+        # Above POOL_THRESHOLD, two workers render in a process pool
+        for count, workers in ((1, 1), (1, 2), (slips.POOL_THRESHOLD + 5, 1), (slips.POOL_THRESHOLD + 5, 2)):
+            with self.subTest(count=count, workers=workers):
+                self.assertEqual(page_count(self.render(slips.write_slips_pdf, count, workers)), count)
+
+    def test_zip_has_one_pdf_per_slip(self):
+        for count, workers in ((1, 1), (1, 2), (slips.POOL_THRESHOLD + 5, 1), (slips.POOL_THRESHOLD + 5, 2)):
+            with self.subTest(count=count, workers=workers):
+                with zipfile.ZipFile(BytesIO(self.render(slips.write_slips_zip, count, workers))) as archive:
+                    names = archive.namelist()
+                    self.assertEqual(names, [f"Order_{order_id}_Slip.pdf" for order_id in range(1, count + 1)])
+                    self.assertEqual(page_count(archive.read(names[-1])), 1)
+
+    def test_admin_action_prints_the_selected_orders(self):
+        self.create_orders(3)
+        admin_user = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pass',
+            name='Admin', phone_number='9876543210',
+        )
+        self.client.force_login(admin_user)
+        orders = list(Order.objects.order_by('pk'))
+        url = reverse('admin:orders_order_changelist')
+
+        with override_settings(ORDER_SLIP_WORKERS=1):
+            response = self.client.post(url, {
+                'action': 'print_order_slip', '_selected_action': [order.pk for order in orders],
+            })
+            single = self.client.post(url, {'action': 'print_order_slip', '_selected_action': [orders[0].pk]})
+
+        self.assertEqual(page_count(b''.join(response.streaming_content)), 3)
+        self.assertIn('Order_Slips.pdf', response['Content-Disposition'])
+        self.assertIn(f'Order_{orders[0].pk}_Slip.pdf', single['Content-Disposition'])
+        single.close()
+
+
+class OrderExportTests(OrderFixtures, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pass',
+            name='Admin', phone_number='9876543210',
+        )
+        self.create_orders(4)
+
+    def export(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(reverse('admin-order-export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_has_one_row_per_item(self):
+        rows = list(csv.DictReader(StringIO(self.export())))
+        self.assertEqual(len(rows), 4 * 3)
+        self.assertEqual(rows[0]['User Email'], self.user.email)
+        self.assertEqual(rows[0]['Payment Method'], 'COD')
+        self.assertEqual(rows[0]['City'], 'Mumbai')
+        self.assertEqual(rows[0]['Attribute'], 'size: 100ml')
+
+    def test_ndjson_nests_items_and_payment_and_filters(self):
+        order = Order.objects.order_by('id').first()
+        OrderStatus.update_status(order, 'Completed')
+        records = [json.loads(line) for line in self.export(output='ndjson', status='Completed').splitlines()]
+        self.assertEqual([record['id'] for record in records], [order.id])
+        self.assertEqual(records[0]['payment']['amount'], '37.50')
+        self.assertEqual([item['product'] for item in records[0]['items']], ['Product 0', 'Product 1', 'Product 2'])
+
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.export(output='ndjson', created_after=tomorrow), '')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get(reverse('admin-order-export'), {'created_after': 'soon'}).status_code, 400)
+
+    def test_queries_grow_with_chunks_not_rows(self):
+        exporter = OrderExporter(Order.objects.all(), chunk_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            records = list(exporter.records())
+        self.assertEqual(len(records), 4)
+        self.assertEqual(len(queries), 1 + 2)  # The orders, then the items of each chunk of 2
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        order = Order.objects.order_by('id').last()
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'export_orders_ndjson', '_selected_action': [order.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [order.pk])
+
+
+class OrderPlacementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='checkout@example.com', username='checkout', password='pass',
+            name='Checkout', phone_number='9876543210',
+        )
+        cls.address = Address.objects.create(user=cls.user, address_type='home', city='Pune')
+        category = Category.objects.create(name='Wellness')
+        cls.product = Product.objects.create(
+            category=category, name='Syrup', price=Decimal('40.00'), stock=5,
+        )
+        cls.attribute = ProductAttribute.objects.create(
+            product=cls.product, name='size', value='200ml', additional_price=Decimal('5.00'),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2, selected_attribute=self.attribute)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+
+    def place_order(self, payment_method='COD'):
+        return self.client.post(
+            reverse('order-place'), {'payment_method': payment_method, 'address_id': self.address.id}, format='json',
+        )
+
+    def test_order_is_placed_atomically(self):
+        response = self.place_order()
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('130.00'))
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.payment.payment_method, 'COD')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_short_stock_is_rejected_without_writing(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=2)
+
+        response = self.place_order()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Insufficient stock')
+        self.assertEqual(response.data['items'][0]['requested'], 3)
+        self.assertEqual(response.data['items'][0]['available'], 2)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+
+    def test_razorpay_checkout_against_fake_gateway(self):
+        server = self.start_gateway()
+
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            response = self.place_order('Razorpay')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['amount'], 13000)
+        payment = Payment.objects.get(order_id=response.data['order_db_id'])
+        self.assertEqual(payment.payment_id, response.data['order_id'])
+        self.assertIn(payment.payment_id, server.orders)
+
+    def start_gateway(self, **options):
+        server = start_fake_gateway(**options)
+        # Cleanups run last first: close the pooled session, stop the server, close its socket
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(gateway.reset_client)
+        gateway.reset_client()
+        return server
+
+    def test_no_razorpay_order_is_created_when_stock_runs_out(self):
+        server = self.start_gateway()
+
+        # Another checkout takes the stock after the up-front check
+        def sell_out(order, **kwargs):
+            Product.objects.filter(pk=self.product.pk).update(stock=1)
+        order_items_created.connect(sell_out)
+        self.addCleanup(order_items_created.disconnect, sell_out)
+
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            response = self.place_order('Razorpay')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(server.orders, {})
+        self.assertFalse(Order.objects.exists())
+
+    def test_rejected_razorpay_order_abandons_the_order(self):
+        server = self.start_gateway()
+        # Below Razorpay's minimum amount
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('0.10'))
+        ProductAttribute.objects.filter(pk=self.attribute.pk).update(additional_price=Decimal('0.00'))
+
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            response = self.place_order('Razorpay')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(
+            sorted(CartItem.objects.filter(cart__user=self.user).values_list('quantity', 'selected_attribute_id')),
+            [(1, None), (2, self.attribute.pk)],
+        )
+
+    def test_razorpay_server_error_is_reported_as_unavailable(self):
+        server = self.start_gateway(failure_rate=1.0)
+
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            response = self.place_order('Razorpay')
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.data['detail'], 'Payment gateway unavailable')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+
+    def test_expired_razorpay_hold_is_released_and_retaken_on_payment(self):
+        server = self.start_gateway()
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            response = self.place_order('Razorpay')
+
+        hold = StockReservation.objects.get()
+        self.assertEqual((hold.status, hold.quantity), ('Held', 3))
+        self.assertIsNotNone(hold.expires_at)
+        self.assertEqual(self.stock(), 2)
+
+        self.assertEqual(reservations.release_expired(), 0)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reservations.release_expired(), 1)
+        self.assertEqual(self.stock(), 5)
+
+        # A late payment takes the stock again
+        verified = self.verify_payment(response)
+        self.assertEqual(verified.status_code, 200)
+        self.assertEqual(StockReservation.objects.get().status, 'Committed')
+        self.assertEqual(self.stock(), 2)
+
+    def verify_payment(self, placed):
+        razorpay_order_id = placed.data['order_id']
+        signature = hmac.new(
+            settings.RAZORPAY_API_SECRET.encode(), f"{razorpay_order_id}|pay_1".encode(), hashlib.sha256,
+        ).hexdigest()
+        return self.client.post(reverse('payment-verify'), {
+            'razorpay_payment_id': 'pay_1', 'razorpay_order_id': razorpay_order_id,
+            'razorpay_signature': signature, 'order_db_id': placed.data['order_db_id'],
+        }, format='json')
+
+    def test_payment_for_an_unfulfillable_order_is_marked_for_refund(self):
+        server = self.start_gateway()
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            response = self.place_order('Razorpay')
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        reservations.release_expired()
+        # The stock is sold to someone else before the payment arrives
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+
+        verified = self.verify_payment(response)
+
+        self.assertEqual(verified.status_code, 409)
+        order = Order.objects.get()
+        self.assertEqual(order.payment.payment_status, 'Refund Pending')
+        self.assertEqual(order.latest_status.status, 'Cancelled')
+        self.assertEqual(StockReservation.objects.get().status, 'Released')
+        self.assertEqual(self.stock(), 1)
+
+    def test_stock_of_a_cancelled_order_is_not_taken_again(self):
+        server = self.start_gateway()
+        with override_settings(RAZORPAY_BASE_URL=server.base_url):
+            order = Order.objects.get(pk=self.place_order('Razorpay').data['order_db_id'])
+
+        OrderStatus.update_status(order, 'Cancelled')
+        self.assertEqual(self.stock(), 5)
+
+        self.assertFalse(reservations.commit(order))
+        self.assertEqual(StockReservation.objects.get().status, 'Released')
+        self.assertEqual(self.stock(), 5)
+
+        # Even when the cancellation came after the hold had expired
+        StockReservation.objects.update(expires_at=F('released_at'))
+        self.assertFalse(reservations.commit(order))
+        self.assertEqual(self.stock(), 5)
+
+        # Nor is stock returned before the hold expired, whatever the status
+        OrderStatus.update_status(order, 'Pending')
+        StockReservation.objects.update(expires_at=timezone.now() + timedelta(minutes=5))
+        self.assertFalse(reservations.commit(order))
+        self.assertEqual(self.stock(), 5)
+
+    def test_stock_is_never_taken_below_zero(self):
+        other = Product.objects.create(category=self.product.category, name='Balm', price=Decimal('5.00'), stock=10)
+
+        with self.assertRaises(reservations.InsufficientStock) as raised:
+            reservations.take({other.pk: 4, self.product.pk: 6})
+
+        self.assertEqual([(s['product_id'], s['available']) for s in raised.exception.shortages], [(self.product.pk, 5)])
+        other.refresh_from_db()
+        self.assertEqual((other.stock, self.stock()), (10, 5))
+
+    def test_cancelling_an_order_returns_its_stock(self):
+        order_id = self.place_order().data['id']
+        self.assertEqual(self.stock(), 2)
+
+        response = self.client.put(reverse('cancel-order', args=[order_id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(StockReservation.objects.get().status, 'Released')
+        # Cancelling again does not return it twice
+        OrderStatus.update_status(Order.objects.get(), 'Cancelled')
+        self.assertEqual(self.stock(), 5)
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_coupon_preview_reuses_cached_pricing_until_cart_or_prices_change(self):
+        cache.clear()
+        Coupon.objects.create(
+            code='SAVE10', discount_type='percentage', discount_amount=Decimal('10'),
+            expiry_date=date.today() + timedelta(days=1),
+        )
+        url = reverse('apply-coupon')
+
+        response = self.client.post(url, {'coupon_code': 'SAVE10'}, format='json')
+        self.assertEqual(response.data['discount'], 13.0)
+        self.assertEqual(response.data['new_total'], 117.0)
+
+        # Cart, catalog version and coupon lookups only; the priced cart comes from the cache
+        with self.assertNumQueries(3):
+            self.client.post(url, {'coupon_code': 'SAVE10'}, format='json')
+
+        item = CartItem.objects.filter(cart__user=self.user, selected_attribute=None).get()
+        self.client.patch(reverse('cart-item-update', args=[item.id]), {'quantity': 3}, format='json')
+        response = self.client.post(url, {'coupon_code': 'SAVE10'}, format='json')
+        self.assertEqual(response.data['new_total'], 189.0)
+
+        # A price change bumps the catalog version, so it is picked up too
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal('50.00')
+            self.product.save()
+        response = self.client.post(url, {'coupon_code': 'SAVE10'}, format='json')
+        self.assertEqual(response.data['new_total'], 234.0)
@@ -11,7 +11,7 @@ from .views import (
     CartItemUpdateView,
     RazorpayPaymentVerificationView,
     ApplyCouponView,
-    OrderListView, OrderDetailView,CancelOrderView,AdminOrderListView,AdminOrderStatusUpdateView,AssignDeliveryPersonnelView
+    OrderListView, OrderDetailView,CancelOrderView,AdminOrderListView,AdminOrderExportView,AdminOrderStatusUpdateView,AssignDeliveryPersonnelView
 )
 
 urlpatterns = [
@@ -27,6 +27,7 @@ urlpatterns = [
     path('order/list/', OrderListView.as_view(), name='order-list'),  # New endpoint for listing orders
     path('order/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('admin/order/list/', AdminOrderListView.as_view(), name='admin-order-list'),
+    path('admin/order/export/', AdminOrderExportView.as_view(), name='admin-order-export'),
     path('admin/order/status/update/<int:pk>/', AdminOrderStatusUpdateView.as_view(), name='admin-order-status-update'),
     path('admin/order/assign/<int:pk>/', AssignDeliveryPersonnelView.as_view(), name='assign-delivery-personnel'),
     path('orders/<int:pk>/cancel/', CancelOrderView.as_view(), name='cancel-order'),
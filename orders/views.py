@@ -1,22 +1,32 @@
 import hmac
 import hashlib
-import razorpay
+from collections import Counter
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from .models import Cart, CartItem, Order, OrderItem, OrderStatus,Address,Payment
 from .serializers import CartSerializer, CartItemSerializer, OrderSerializer, OrderStatusSerializer
+from .exports import OrderExporter
+from .pagination import OrderCursorPagination
+from .signals import order_items_created
+from . import gateway
+from . import pricing as pricing_engine
+from . import reservations
 from products.models import Product, ProductAttribute
+from settings.exports import CONTENT_TYPES
 from settings.models import OrderSettings
 from decimal import Decimal
 from coupons.models import Coupon
 from rest_framework.views import APIView
-from notifications.models import Notification
-from notifications.utils import send_push_notification
 import logging
 
 logger = logging.getLogger(__name__)
+User = get_user_model()
+
 # --- Updated Cart View ---
 class CartView(generics.RetrieveUpdateAPIView):
     serializer_class = CartSerializer
@@ -53,6 +63,7 @@ class CartItemAddView(generics.CreateAPIView):
             selected_attribute = get_object_or_404(ProductAttribute, id=selected_attribute_id)
 
         serializer.save(cart=cart, product=product, selected_attribute=selected_attribute)
+        Cart.bump_version(cart.id)
 
 
 class CartItemUpdateView(generics.UpdateAPIView):
@@ -64,6 +75,10 @@ class CartItemUpdateView(generics.UpdateAPIView):
         # Only allow updates to items in the authenticated user's cart
         return CartItem.objects.filter(cart__user=self.request.user)
 
+    def perform_update(self, serializer):
+        item = serializer.save()
+        Cart.bump_version(item.cart_id)
+
 # --- Updated Cart Item Delete View ---
 class CartItemDeleteView(generics.DestroyAPIView):
     queryset = CartItem.objects.all()
@@ -72,20 +87,39 @@ class CartItemDeleteView(generics.DestroyAPIView):
     def get_queryset(self):
         return CartItem.objects.filter(cart__user=self.request.user)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        Cart.bump_version(instance.cart_id)
+
 # --- Updated Order Placement View ---
 from django.shortcuts import get_object_or_404
 from coupons.models import Coupon
 
 class OrderPlacementView(generics.CreateAPIView):
+    """
+    Places an order from the user's cart as a single atomic unit.
+
+    The cart row is locked for the duration of the transaction. Stock is
+    checked up front with a plain read, and taken as the last write with one
+    conditional UPDATE (orders/reservations.py), so product rows are not
+    locked while the order is written. Order items are bulk-inserted and the
+    cart is cleared with one DELETE, so the number of round trips does not
+    grow with the size of the cart. Any failure after the first write rolls
+    the whole order back.
+
+    Razorpay orders hold their stock until the payment is verified or the
+    hold expires. The Razorpay order is created after the transaction has
+    committed, so no lock is held during the HTTP call and no Razorpay order
+    is created for a checkout that ran out of stock; if the gateway call
+    fails, the order is abandoned: its stock is released, the cart restored
+    and the order deleted.
+    """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def create(self, request, *args, **kwargs):
-        # Retrieve the user's cart
-        cart = Cart.objects.filter(user=request.user).first()
-        if not cart or not cart.items.exists():
-            return Response({"detail": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+    PAYMENT_METHODS = ("COD", "Wallet", "Razorpay")
 
+    def create(self, request, *args, **kwargs):
         # Get payment method, address ID, and optional coupon code from request data
         payment_method = request.data.get("payment_method")
         address_id = request.data.get("address_id")
@@ -93,67 +127,101 @@ class OrderPlacementView(generics.CreateAPIView):
 
         if not payment_method:
             return Response({"detail": "Payment method is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if payment_method not in self.PAYMENT_METHODS:
+            return Response({"detail": "Invalid payment method"}, status=status.HTTP_400_BAD_REQUEST)
         if not address_id:
             return Response({"detail": "Delivery address is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Fetch the address instance using the address_id
         address = get_object_or_404(Address, id=address_id, user=request.user)
 
-        # Retrieve order settings (ensure OrderSettings is properly defined)
+        # Reject disabled payment methods before anything is written
         settings_obj = OrderSettings.get_order_settings()
+        if payment_method == "COD" and not settings_obj.cod_enabled:
+            return Response({"detail": "Cash on Delivery is disabled"}, status=status.HTTP_400_BAD_REQUEST)
+        if payment_method == "Wallet" and not settings_obj.wallet_enabled:
+            return Response({"detail": "Wallet payment is disabled"}, status=status.HTTP_400_BAD_REQUEST)
+        if payment_method == "Razorpay" and not settings_obj.razorpay_enabled:
+            return Response({"detail": "Razorpay payment is disabled"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate total amount based on products in the cart
-        total_amount = sum(
-            (float(item.product.price) + (float(item.selected_attribute.additional_price) if item.selected_attribute else 0)) * item.quantity
-            for item in cart.items.all()
-        )
-
-        # Apply coupon discount if a valid coupon code is provided
-        discount = Decimal(0)
+        coupon = None
         if coupon_code:
             try:
                 coupon = Coupon.objects.get(code=coupon_code)
-                if coupon.is_valid():
-                    if coupon.discount_type == 'percentage':
-                        discount = (Decimal(total_amount) * Decimal(coupon.discount_amount) / 100).quantize(Decimal('0.01'))
-                    elif coupon.discount_type == 'flat':
-                        discount = Decimal(coupon.discount_amount)
-                    discount = min(discount, total_amount)  # Ensure discount doesn't exceed total amount
-                    total_amount -= discount  # Apply the discount
-                else:
-                    return Response({"detail": "Coupon is invalid or expired"}, status=status.HTTP_400_BAD_REQUEST)
             except Coupon.DoesNotExist:
                 return Response({"detail": "Invalid coupon code"}, status=status.HTTP_400_BAD_REQUEST)
+            if not coupon.is_valid():
+                return Response({"detail": "Coupon is invalid or expired"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            cart = Cart.objects.select_for_update().filter(user=request.user).first()
+            pricing = pricing_engine.price_cart(cart, use_cache=False) if cart else None
+            if not pricing or not pricing.lines:
+                return Response({"detail": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+
+            requested = Counter()
+            for line in pricing.lines:
+                requested[line.product_id] += line.quantity
+            shortages = reservations.shortages(requested)
+            if shortages:
+                return Response(
+                    {"detail": "Insufficient stock", "items": shortages},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Apply coupon discount if a valid coupon code is provided
+            total_amount = pricing.subtotal
+            if coupon:
+                try:
+                    discount, total_amount = pricing.apply_coupon(coupon)
+                except ValueError as e:
+                    return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            user = request.user
+            if payment_method == "Wallet":
+                user = User.objects.select_for_update().get(pk=request.user.pk)
+                if user.wallet_balance < total_amount:
+                    return Response({"detail": "Insufficient wallet balance"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Create the order with the discounted total amount
+            order = Order.objects.create(
+                user=user,
+                total_amount=total_amount,
+                delivery_address=address
+            )
 
-        # Create the order with the discounted total amount
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=total_amount,
-            delivery_address=address
-        )
+            # Create the initial order status as "Pending"
+            OrderStatus.objects.create(
+                order=order,
+                status="Pending"
+            )
 
-        # Create the initial order status as "Pending"
-        OrderStatus.objects.create(
-            order=order,
-            status="Pending"
-        )
+            self.create_order_items(order, cart, pricing.lines)
 
-        # Handle payment processing based on the selected method
-        if payment_method == "COD":
-            return self.handle_cod_payment(order, cart, settings_obj, total_amount)
-        elif payment_method == "Wallet":
-            return self.handle_wallet_payment(order, cart, settings_obj, total_amount, request.user)
-        elif payment_method == "Razorpay":
-            return self.handle_razorpay_payment(order, cart, total_amount)
+            # Handle payment processing based on the selected method; Razorpay
+            # is called once the order has committed, below
+            if payment_method == "COD":
+                response = self.handle_cod_payment(order, total_amount)
+            elif payment_method == "Wallet":
+                response = self.handle_wallet_payment(order, total_amount, user)
+            else:
+                response = None
 
-        return Response({"detail": "Invalid payment method"}, status=status.HTTP_400_BAD_REQUEST)
+            # Take the stock last; another checkout may have taken it since the check above
+            try:
+                reservations.reserve(order, requested, hold=payment_method == "Razorpay")
+            except reservations.InsufficientStock as e:
+                transaction.set_rollback(True)
+                return Response(
+                    {"detail": "Insufficient stock", "items": e.shortages},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if response is None:
+            response = self.handle_razorpay_payment(order, total_amount, cart, pricing.lines)
+        return response
 
-    # Helper methods for handling payments remain unchanged...
     # Helper method for Cash on Delivery (COD) payment
-    def handle_cod_payment(self, order, cart, settings_obj, total_amount):
-        if not settings_obj.cod_enabled:
-            return Response({"detail": "Cash on Delivery is disabled"}, status=status.HTTP_400_BAD_REQUEST)
-
+    def handle_cod_payment(self, order, total_amount):
         Payment.objects.create(
             user=order.user,
             order=order,
@@ -161,19 +229,12 @@ class OrderPlacementView(generics.CreateAPIView):
             payment_status="Pending",
             amount=total_amount
         )
-
-        self.create_order_items(order, cart)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
-    # Helper method for Wallet payment
-    def handle_wallet_payment(self, order, cart, settings_obj, total_amount, user):
-        if not settings_obj.wallet_enabled:
-            return Response({"detail": "Wallet payment is disabled"}, status=status.HTTP_400_BAD_REQUEST)
-        if user.wallet_balance < total_amount:
-            return Response({"detail": "Insufficient wallet balance"}, status=status.HTTP_400_BAD_REQUEST)
-
-        user.wallet_balance -= Decimal(total_amount)
-        user.save()
+    # Helper method for Wallet payment; the caller holds a lock on the user row
+    def handle_wallet_payment(self, order, total_amount, user):
+        user.wallet_balance -= total_amount
+        user.save(update_fields=['wallet_balance'])
 
         Payment.objects.create(
             user=user,
@@ -182,21 +243,18 @@ class OrderPlacementView(generics.CreateAPIView):
             payment_status="Completed",
             amount=total_amount
         )
-
-        self.create_order_items(order, cart)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
-    # Helper method for Razorpay payment
-    def handle_razorpay_payment(self, order, cart, total_amount):
+    # Helper method for Razorpay payment; runs after the order has committed
+    def handle_razorpay_payment(self, order, total_amount, cart, lines):
         try:
-            client = razorpay.Client(auth=(settings.RAZORPAY_API_KEY, settings.RAZORPAY_API_SECRET))
-            razorpay_order = client.order.create({
-                "amount": int(total_amount * 100),  # Convert to paise
-                "currency": "INR",
-                "payment_capture": 1
-            })
-        except razorpay.errors.BadRequestError as e:
+            razorpay_order = gateway.create_order(total_amount, receipt=order.id)
+        except gateway.GatewayRejected as e:
+            self.abandon_order(order, cart, lines)
             return Response({"detail": "Razorpay order creation failed", "error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except gateway.GatewayUnavailable as e:
+            self.abandon_order(order, cart, lines)
+            return Response({"detail": "Payment gateway unavailable", "error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
 
         Payment.objects.create(
             user=order.user,
@@ -207,7 +265,6 @@ class OrderPlacementView(generics.CreateAPIView):
             payment_id=razorpay_order["id"]
         )
 
-        self.create_order_items(order, cart)
         return Response({
             "order_id": razorpay_order["id"],
             "amount": razorpay_order["amount"],
@@ -215,17 +272,39 @@ class OrderPlacementView(generics.CreateAPIView):
             "order_db_id": order.id
         }, status=status.HTTP_201_CREATED)
 
-    # Helper method to create order items and clear cart
-    def create_order_items(self, order, cart):
-        for item in cart.items.all():
-            OrderItem.objects.create(
+    # Undo a committed order whose payment could not be started: return its
+    # stock, put its items back in the cart and delete it
+    @transaction.atomic
+    def abandon_order(self, order, cart, lines):
+        reservations.release_order(order)
+        CartItem.objects.bulk_create([
+            CartItem(
+                cart=cart,
+                product_id=line.product_id,
+                quantity=line.quantity,
+                selected_attribute_id=line.selected_attribute_id
+            )
+            for line in lines
+        ])
+        Cart.bump_version(cart.id)
+        order.delete()
+
+    # Helper method to bulk-create order items and clear the cart
+    def create_order_items(self, order, cart, lines):
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=float(item.product.price),
-                selected_attribute=item.selected_attribute
+                product_id=line.product_id,
+                quantity=line.quantity,
+                price=line.product_price,
+                selected_attribute_id=line.selected_attribute_id
             )
-        cart.items.all().delete()
+            for line in lines
+        ])
+        order_items_created.send(sender=OrderItem, order=order, items=items)
+
+        CartItem.objects.filter(cart=cart).delete()
+        Cart.bump_version(cart.id)
 
 
 class ApplyCouponView(APIView):
@@ -234,11 +313,13 @@ class ApplyCouponView(APIView):
     def post(self, request):
         coupon_code = request.data.get('coupon_code')
         
-        # Retrieve or create the cart for the authenticated user
+        # Retrieve or create the cart for the authenticated user and price it
+        # (cached per cart version)
         cart, created = Cart.objects.get_or_create(user=request.user)
+        pricing = pricing_engine.price_cart(cart)
 
         # Check if the cart is empty
-        if not cart.items.exists():
+        if not pricing.lines:
             return Response({"detail": "Cart is empty, cannot apply coupon."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if coupon code is provided
@@ -250,34 +331,20 @@ class ApplyCouponView(APIView):
             coupon = Coupon.objects.get(code=coupon_code)
             if not coupon.is_valid():
                 return Response({"detail": "Coupon is invalid or expired."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Calculate the cart total
-            total_amount = sum(
-                (Decimal(item.product.price) + (Decimal(item.selected_attribute.additional_price) if item.selected_attribute else 0)) * item.quantity
-                for item in cart.items.all()
-            )
-
-            # Calculate discount based on coupon type
-            if coupon.discount_type == 'percentage':
-                discount = (total_amount * Decimal(coupon.discount_amount) / 100).quantize(Decimal('0.01'))
-            elif coupon.discount_type == 'flat':
-                discount = Decimal(coupon.discount_amount)
-            else:
-                return Response({"detail": "Invalid discount type."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Ensure discount doesn't exceed total amount
-            discount = min(discount, total_amount)
-            discounted_total = total_amount - discount
-
-            return Response({
-                "status": "Coupon applied successfully.",
-                "discount": float(discount),
-                "new_total": float(discounted_total)
-            }, status=status.HTTP_200_OK)
-
         except Coupon.DoesNotExist:
             return Response({"detail": "Invalid coupon code."}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            discount, discounted_total = pricing.apply_coupon(coupon)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status": "Coupon applied successfully.",
+            "discount": float(discount),
+            "new_total": float(discounted_total)
+        }, status=status.HTTP_200_OK)
+
 
 
 
@@ -308,13 +375,29 @@ class RazorpayPaymentVerificationView(generics.GenericAPIView):
 
         # If the signature matches, update the order and payment status
         if generated_signature == razorpay_signature:
-            # Update the order status to 'Completed'
-            order.status = "Completed"
-            order.save()
-
-            # Update the payment status to 'Completed'
-            payment.payment_status = "Completed"
-            payment.save()
+            with transaction.atomic():
+                # Turn the stock hold into a sale; if the hold expired and the
+                # stock has been sold meanwhile, or the order was cancelled,
+                # the order cannot be fulfilled and the payment is owed back
+                if not reservations.commit(order):
+                    payment.payment_status = "Refund Pending"
+                    payment.save()
+                    OrderStatus.update_status(order, "Cancelled")
+                    logger.warning(
+                        f"Payment {razorpay_payment_id} for unfulfillable order {order.id} needs a refund."
+                    )
+                    return Response(
+                        {"detail": "Payment received but the order can no longer be fulfilled; it has been cancelled and the payment will be refunded."},
+                        status=status.HTTP_409_CONFLICT
+                    )
+
+                # Update the order status to 'Completed'
+                order.status = "Completed"
+                order.save()
+
+                # Update the payment status to 'Completed'
+                payment.payment_status = "Completed"
+                payment.save()
 
             return Response({"detail": "Payment verified successfully"}, status=status.HTTP_200_OK)
         else:
@@ -334,38 +417,11 @@ class OrderStatusUpdateView(generics.UpdateAPIView):
 
     
     def perform_update(self, serializer):
-        # Save the updated instance
+        # Save the updated instance; the OrderStatus post_save signal creates
+        # the in-app notification and queues the push notification.
         instance = serializer.save()
-
-        # Log to check if perform_update is triggered
         logger.info(f"perform_update called for OrderStatus ID {instance.id}.")
 
-        # Get the related order and user
-        order = instance.order
-        user = order.user
-
-        # Create an in-app notification
-        try:
-            Notification.objects.create(
-                user=user,
-                title="Order Status Update",
-                message=f"Your order #{order.id} status has been updated to {instance.status}."
-            )
-            logger.info(f"Notification created for user {user.username} on order #{order.id}.")
-        except Exception as e:
-            logger.error(f"Failed to create in-app notification: {e}")
-
-        # Send a push notification
-        try:
-            notification_sent = send_push_notification(
-                user_id=user.id,
-                title="Order Status Update",
-                message=f"Your order #{order.id} status is now {instance.status}."
-            )
-            logger.info(f"Push notification sent for order #{order.id}: {notification_sent}")
-        except Exception as e:
-            logger.error(f"Failed to send push notification: {e}")
-
 
 # --- Order Status List View ---
 class OrderStatusListView(generics.ListAPIView):
@@ -378,21 +434,21 @@ class OrderStatusListView(generics.ListAPIView):
 class OrderListView(generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
-    def get_queryset(self):
-        status = self.request.query_params.get('status')
-        if status:
-            return Order.objects.filter(user=self.request.user, status=status).order_by('-created_at')
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Order.objects.filter(user=self.request.user).with_details()
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            queryset = queryset.filter(latest_status__status=order_status)
+        return queryset.order_by('-created_at', '-id')
 
 class OrderDetailView(generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return Order.objects.filter(user=self.request.user).with_details()
 
 class AdminOrderStatusUpdateView(generics.UpdateAPIView):
     queryset = OrderStatus.objects.all()
@@ -411,32 +467,54 @@ class AdminOrderStatusUpdateView(generics.UpdateAPIView):
         if new_status not in valid_statuses:
             return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Fetch the order and update its status
+        # Fetch the order and update its status; the OrderStatus post_save
+        # signal notifies the user.
         order = get_object_or_404(Order, id=order_id)
         updated_status = OrderStatus.update_status(order, new_status)
 
-        # Notify the user
-        Notification.objects.create(
-            user=order.user,
-            title="Order Status Update",
-            message=f"Your order #{order.id} status has been updated to {updated_status.status}."
-        )
-        send_push_notification(
-    title="Order Status Update",
-    message=f"Your order #{order.id} status is now {updated_status.status}."
-)
-
-
         return Response(OrderStatusSerializer(updated_status).data, status=status.HTTP_200_OK)
 
 
 
 class AdminOrderListView(generics.ListAPIView):
     serializer_class = OrderSerializer
-    permission_classes = [permissions.AllowAny]
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        return Order.objects.all().order_by('-created_at')
+        return Order.objects.with_details().order_by('-created_at', '-id')
+
+class AdminOrderExportView(APIView):
+    """
+    Stream orders with their items and payments as CSV or NDJSON, chosen with
+    ?output=csv|ndjson. Optional filters: status, and created_after /
+    created_before as YYYY-MM-DD dates (inclusive).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    # The export format comes from ?output=, whatever the Accept header says
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        output = params.get('output', 'csv')
+        if output not in CONTENT_TYPES:
+            return Response({"detail": "output must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Order.objects.all()
+        if params.get('status'):
+            queryset = queryset.filter(latest_status__status=params['status'])
+        for param, lookup in (('created_after', 'created_at__date__gte'), ('created_before', 'created_at__date__lte')):
+            if params.get(param):
+                try:
+                    day = parse_date(params[param])
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({"detail": f"{param} must be a YYYY-MM-DD date."}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{lookup: day})
+        return OrderExporter(queryset).response(output, 'orders')
 
 class AssignDeliveryPersonnelView(generics.UpdateAPIView):
     queryset = Order.objects.all()
@@ -463,18 +541,8 @@ class CancelOrderView(generics.UpdateAPIView):
         if order.latest_status.status in ["Completed", "Cancelled"]:
             return Response({"detail": "Order cannot be cancelled."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update the order status to 'Cancelled'
-        updated_status = OrderStatus.update_status(order, "Cancelled")
-
-        # Notify the user
-        Notification.objects.create(
-            user=order.user,
-            title="Order Cancelled",
-            message=f"Your order #{order.id} has been cancelled."
-        )
-        send_push_notification(
-            title="Order Cancelled",
-            message=f"Your order #{order.id} has been cancelled."
-        )
+        # Update the order status to 'Cancelled'; the OrderStatus post_save
+        # signal notifies the user.
+        OrderStatus.update_status(order, "Cancelled")
 
         return Response({"detail": "Order cancelled successfully."}, status=status.HTTP_200_OK)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django import forms
 from .models import Prescription, PrescriptionItem, PrescriptionOrder
+from . import approvals
 from products.models import Product
 from dal import autocomplete
 
@@ -25,36 +26,19 @@ class PrescriptionItemInline(admin.TabularInline):
 
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
-    list_display = ['user', 'status', 'total_amount', 'payment_status', 'created_at']
+    list_display = ['user', 'status', 'total_amount', 'payment_status', 'duplicate_of', 'created_at']
     list_filter = ['status', 'created_at', 'payment_status']
     search_fields = ['user__email', 'status']
-    readonly_fields = ['total_amount', 'payment_status', 'created_at', 'updated_at']
+    readonly_fields = ['total_amount', 'payment_status', 'duplicate_of', 'created_at', 'updated_at']
     inlines = [PrescriptionItemInline]
     actions = ['approve_prescription', 'reject_prescription']
 
     def approve_prescription(self, request, queryset):
-        for prescription in queryset:
-            if prescription.status == 'Pending':
-                prescription.status = 'Approved'
-                prescription.save()
-
-                # Ensure prescription items are available
-                if not prescription.items.exists():
-                    self.message_user(request, "No items found for this prescription.", level='error')
-                    return
-
-                # Calculate total amount for approved prescription
-                total_amount = sum(item.product.price * item.quantity for item in prescription.items.all())
-                prescription.total_amount = total_amount
-                prescription.save()
-
-                # Create a PrescriptionOrder after approval
-                PrescriptionOrder.objects.create(
-                    prescription=prescription,
-                    total_amount=total_amount,
-                    payment_status='Pending'
-                )
-        self.message_user(request, "Selected prescriptions have been approved and orders created.")
+        result = approvals.approve(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"{len(result.orders)} prescription(s) approved and orders created.")
+        if result.skipped:
+            examples = ', '.join(f"#{pk}: {reason}" for pk, reason in list(result.skipped.items())[:10])
+            self.message_user(request, f"Skipped {len(result.skipped)} prescription(s) ({examples})", level='warning')
 
     approve_prescription.short_description = "Approve selected prescriptions and create orders"
 
@@ -0,0 +1,89 @@
+# prescriptions/approvals.py
+
+"""
+Set-based approval of prescriptions.
+
+approve() handles any number of prescriptions in one transaction with a fixed
+number of queries: the pending rows are locked, every total is computed by one
+aggregate over the items, statuses are written with one bulk_update and the
+orders with one bulk_create. The admin action, the single approve endpoint
+and the batch endpoint all go through it.
+"""
+
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+from .models import Prescription, PrescriptionItem, PrescriptionOrder
+
+MAX_BATCH_SIZE = 500
+
+ALREADY_PROCESSED = 'Prescription has already been processed'
+NO_ITEMS = 'No items found in the prescription.'
+HAS_ORDER = 'Prescription already has an order.'
+NOT_FOUND = 'Prescription not found.'
+
+
+@dataclass
+class ApprovalResult:
+    orders: dict = field(default_factory=dict)  # prescription id -> PrescriptionOrder
+    skipped: dict = field(default_factory=dict)  # prescription id -> reason
+
+    def as_data(self):
+        return {
+            'approved': [
+                {'id': pk, 'order_id': order.id, 'total_amount': order.total_amount}
+                for pk, order in self.orders.items()
+            ],
+            'skipped': [{'id': pk, 'detail': reason} for pk, reason in self.skipped.items()],
+        }
+
+
+@transaction.atomic
+def approve(prescription_ids):
+    """Approve the pending prescriptions among `prescription_ids` and create their orders."""
+    ids = list(dict.fromkeys(int(pk) for pk in prescription_ids))
+    result = ApprovalResult()
+    rows = {
+        row['id']: row
+        for row in Prescription.objects.select_for_update().filter(pk__in=ids).values('id', 'status')
+    }
+    pending = [pk for pk in ids if pk in rows and rows[pk]['status'] == 'Pending']
+    ordered = set(PrescriptionOrder.objects.filter(prescription_id__in=pending).values_list('prescription_id', flat=True))
+    totals = dict(
+        PrescriptionItem.objects.filter(prescription_id__in=pending)
+        .values('prescription_id')
+        .annotate(total=Sum(F('product__price') * F('quantity'), output_field=DecimalField(max_digits=10, decimal_places=2)))
+        .values_list('prescription_id', 'total')
+    )
+
+    approved = []
+    for pk in ids:
+        if pk not in rows:
+            result.skipped[pk] = NOT_FOUND
+        elif rows[pk]['status'] != 'Pending':
+            result.skipped[pk] = ALREADY_PROCESSED
+        elif pk in ordered:
+            result.skipped[pk] = HAS_ORDER
+        elif pk not in totals:
+            result.skipped[pk] = NO_ITEMS
+        else:
+            approved.append(pk)
+    if not approved:
+        return result
+
+    now = timezone.now()
+    prescriptions = [
+        Prescription(
+            pk=pk, status='Approved', total_amount=totals[pk], payment_status='Pending', updated_at=now,
+        )
+        for pk in approved
+    ]
+    Prescription.objects.bulk_update(prescriptions, ['status', 'total_amount', 'payment_status', 'updated_at'])
+    orders = PrescriptionOrder.objects.bulk_create([
+        PrescriptionOrder(prescription_id=pk, total_amount=totals[pk], payment_status='Pending') for pk in approved
+    ])
+    result.orders = {order.prescription_id: order for order in orders}
+    return result
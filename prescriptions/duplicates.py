@@ -0,0 +1,124 @@
+# prescriptions/duplicates.py
+
+"""
+Detection of prescription photos uploaded more than once.
+
+Each ingested image gets a 64-bit difference hash (dHash): the image is
+reduced to 9x8 grey pixels and every bit records whether a pixel is brighter
+than its right neighbour. Re-photographing, recompressing or rescaling the
+same sheet changes only a few bits, so two uploads are likely duplicates when
+the Hamming distance between their hashes is at most
+PRESCRIPTION_DUPLICATE_MAX_DISTANCE.
+
+Lookups use multi-index hashing: the hash is split into BANDS bytes, stored
+as PrescriptionHashBand rows indexed on (user, band, value). Two hashes that
+differ in fewer than BANDS bits agree exactly on at least one byte, so one
+indexed query over the user's rows finds every candidate and the exact
+distance is checked on those alone. A new prescription that is close to one
+of the same user's prescriptions from the previous
+PRESCRIPTION_DUPLICATE_WINDOW_DAYS gets `duplicate_of` set to it. Uploads
+are not always indexed in upload order, so a later, unflagged upload close to
+the one being indexed is flagged as its duplicate in turn.
+"""
+
+import operator
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image
+
+from .models import Prescription, PrescriptionHashBand
+
+BANDS = 8
+BAND_BITS = 64 // BANDS
+DEFAULT_MAX_DISTANCE = 6  # Below BANDS, so the band lookup cannot miss a match
+DEFAULT_WINDOW_DAYS = 90
+
+
+def dhash(image):
+    """The 64-bit difference hash of a PIL image, as a signed integer for a BigIntegerField."""
+    pixels = list(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def bands(value):
+    """Split a hash into BANDS unsigned BAND_BITS-bit values, most significant first."""
+    value &= (1 << 64) - 1
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (64 - BAND_BITS * (band + 1))) & mask for band in range(BANDS)]
+
+
+def distance(a, b):
+    return ((a ^ b) & ((1 << 64) - 1)).bit_count()
+
+
+def matches(prescription):
+    """
+    (distance, created_at, pk) of each of the user's other prescriptions
+    uploaded within the window before or after it whose hash is close enough.
+    """
+    max_distance = min(
+        getattr(settings, 'PRESCRIPTION_DUPLICATE_MAX_DISTANCE', DEFAULT_MAX_DISTANCE), BANDS - 1,
+    )
+    window = timedelta(days=getattr(settings, 'PRESCRIPTION_DUPLICATE_WINDOW_DAYS', DEFAULT_WINDOW_DAYS))
+    matches_a_band = reduce(operator.or_, (
+        Q(band=band, value=value) for band, value in enumerate(bands(prescription.image_hash))
+    ))
+    candidates = (
+        PrescriptionHashBand.objects.filter(matches_a_band, user_id=prescription.user_id)
+        .filter(
+            prescription__created_at__gte=prescription.created_at - window,
+            prescription__created_at__lte=prescription.created_at + window,
+        )
+        .exclude(prescription_id=prescription.pk)
+        .values_list('prescription_id', 'prescription__image_hash', 'prescription__created_at')
+        .distinct()
+    )
+    found = []
+    for pk, image_hash, created_at in candidates:
+        gap = distance(prescription.image_hash, image_hash)
+        if gap <= max_distance:
+            found.append((gap, created_at, pk))
+    return found
+
+
+def is_earlier(match, prescription):
+    # Uploads made in the same instant are ordered by primary key
+    return match[1:] < (prescription.created_at, prescription.pk)
+
+
+def find_duplicate(prescription, found=None):
+    """The closest of the user's earlier prescriptions within the distance and window, or None."""
+    found = matches(prescription) if found is None else found
+    earlier = [match for match in found if is_earlier(match, prescription)]
+    return min(earlier)[2] if earlier else None
+
+
+@transaction.atomic
+def index(pk, image_hash):
+    """
+    Store a prescription's hash with its bands and flag it if it duplicates
+    an earlier one. Later uploads that were indexed first and not flagged
+    are flagged as duplicates of it.
+    """
+    prescription = Prescription.objects.only('pk', 'user_id', 'created_at').get(pk=pk)
+    prescription.image_hash = image_hash
+    PrescriptionHashBand.objects.filter(prescription_id=pk).delete()
+    PrescriptionHashBand.objects.bulk_create([
+        PrescriptionHashBand(prescription_id=pk, user_id=prescription.user_id, band=band, value=value)
+        for band, value in enumerate(bands(image_hash))
+    ])
+    found = matches(prescription)
+    duplicate_of = find_duplicate(prescription, found)
+    Prescription.objects.filter(pk=pk).update(image_hash=image_hash, duplicate_of=duplicate_of)
+    Prescription.objects.filter(
+        pk__in=[match[2] for match in found if not is_earlier(match, prescription)], duplicate_of__isnull=True,
+    ).update(duplicate_of=pk)
+    return duplicate_of
@@ -0,0 +1,119 @@
+# prescriptions/images.py
+
+"""
+Ingestion of uploaded prescription photos.
+
+Phone cameras upload multi-megabyte JPEGs with the orientation in EXIF and
+metadata such as the GPS position attached. After the upload is saved, a
+worker from the products.images pool decodes it, applies the EXIF rotation,
+caps its longest edge at PRESCRIPTION_IMAGE_MAX_EDGE pixels and writes it
+again as a progressive JPEG without metadata; that file replaces the upload.
+A review-size copy for pharmacists and a thumbnail are rendered from it, in
+WebP and JPEG, and recorded in `image_variants` as for catalog images. The
+image's perceptual hash is indexed for duplicate detection (see
+prescriptions/duplicates.py). `manage.py ingest_prescription_images`
+processes existing uploads.
+"""
+
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from products import images
+from . import duplicates
+from .models import Prescription
+
+logger = logging.getLogger(__name__)
+
+# Long enough an edge for handwriting to stay legible
+DEFAULT_MAX_EDGE = 2400
+QUALITY = 85
+SIZES = {'review': 1600, 'thumbnail': 320}
+
+
+def normalize(name):
+    """
+    Write an oriented, downscaled, metadata-free JPEG of the stored image
+    `name`; return its name and the image's perceptual hash.
+    """
+    max_edge = getattr(settings, 'PRESCRIPTION_IMAGE_MAX_EDGE', DEFAULT_MAX_EDGE)
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    # Scans stay greyscale; everything else is flattened to RGB
+    image = image.convert('L') if image.mode in ('1', 'L', 'I', 'I;16') else images.flatten(image)
+
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=QUALITY, optimize=True, progressive=True)
+    directory, filename = posixpath.split(name)
+    target = posixpath.join(directory, posixpath.splitext(filename)[0] + '.jpg')
+    return default_storage.save(target, ContentFile(buffer.getvalue())), duplicates.dhash(image)
+
+
+def process(name):
+    """Return (normalized name, variants, hash) for an upload, or None when it cannot be read."""
+    try:
+        normalized, image_hash = normalize(name)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not ingest prescription image {name}: {e}")
+        return None
+    variants = images.try_render(normalized, SIZES)
+    if variants is None:
+        default_storage.delete(normalized)
+        return None
+    return normalized, variants, image_hash
+
+
+def store(pk, name, normalized, variants, image_hash):
+    """Point the prescription at the processed files, unless its image changed meanwhile."""
+    previous = Prescription.objects.filter(pk=pk).values_list('image_variants', flat=True).first()
+    # A queryset update: no post_save, so the new name is not ingested again
+    if not Prescription.objects.filter(pk=pk, image=name).update(image=normalized, image_variants=variants):
+        default_storage.delete(normalized)
+        images.delete_files(variants)
+        return False
+    if previous:
+        images.delete_files(previous)
+    # Synthetic and migrated rows may share one file
+    if not Prescription.objects.filter(image=name).exists():
+        default_storage.delete(name)
+    duplicates.index(pk, image_hash)
+    return True
+
+
+def stored_hash(name):
+    """The perceptual hash of an already ingested image, or None when it cannot be read."""
+    try:
+        with default_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            image.draft('L', (64, 64))
+            return duplicates.dhash(image)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not hash prescription image {name}: {e}")
+        return None
+
+
+def ingest(pk, name):
+    processed = process(name)
+    return processed is not None and store(pk, name, *processed)
+
+
+def is_stale(prescription):
+    return prescription.image_variants.get('source') != (prescription.image.name or None)
+
+
+def schedule(prescription):
+    """Queue ingestion of a new or replaced upload once the current transaction commits."""
+    if not prescription.image.name or not is_stale(prescription):
+        return
+    pk, name = prescription.pk, prescription.image.name
+    transaction.on_commit(lambda: images.background(ingest, pk, name))
@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prescriptions import duplicates, images
+from prescriptions.models import Prescription
+
+
+class Command(BaseCommand):
+    help = "Compute perceptual hashes of ingested prescription images and flag duplicate uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Threads reading images in parallel.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+        # Images not ingested yet are hashed by ingest_prescription_images
+        queryset = (
+            Prescription.objects.filter(image_hash__isnull=True).exclude(image='')
+            .only('pk', 'image', 'image_variants').order_by('created_at', 'id')
+        )
+        pending = [
+            (prescription.pk, prescription.image.name)
+            for prescription in queryset.iterator()
+            if not images.is_stale(prescription)
+        ]
+
+        self.stdout.write(f"Hashing {len(pending)} prescription image(s)")
+        indexed = flagged = failed = 0
+        # Workers only read files; the index is written oldest first from this thread
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            hashes = executor.map(images.stored_hash, [name for _, name in pending])
+            for (pk, name), image_hash in zip(pending, hashes):
+                if image_hash is None:
+                    failed += 1
+                    self.stderr.write(f"  prescription {pk}: could not read {name}")
+                    continue
+                indexed += 1
+                if duplicates.index(pk, image_hash) is not None:
+                    flagged += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed}, flagged {flagged} duplicate(s), failed {failed}"))
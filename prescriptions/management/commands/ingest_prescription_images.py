@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prescriptions import images
+from prescriptions.models import Prescription
+
+
+class Command(BaseCommand):
+    help = "Normalize and compress prescription uploads that have not been processed, rendering their review copies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Threads processing images in parallel.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+        # Oldest first, so a duplicate is flagged against the earlier upload
+        queryset = Prescription.objects.exclude(image='').only('pk', 'image', 'image_variants').order_by('created_at', 'id')
+        pending = [
+            (prescription.pk, prescription.image.name)
+            for prescription in queryset.iterator()
+            if images.is_stale(prescription)
+        ]
+
+        self.stdout.write(f"Processing {len(pending)} prescription image(s)")
+        processed = failed = 0
+        # Workers only write files; results are stored from this thread
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = executor.map(images.process, [name for _, name in pending])
+            for (pk, name), result in zip(pending, results):
+                if result is not None and images.store(pk, name, *result):
+                    processed += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"  prescription {pk}: could not process {name}")
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed}, failed {failed}"))
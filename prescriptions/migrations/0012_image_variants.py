@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prescriptions', '0011_prescriptionorder_coupon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prescriptions', '0012_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='prescription_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prescriptions', '0013_status_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='prescriptions.prescription'),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='image_hash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='PrescriptionHashBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('value', models.PositiveSmallIntegerField()),
+                ('prescription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hash_bands', to='prescriptions.prescription')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'band', 'value'], name='prescription_hash_band_idx')],
+            },
+        ),
+    ]
@@ -3,6 +3,22 @@ from django.conf import settings
 from products.models import Product
 from django.utils import timezone
 from coupons.models import Coupon
+from users.models import Address
+
+
+class PrescriptionQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Load everything PrescriptionSerializer renders in a fixed number of
+        queries: one joined query for prescriptions, user and order, plus one
+        prefetch for items with their product and one for the users' addresses.
+        """
+        return self.select_related('user', 'order').prefetch_related(
+            models.Prefetch('items', queryset=PrescriptionItem.objects.select_related('product').order_by('id')),
+            models.Prefetch('user__addresses', queryset=Address.objects.order_by('id'), to_attr='ordered_addresses'),
+        )
+
+
 class Prescription(models.Model):
     STATUS_CHOICES = (
         ('Pending', 'Pending'),
@@ -13,16 +29,41 @@ class Prescription(models.Model):
     )
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='prescriptions/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See prescriptions/images.py
+    image_hash = models.BigIntegerField(null=True, blank=True, editable=False)  # See prescriptions/duplicates.py
+    duplicate_of = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='duplicates', editable=False,
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     payment_status = models.CharField(max_length=20, choices=[('Pending', 'Pending'), ('Completed', 'Completed')], default='Pending')
 
+    objects = PrescriptionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='prescription_queue_idx'),
+        ]
+
     def __str__(self):
         return f"Prescription by {self.user.email} - {self.status}"
 
 
+class PrescriptionHashBand(models.Model):
+    """One byte of a prescription's image hash, indexed for duplicate lookups; see prescriptions/duplicates.py."""
+    prescription = models.ForeignKey(Prescription, related_name='hash_bands', on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    band = models.PositiveSmallIntegerField()
+    value = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'band', 'value'], name='prescription_hash_band_idx'),
+        ]
+
+
 class PrescriptionItem(models.Model):
     prescription = models.ForeignKey(Prescription, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
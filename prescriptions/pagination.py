@@ -0,0 +1,12 @@
+# prescriptions/pagination.py
+
+from settings.pagination import FeedCursorPagination
+
+
+class ReviewQueueCursorPagination(FeedCursorPagination):
+    """
+    Prescriptions by (created_at, id), oldest first, so pharmacists work
+    through the queue in arrival order; each page is a range scan of the
+    (status, created_at, id) index.
+    """
+    ordering = ('created_at', 'id')
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Prescription, PrescriptionItem, PrescriptionOrder
 from products.models import Product
+from products.serializers import ImageVariantsField
 from users.serializers import AddressSerializer
 from users.models import Address
 class ProductSerializer(serializers.ModelSerializer):
@@ -33,11 +34,12 @@ class PrescriptionSerializer(serializers.ModelSerializer):
     mobile_number = serializers.CharField(source='user.phone_number', read_only=True)
     address = serializers.SerializerMethodField()
     order = serializers.SerializerMethodField()
+    image_urls = ImageVariantsField()
 
     class Meta:
         model = Prescription
-        fields = ['id', 'user', 'image','user_name','mobile_number', 'address', 'status', 'items', 'created_at', 'total_amount', 'payment_status', 'order']
-        read_only_fields = ['status', 'created_at', 'total_amount', 'payment_status', 'mobile_number']
+        fields = ['id', 'user', 'image', 'image_urls','user_name','mobile_number', 'address', 'status', 'items', 'created_at', 'total_amount', 'payment_status', 'order', 'duplicate_of']
+        read_only_fields = ['status', 'created_at', 'total_amount', 'payment_status', 'mobile_number', 'duplicate_of']
 
     
     def get_order(self, obj):
@@ -48,9 +50,12 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         except PrescriptionOrder.DoesNotExist:
             return None
     def get_address(self, obj):
-        # Fetch the default address for the user
-        user = obj.user
-        address = user.addresses.first()  # Assuming the first address is the default
+        # The user's first address is the default; with_details() prefetches
+        # them in id order as `ordered_addresses`.
+        addresses = getattr(obj.user, 'ordered_addresses', None)
+        if addresses is None:
+            addresses = obj.user.addresses.order_by('id')[:1]
+        address = addresses[0] if addresses else None
         if address:
             return AddressSerializer(address).data
         return None
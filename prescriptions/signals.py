@@ -0,0 +1,18 @@
+# prescriptions/signals.py
+
+"""
+Receivers that process uploaded prescription images; see
+prescriptions/images.py. Connected in PrescriptionsConfig.ready().
+"""
+
+from . import images
+
+
+def image_saved(sender, instance, **kwargs):
+    images.schedule(instance)
+
+
+def connect():
+    from django.db.models.signals import post_save
+
+    post_save.connect(image_saved, sender='prescriptions.Prescription', dispatch_uid='prescription_image_saved')
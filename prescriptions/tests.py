@@ -1,3 +1,364 @@
-from django.test import TestCase
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from users.models import Address, User
+from . import approvals, duplicates
+from .models import Prescription, PrescriptionHashBand, PrescriptionItem, PrescriptionOrder
+
+
+class PrescriptionItemByNameTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='pharmacist@example.com', username='pharmacist', password='pass',
+            name='Pharmacist', phone_number='9876543210',
+        )
+        category = Category.objects.create(name='Antibiotics')
+        cls.tablet = Product.objects.create(
+            category=category, name='Azithromycin 500mg', price=Decimal('90.00'), stock=10,
+        )
+        cls.syrup = Product.objects.create(
+            category=category, name='Azithromycin Syrup', price=Decimal('70.00'), stock=10,
+        )
+        cls.prescription = Prescription.objects.create(user=cls.admin, image='prescriptions/test.jpg')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_item(self, name):
+        url = reverse('prescription-items', args=[self.prescription.id])
+        return self.client.post(url, {'product_name': name, 'quantity': 2}, format='json')
+
+    def test_misspelt_name_returns_suggestions(self):
+        response = self.add_item('azitromycin')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([s['id'] for s in response.data['suggestions']], [self.tablet.id, self.syrup.id])
+
+    def test_exact_name_adds_the_item(self):
+        response = self.add_item('azithromycin 500MG')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.prescription.items.get().product, self.tablet)
+
+    def test_autocomplete_tolerates_typos(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('product-autocomplete'), {'q': 'azithromicin syr'})
+
+        self.assertEqual([int(r['id']) for r in response.json()['results']], [self.syrup.id])
+
+
+def phone_photo(size=(3000, 1000)):
+    """A JPEG stored sideways with an EXIF rotation and camera metadata, as phones upload them."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+    exif[0x010F] = 'PhoneMaker'
+    buffer = BytesIO()
+    Image.new('RGB', size, (240, 240, 230)).save(buffer, format='JPEG', quality=98, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_DERIVATIVE_WORKERS=0)
+class PrescriptionImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='patient@example.com', username='patient', password='pass',
+            name='Patient', phone_number='9876543210',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def assertNormalized(self, prescription):
+        with default_storage.open(prescription.image.name) as file:
+            image = Image.open(file)
+            self.assertEqual((image.format, image.size), ('JPEG', (800, 2400)))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(prescription.image_variants['source'], prescription.image.name)
+        for size, expected in (('review', (533, 1600)), ('thumbnail', (107, 320))):
+            with default_storage.open(prescription.image_variants[size]['webp']) as file:
+                self.assertEqual(Image.open(file).size, expected)
+
+    def test_upload_is_oriented_stripped_and_recompressed(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('IMG_0001.jpg', phone_photo(), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('prescription-list'), {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        prescription = Prescription.objects.get()
+        self.assertNormalized(prescription)
+        self.assertNotEqual(prescription.image.name, 'prescriptions/IMG_0001.jpg')
+        self.assertFalse(default_storage.exists('prescriptions/IMG_0001.jpg'))  # The raw upload is removed
+
+        data = client.get(reverse('prescription-detail', args=[prescription.pk])).json()
+        self.assertTrue(data['image_urls']['review']['jpeg'].endswith('/review.jpeg'))
+
+    def test_backfill_command_processes_existing_uploads(self):
+        raw_name = default_storage.save('prescriptions/old.jpg', ContentFile(phone_photo()))
+        prescription = Prescription.objects.create(user=self.user, image='prescriptions/old.jpg')
+        Prescription.objects.filter(pk=prescription.pk).update(image=raw_name, image_variants={})
+        broken = Prescription.objects.create(user=self.user, image='prescriptions/missing.jpg')
+        Prescription.objects.filter(pk=broken.pk).update(image_variants={})
+
+        out = StringIO()
+        with self.assertLogs('prescriptions.images', 'WARNING'):
+            call_command('ingest_prescription_images', '--workers', '1', stdout=out, stderr=StringIO())
+
+        prescription.refresh_from_db()
+        self.assertNormalized(prescription)
+        self.assertFalse(default_storage.exists(raw_name))
+        self.assertIn('Processed 1, failed 1', out.getvalue())
+
+
+class PrescriptionReviewQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='reviewer@example.com', username='reviewer', password='pass',
+            name='Reviewer', phone_number='9876543210',
+        )
+        category = Category.objects.create(name='Antibiotics')
+        cls.product = Product.objects.create(category=category, name='Amoxicillin', price=Decimal('45.00'), stock=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_prescriptions(self, count, status='Pending'):
+        created = []
+        for _ in range(count):
+            index = User.objects.count()
+            user = User.objects.create_user(
+                email=f'patient{index}@example.com', username=f'patient{index}', password='pass',
+                name=f'Patient {index}', phone_number=f'98765{index:05d}',
+            )
+            Address.objects.create(user=user, address_type='home', city='Pune')
+            Address.objects.create(user=user, address_type='office', city='Mumbai')
+            prescription = Prescription.objects.create(user=user, image='prescriptions/test.jpg', status=status)
+            PrescriptionItem.objects.create(prescription=prescription, product=self.product, quantity=2)
+            created.append(prescription)
+        return created
+
+    def test_query_count_is_independent_of_page_size(self):
+        url = reverse('prescription-review-queue')
+        first = self.create_prescriptions(2)
+        PrescriptionOrder.objects.create(prescription=first[0], total_amount=Decimal('90.00'))
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.create_prescriptions(10)
+        self.create_prescriptions(2, status='Approved')
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        results = response.data['results']
+        self.assertEqual(len(results), 12)
+        self.assertEqual(results[0]['id'], first[0].id)  # Oldest first
+        self.assertEqual(results[0]['address']['city'], 'Pune')
+        self.assertEqual(results[0]['items'][0]['total_price'], '90.00')
+        self.assertEqual(results[0]['order']['prescription_items'][0]['quantity'], 2)
+        self.assertIsNone(results[1]['order'])
+
+    def test_cursor_pages_walk_the_queue_in_order(self):
+        expected = [prescription.id for prescription in self.create_prescriptions(5)]
+        seen = []
+        url = reverse('prescription-review-queue') + '?page_size=2'
+        while url:
+            data = self.client.get(url).data
+            seen += [result['id'] for result in data['results']]
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+    def test_patients_cannot_see_the_queue(self):
+        patient = self.create_prescriptions(1)[0].user
+        self.client.force_authenticate(patient)
+        self.assertEqual(self.client.get(reverse('prescription-review-queue')).status_code, 403)
+
+
+class PrescriptionApprovalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='approver@example.com', username='approver', password='pass',
+            name='Approver', phone_number='9876543210',
+        )
+        category = Category.objects.create(name='Antibiotics')
+        cls.tablet = Product.objects.create(category=category, name='Amoxicillin', price=Decimal('45.50'), stock=10)
+        cls.syrup = Product.objects.create(category=category, name='Cough Syrup', price=Decimal('80.00'), stock=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_prescriptions(self, count, items=True, **fields):
+        prescriptions = Prescription.objects.bulk_create([
+            Prescription(user=self.admin, image='prescriptions/test.jpg', **fields) for _ in range(count)
+        ])
+        if items:
+            PrescriptionItem.objects.bulk_create([
+                PrescriptionItem(prescription=prescription, product=product, quantity=quantity)
+                for prescription in prescriptions
+                for product, quantity in ((self.tablet, 2), (self.syrup, 1))
+            ])
+        return [prescription.pk for prescription in prescriptions]
+
+    def test_batch_endpoint_approves_pending_and_reports_the_rest(self):
+        pending = self.create_prescriptions(2)
+        empty = self.create_prescriptions(1, items=False)
+        approved = self.create_prescriptions(1, status='Approved')
+        response = self.client.post(
+            reverse('prescription-approve-batch'), {'ids': pending + empty + approved + [999999]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['approved']], pending)
+        self.assertEqual(
+            {row['id']: row['detail'] for row in response.data['skipped']},
+            {empty[0]: approvals.NO_ITEMS, approved[0]: approvals.ALREADY_PROCESSED, 999999: approvals.NOT_FOUND},
+        )
+        for pk in pending:
+            prescription = Prescription.objects.get(pk=pk)
+            self.assertEqual((prescription.status, prescription.total_amount), ('Approved', Decimal('171.00')))
+            self.assertEqual(prescription.order.total_amount, Decimal('171.00'))
+
+        # Approving again is refused without creating a second order
+        response = self.client.post(reverse('prescription-approve', args=[pending[0]]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PrescriptionOrder.objects.count(), 2)
+
+    def test_query_count_is_independent_of_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            approvals.approve(self.create_prescriptions(2))
+        with CaptureQueriesContext(connection) as large:
+            result = approvals.approve(self.create_prescriptions(40))
+        self.assertEqual(len(result.orders), 40)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_admin_action_uses_the_same_service(self):
+        ids = self.create_prescriptions(3) + self.create_prescriptions(1, items=False)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:prescriptions_prescription_changelist'), {
+            'action': 'approve_prescription', '_selected_action': ids,
+        }, follow=True)
+        self.assertContains(response, '3 prescription(s) approved')
+        self.assertContains(response, approvals.NO_ITEMS)
+        self.assertEqual(Prescription.objects.filter(status='Approved').count(), 3)
+        self.assertEqual(PrescriptionOrder.objects.count(), 3)
+
+
+def prescription_sheet(seed, scale=1.0, quality=90):
+    """A document-like JPEG; the same seed at another scale or quality is the same sheet photographed again."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (1200, 1600), 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y, grey = rng.randrange(1100), rng.randrange(1500), rng.randrange(200)
+        draw.rectangle([x, y, x + rng.randrange(50, 400), y + rng.randrange(20, 200)], fill=(grey, grey, grey))
+    buffer = BytesIO()
+    image.resize((int(1200 * scale), int(1600 * scale))).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_DERIVATIVE_WORKERS=0)
+class DuplicatePrescriptionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='repeat@example.com', username='repeat', password='pass',
+            name='Repeat', phone_number='9876543210',
+        )
+        cls.other = User.objects.create_user(
+            email='someone@example.com', username='someone', password='pass',
+            name='Someone', phone_number='9876543211',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def upload(self, user, content):
+        client = APIClient()
+        client.force_authenticate(user)
+        upload = SimpleUploadedFile('sheet.jpg', content, content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('prescription-list'), {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return Prescription.objects.get(pk=response.data['id'])
+
+    def test_reupload_of_the_same_sheet_is_flagged(self):
+        original = self.upload(self.user, prescription_sheet(1))
+        different = self.upload(self.user, prescription_sheet(2))
+        again = self.upload(self.user, prescription_sheet(1, scale=0.7, quality=60))
+        elsewhere = self.upload(self.other, prescription_sheet(1))
+
+        self.assertIsNotNone(original.image_hash)
+        self.assertLessEqual(duplicates.distance(original.image_hash, again.image_hash), duplicates.DEFAULT_MAX_DISTANCE)
+        self.assertEqual(
+            [p.duplicate_of_id for p in (original, different, again, elsewhere)],
+            [None, None, original.pk, None],
+        )
+        self.assertEqual(original.hash_bands.count(), duplicates.BANDS)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser(
+            email='checker@example.com', username='checker', password='pass', name='Checker', phone_number='9876543212',
+        ))
+        queue = client.get(reverse('prescription-review-queue')).data['results']
+        self.assertEqual({row['id']: row['duplicate_of'] for row in queue}[again.pk], original.pk)
+
+    def test_only_recent_prescriptions_count(self):
+        old = self.upload(self.user, prescription_sheet(3))
+        Prescription.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=365))
+        self.assertIsNone(self.upload(self.user, prescription_sheet(3)).duplicate_of_id)
+
+    def test_earlier_upload_indexed_last_is_still_the_original(self):
+        original = self.upload(self.user, prescription_sheet(5))
+        again = self.upload(self.user, prescription_sheet(5, quality=50))
+        hashes = dict(Prescription.objects.values_list('pk', 'image_hash'))
+        Prescription.objects.update(image_hash=None, duplicate_of=None)
+        PrescriptionHashBand.objects.all().delete()
+
+        self.assertIsNone(duplicates.index(again.pk, hashes[again.pk]))
+        self.assertIsNone(duplicates.index(original.pk, hashes[original.pk]))
+
+        original.refresh_from_db()
+        again.refresh_from_db()
+        self.assertEqual((original.duplicate_of_id, again.duplicate_of_id), (None, original.pk))
+
+    def test_backfill_command_hashes_ingested_images(self):
+        first = self.upload(self.user, prescription_sheet(4))
+        second = self.upload(self.user, prescription_sheet(4, quality=50))
+        Prescription.objects.update(image_hash=None, duplicate_of=None)
+        first.hash_bands.all().delete()
+        second.hash_bands.all().delete()
+
+        out = StringIO()
+        call_command('index_prescription_hashes', '--workers', '2', stdout=out)
+        self.assertIn('Indexed 2, flagged 1 duplicate(s), failed 0', out.getvalue())
+        second.refresh_from_db()
+        self.assertEqual(second.duplicate_of_id, first.pk)
 
-# Create your tests here.
@@ -3,14 +3,18 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Prescription, PrescriptionItem, PrescriptionOrder
 from .serializers import PrescriptionSerializer, PrescriptionOrderSerializer
+from .pagination import ReviewQueueCursorPagination
+from . import approvals
 from products.models import Product
+from products import matcher
 from coupons.models import Coupon
 from decimal import Decimal
 from dal import autocomplete
 import hmac
 import hashlib
-import razorpay
 from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from orders import gateway
 
 
 import logging
@@ -28,18 +32,44 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user, image=image)
 
     def get_queryset(self):
-        return Prescription.objects.filter(user=self.request.user)
+        return Prescription.objects.filter(user=self.request.user).with_details()
+
+    @action(detail=False, methods=['get'], url_path='review-queue', permission_classes=[permissions.IsAdminUser])
+    def review_queue(self, request):
+        """
+        Pending prescriptions of all users, oldest first, with user, default
+        address, items and order. Cursor paginated; the page is loaded in a
+        fixed number of queries.
+        """
+        queryset = Prescription.objects.filter(status='Pending').with_details()
+        paginator = ReviewQueueCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'], url_path='items', permission_classes=[permissions.IsAdminUser])
     def items(self, request, pk=None):
         """
         Add an item to a prescription.
+
+        Accepts either `product_id`, or `product_name` as typed from the
+        prescription; a name that does not match one product exactly returns
+        the closest matches as suggestions.
         """
         try:
             prescription = self.get_object()
             product_id = request.data.get('product_id')
+            product_name = request.data.get('product_name', '').strip()
             quantity = int(request.data.get('quantity', 1))
 
+            if not product_id and product_name:
+                product_id, suggestions = resolve_product_name(product_name)
+                if not product_id:
+                    return Response(
+                        {"detail": "No exact product match.", "suggestions": suggestions},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
             if not product_id:
                 return Response({"detail": "Product ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -85,32 +115,35 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def approve(self, request, pk=None):
         prescription = self.get_object()
-        if prescription.status != 'Pending':
-            return Response({'detail': 'Prescription has already been processed'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not prescription.items.exists():
-            return Response({'detail': 'No items found in the prescription.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Approve the prescription
-        prescription.status = 'Approved'
-        total_amount = sum(item.product.price * item.quantity for item in prescription.items.all())
-        prescription.total_amount = total_amount
-        prescription.payment_status = 'Pending'
-        prescription.save()
-
-        # Create PrescriptionOrder with calculated total amount
-        order = PrescriptionOrder.objects.create(
-            prescription=prescription,
-            total_amount=total_amount,
-            payment_status='Pending'
-        )
+        result = approvals.approve([prescription.pk])
+        if prescription.pk in result.skipped:
+            return Response({'detail': result.skipped[prescription.pk]}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             'status': 'Prescription Approved and Order Created. Total Amount Calculated',
-            'order_id': order.id
+            'order_id': result.orders[prescription.pk].id
         }, status=status.HTTP_200_OK)
 
-    
+    @action(detail=False, methods=['post'], url_path='approve-batch', permission_classes=[permissions.IsAdminUser])
+    def approve_batch(self, request):
+        """
+        Approve several prescriptions at once: {"ids": [...]}. Returns the
+        approved ones with their order, and the skipped ones with the reason.
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'detail': 'ids must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > approvals.MAX_BATCH_SIZE:
+            return Response(
+                {'detail': f'At most {approvals.MAX_BATCH_SIZE} prescriptions can be approved at once.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            result = approvals.approve(ids)
+        except (TypeError, ValueError):
+            return Response({'detail': 'ids must be prescription ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_data(), status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def reject(self, request, pk=None):
         prescription = self.get_object()
@@ -145,18 +178,13 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
             return Response({'status': 'Payment completed via Wallet.'}, status=status.HTTP_200_OK)
 
         elif payment_method == 'Razorpay':
-            # Create Razorpay client
-            client = razorpay.Client(auth=(settings.RAZORPAY_API_KEY, settings.RAZORPAY_API_SECRET))
-
-            # Convert the total amount from rupees to paise
-            amount_in_paise = int(prescription.total_amount * 100)
-
-            # Create an order on Razorpay
-            razorpay_order = client.order.create({
-                'amount': amount_in_paise,  # Razorpay expects amount in paise
-                'currency': 'INR',
-                'payment_capture': '1'
-            })
+            # Create an order on Razorpay through the shared gateway client
+            try:
+                razorpay_order = gateway.create_order(prescription.total_amount, receipt=f"prescription-{prescription.id}")
+            except gateway.GatewayRejected as e:
+                return Response({'detail': 'Razorpay order creation failed', 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except gateway.GatewayUnavailable:
+                return Response({'detail': 'Payment gateway unavailable.'}, status=status.HTTP_502_BAD_GATEWAY)
 
             # Save the Razorpay order ID and other details in PrescriptionOrder
             PrescriptionOrder.objects.create(
@@ -322,13 +350,12 @@ class PrescriptionOrderViewSet(viewsets.ModelViewSet):
             return Response({'status': 'Payment completed via Wallet.', 'final_amount': order.total_amount}, status=status.HTTP_200_OK)
 
         elif payment_method == 'Razorpay':
-            client = razorpay.Client(auth=(settings.RAZORPAY_API_KEY, settings.RAZORPAY_API_SECRET))
-            amount_in_paise = int(order.total_amount * 100)
-            razorpay_order = client.order.create({
-                'amount': amount_in_paise,
-                'currency': 'INR',
-                'payment_capture': '1'
-            })
+            try:
+                razorpay_order = gateway.create_order(order.total_amount, receipt=f"prescription-order-{order.id}")
+            except gateway.GatewayRejected as e:
+                return Response({'detail': 'Razorpay order creation failed', 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except gateway.GatewayUnavailable:
+                return Response({'detail': 'Payment gateway unavailable.'}, status=status.HTTP_502_BAD_GATEWAY)
 
             order.razorpay_order_id = razorpay_order['id']
             order.payment_method = 'Razorpay'
@@ -382,6 +409,32 @@ class RazorpayPaymentVerificationView(viewsets.ViewSet):
         else:
             return Response({'detail': 'Invalid payment signature.'}, status=status.HTTP_400_BAD_REQUEST)
 
+SUGGESTION_LIMIT = 5
+AUTOCOMPLETE_LIMIT = 50
+
+
+def resolve_product_name(name):
+    """
+    Return (product id, suggestions) for a typed product name. The id is set
+    only when exactly one product's name equals `name`, ignoring case and
+    punctuation; otherwise suggestions lists the closest matches.
+    """
+    matches = matcher.match(name, limit=SUGGESTION_LIMIT)
+    products = Product.objects.in_bulk(matches)
+    wanted = matcher.words_of(name)
+    exact = [pk for pk in matches if pk in products and matcher.words_of(products[pk].name) == wanted]
+    if len(exact) == 1:
+        return exact[0], []
+    return None, [{"id": pk, "name": products[pk].name} for pk in matches if pk in products]
+
+
+def ordered_by_ids(queryset, ids):
+    """Filter `queryset` to `ids`, keeping the order of `ids`."""
+    return queryset.filter(id__in=ids).order_by(
+        Case(*[When(id=pk, then=Value(position)) for position, pk in enumerate(ids)], output_field=IntegerField())
+    )
+
+
 class ProductAutocomplete(autocomplete.Select2QuerySetView):
     def get_queryset(self):
         if not self.request.user.is_authenticated:
@@ -390,6 +443,7 @@ class ProductAutocomplete(autocomplete.Select2QuerySetView):
         qs = Product.objects.all()
 
         if self.q:
-            qs = qs.filter(name__icontains=self.q)
+            # Typo-tolerant, in-memory match instead of an icontains scan
+            qs = ordered_by_ids(qs, matcher.match(self.q, limit=AUTOCOMPLETE_LIMIT))
 
         return qs
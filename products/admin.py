@@ -2,8 +2,10 @@
 
 from django.contrib import admin
 from django.urls import path
-from .models import Category, SubCategory, Brand, Product, ProductAttribute
-from .admin_views import upload_subcategories_csv, upload_products_csv
+from .models import Category, SubCategory, Brand, Product, ProductAttribute, ImportJob
+from .admin_views import upload_subcategories_csv, upload_products_csv, import_job_progress, import_job_status
+from . import search
+from .exports import ProductExporter
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -52,6 +54,13 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('category', 'subcategory', 'brand')
     ordering = ('id',)
     inlines = [ProductAttributeInline]  # Inline attributes
+    actions = ['export_csv', 'export_ndjson']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans over four joins
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_queryset(queryset, search_term), False
 
     def get_urls(self):
         urls = super().get_urls()
@@ -62,4 +71,44 @@ class ProductAdmin(admin.ModelAdmin):
 
     change_list_template = "admin/products/product_changelist.html"
 
+    # Actions streaming the selected products with their attributes
+    def export_csv(self, request, queryset):
+        return ProductExporter(queryset).response('csv', 'products')
+
+    export_csv.short_description = "Export selected products as CSV"
+
+    def export_ndjson(self, request, queryset):
+        return ProductExporter(queryset).response('ndjson', 'products')
+
+    export_ndjson.short_description = "Export selected products as NDJSON"
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'rows_processed', 'total_rows', 'success_count', 'error_count', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = (
+        'kind', 'file', 'status', 'total_rows', 'rows_processed', 'success_count', 'error_count', 'errors',
+        'last_error', 'attempts', 'lease_expires_at', 'created_by', 'created_at', 'started_at', 'finished_at',
+    )
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        # Jobs are created by the CSV upload pages
+        return False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:job_id>/progress/', self.admin_site.admin_view(import_job_progress), name='products_importjob_progress'),
+            path('<int:job_id>/status/', self.admin_site.admin_view(import_job_status), name='products_importjob_status'),
+        ]
+        return custom_urls + urls
+
+    # Action to requeue failed jobs; they resume after their last committed chunk
+    def retry_jobs(self, request, queryset):
+        retried = queryset.filter(status='Failed').update(status='Pending', attempts=0, finished_at=None)
+        self.message_user(request, f"{retried} import job(s) queued for retry.")
+
+    retry_jobs.short_description = "Retry selected failed import jobs"
+
 # Registering ProductAttribute model is optional here, as it's included inline with Product
@@ -0,0 +1,64 @@
+# products/exports.py
+
+"""
+Streaming catalog exports; see settings/exports.py for the mechanics.
+
+NDJSON has one product per line with its attributes nested. CSV is flat:
+ProductExporter writes one row per product with its attributes as a JSON
+list, in the columns the CSV importer reads, so an export can be edited and
+uploaded again.
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from settings.exports import Exporter
+from .models import ProductAttribute
+
+
+class ProductExporter(Exporter):
+    header = (
+        'ID', 'Name', 'Category', 'Subcategory', 'Brand', 'Description', 'Price', 'Stock', 'Image',
+        'Attributes', 'Created At',
+    )
+
+    def prepare(self, queryset):
+        return queryset.select_related('category', 'subcategory', 'brand').prefetch_related(
+            Prefetch('attributes', queryset=ProductAttribute.objects.order_by('id'))
+        ).order_by('id')
+
+    def record(self, product):
+        return {
+            'id': product.id,
+            'name': product.name,
+            'category': product.category.name,
+            'subcategory': product.subcategory.name if product.subcategory else None,
+            'brand': product.brand.name if product.brand else None,
+            'description': product.description or '',
+            'price': product.price,
+            'stock': product.stock,
+            'image': product.image.name or None,
+            'attributes': [
+                {
+                    'id': attribute.id,
+                    'name': attribute.name,
+                    'value': attribute.value,
+                    'additional_price': attribute.additional_price,
+                }
+                for attribute in product.attributes.all()
+            ],
+            'created_at': product.created_at,
+        }
+
+    def rows(self, record):
+        attributes = [
+            {key: value for key, value in attribute.items() if key != 'id'} for attribute in record['attributes']
+        ]
+        yield (
+            record['id'], record['name'], record['category'], record['subcategory'] or '', record['brand'] or '',
+            record['description'], record['price'], record['stock'], record['image'] or '',
+            json.dumps(attributes, cls=DjangoJSONEncoder) if attributes else '',
+            record['created_at'].isoformat() if record['created_at'] else '',
+        )
@@ -0,0 +1,348 @@
+# products/facets.py
+
+"""
+In-memory facet index for the product listing.
+
+For every facet value (a category, subcategory, brand, price band, or
+in/out of stock) the index holds the set of product ids that have it, and a
+bitmap of the same ids as a Python int with bit n set for product id n.
+Counts for a filtered listing are popcounts of ANDed bitmaps, which take
+microseconds even at 100k products, instead of a GROUP BY over the product
+table per request. Facet counts for a dimension ignore that dimension's own
+filter, so a client can show how many products each alternative would return.
+
+The sets are the source of truth; bitmaps are built from them once and then
+updated bit by bit alongside the sets. Arbitrary price ranges are answered
+from products sorted by price, cut into blocks with one bitmap each.
+
+The index is built on first use in each process. Product and catalog-label
+signals, and the stock_changed signal sent by checkout, update it in place
+once their transaction commits, so a rolled-back save never reaches it. A
+change that alters a product's facet values (its labels, price, or whether it
+is in stock) bumps a version number stored in the database (IndexVersion), so
+every process sees it whatever the cache backend, and other processes rebuild
+their index on their next listing request; the rebuild runs in one request
+while others keep using the previous index. Stock changes that leave a
+product in stock do not bump it.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+
+DIMENSIONS = ('category', 'subcategory', 'brand')
+VERSION_NAME = 'facets'
+DEFAULT_PRICE_BANDS = (0, 100, 250, 500, 1000)
+PRICE_BLOCK_SIZE = 512
+
+
+def price_bands():
+    """Return [(low, high)] bands; the last band has no upper bound."""
+    edges = [Decimal(str(edge)) for edge in getattr(settings, 'PRODUCT_PRICE_BANDS', DEFAULT_PRICE_BANDS)]
+    return list(zip(edges, edges[1:] + [None]))
+
+
+def to_bitmap(ids):
+    """Return an int with bit n set for every n in `ids`."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray((max(ids) >> 3) + 1)
+    for product_id in ids:
+        buffer[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class ProductFacetIndex:
+    def __init__(self, bands=None):
+        self.bands = bands or price_bands()
+        self.band_edges = [low for low, _ in self.bands]
+        self.products = {}  # product id -> (category, subcategory, brand, price, in stock)
+        self.values = {dimension: defaultdict(set) for dimension in DIMENSIONS + ('price', 'in_stock')}
+        self.bitmaps = {}  # (dimension, value) -> bitmap of the value's set
+        self.by_price = []  # sorted (price, product id)
+        self.price_blocks = None  # bitmaps of by_price[i:i + PRICE_BLOCK_SIZE], built lazily
+        self.names = {dimension: {} for dimension in DIMENSIONS}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.products)
+
+    def band_of(self, price):
+        return max(bisect.bisect_right(self.band_edges, price) - 1, 0)
+
+    def build(self, rows):
+        """Load (id, category, subcategory, brand, price, stock) rows into an empty index."""
+        with self.lock:
+            for row in rows:
+                self.add(*row, keep_sorted=False)
+            self.by_price.sort()
+            for dimension, values in self.values.items():
+                for value in values:
+                    self.bitmap(dimension, value)
+            self.price_range_bitmap()
+
+    def _entry_values(self, entry):
+        category_id, subcategory_id, brand_id, price, in_stock = entry
+        return (
+            ('category', category_id), ('subcategory', subcategory_id), ('brand', brand_id),
+            ('price', self.band_of(price)), ('in_stock', in_stock),
+        )
+
+    def add(self, product_id, category_id, subcategory_id, brand_id, price, stock, keep_sorted=True):
+        """Index a product, or update it; returns False when its facet values are unchanged."""
+        with self.lock:
+            price = Decimal(price)
+            entry = (category_id, subcategory_id, brand_id, price, stock > 0)
+            previous = self.products.get(product_id)
+            if previous == entry:
+                return False
+            # A stock or label change keeps the product's place in price order
+            same_price = previous is not None and previous[3] == price
+            self.remove(product_id, keep_price_order=same_price)
+            self.products[product_id] = entry
+            bit = 1 << product_id
+            for key in self._entry_values(entry):
+                self.values[key[0]][key[1]].add(product_id)
+                if key in self.bitmaps:
+                    self.bitmaps[key] |= bit
+            if same_price:
+                return True
+            if keep_sorted:
+                bisect.insort(self.by_price, (price, product_id))
+            else:
+                self.by_price.append((price, product_id))
+            self.price_blocks = None
+            return True
+
+    def remove(self, product_id, keep_price_order=False):
+        """Drop a product; returns False when it was not indexed."""
+        with self.lock:
+            entry = self.products.pop(product_id, None)
+            if entry is None:
+                return False
+            mask = ~(1 << product_id)
+            for key in self._entry_values(entry):
+                self.values[key[0]][key[1]].discard(product_id)
+                if key in self.bitmaps:
+                    self.bitmaps[key] &= mask
+            if not keep_price_order:
+                index = bisect.bisect_left(self.by_price, (entry[3], product_id))
+                if index < len(self.by_price) and self.by_price[index] == (entry[3], product_id):
+                    del self.by_price[index]
+                self.price_blocks = None
+            return True
+
+    def set_name(self, dimension, value_id, name):
+        """Record a label's name; returns False when it is unchanged."""
+        if self.names[dimension].get(value_id) == name:
+            return False
+        self.names[dimension][value_id] = name
+        return True
+
+    def clear_value(self, dimension, value_id):
+        """Products lose a deleted brand or subcategory (on_delete=SET_NULL)."""
+        with self.lock:
+            self.names[dimension].pop(value_id, None)
+            position = DIMENSIONS.index(dimension)
+            for product_id in list(self.values[dimension].pop(value_id, ())):
+                entry = list(self.products[product_id])
+                entry[position] = None
+                self.products[product_id] = tuple(entry)
+                self.values[dimension][None].add(product_id)
+            self.bitmaps.pop((dimension, value_id), None)
+            self.bitmaps.pop((dimension, None), None)
+
+    def bitmap(self, dimension, value):
+        key = (dimension, value)
+        if key not in self.bitmaps:
+            self.bitmaps[key] = to_bitmap(self.values[dimension].get(value, ()))
+        return self.bitmaps[key]
+
+    def price_range_bitmap(self, min_price=None, max_price=None):
+        if self.price_blocks is None:
+            self.price_blocks = [
+                to_bitmap(product_id for _, product_id in self.by_price[start:start + PRICE_BLOCK_SIZE])
+                for start in range(0, len(self.by_price), PRICE_BLOCK_SIZE)
+            ]
+        low = 0 if min_price is None else bisect.bisect_left(self.by_price, (min_price,))
+        high = len(self.by_price) if max_price is None else bisect.bisect_right(self.by_price, (max_price, float('inf')))
+        if high <= low:
+            return 0
+        first_block = -(-low // PRICE_BLOCK_SIZE)
+        last_block = high // PRICE_BLOCK_SIZE
+        if first_block >= last_block:
+            return to_bitmap(product_id for _, product_id in self.by_price[low:high])
+        bits = to_bitmap(
+            product_id for _, product_id in
+            self.by_price[low:first_block * PRICE_BLOCK_SIZE] + self.by_price[last_block * PRICE_BLOCK_SIZE:high]
+        )
+        for block in self.price_blocks[first_block:last_block]:
+            bits |= block
+        return bits
+
+    def selections(self, filters):
+        """Return {dimension: bitmap allowed by that dimension's filter} for the filtered dimensions."""
+        selected = {}
+        for dimension in DIMENSIONS:
+            if filters.get(dimension):
+                bits = 0
+                for value in filters[dimension]:
+                    bits |= self.bitmap(dimension, value)
+                selected[dimension] = bits
+        if filters.get('in_stock') is not None:
+            selected['in_stock'] = self.bitmap('in_stock', filters['in_stock'])
+        if filters.get('min_price') is not None or filters.get('max_price') is not None:
+            selected['price'] = self.price_range_bitmap(filters.get('min_price'), filters.get('max_price'))
+        return selected
+
+    def matching_bitmap(self, filters, ignore=None, selected=None):
+        """
+        Return the bitmap of products matching `filters`, skipping the
+        `ignore` dimension, or None when nothing restricts the result.
+        """
+        if selected is None:
+            selected = self.selections(filters)
+        bits = None
+        for dimension, allowed in selected.items():
+            if dimension != ignore:
+                bits = allowed if bits is None else bits & allowed
+        return bits
+
+    def counts(self, filters):
+        """Return facet counts for every dimension under `filters`."""
+        with self.lock:
+            def count(dimension, value, base):
+                bits = self.bitmap(dimension, value)
+                return (bits if base is None else bits & base).bit_count()
+
+            selected = self.selections(filters)
+            facets = {}
+            for dimension in DIMENSIONS:
+                base = self.matching_bitmap(filters, ignore=dimension, selected=selected)
+                values = []
+                for value, ids in self.values[dimension].items():
+                    matched = count(dimension, value, base) if value is not None and ids else 0
+                    if matched:
+                        values.append({'id': value, 'name': self.names[dimension].get(value, ''), 'count': matched})
+                facets[dimension] = sorted(values, key=lambda facet: (-facet['count'], facet['name']))
+
+            base = self.matching_bitmap(filters, ignore='price', selected=selected)
+            facets['price'] = [
+                {'min': low, 'max': high, 'count': count('price', band, base)}
+                for band, (low, high) in enumerate(self.bands)
+            ]
+
+            base = self.matching_bitmap(filters, ignore='in_stock', selected=selected)
+            facets['in_stock'] = {
+                'true': count('in_stock', True, base),
+                'false': count('in_stock', False, base),
+            }
+            return facets
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def current_version():
+    from .models import IndexVersion
+
+    return IndexVersion.current(VERSION_NAME)
+
+
+def build_index():
+    from .models import Brand, Category, Product, SubCategory
+
+    index = ProductFacetIndex()
+    rows = Product.objects.values_list('id', 'category_id', 'subcategory_id', 'brand_id', 'price', 'stock')
+    index.build(rows.iterator(chunk_size=5000))
+    for dimension, model in (('category', Category), ('subcategory', SubCategory), ('brand', Brand)):
+        for value_id, name in model.objects.values_list('id', 'name'):
+            index.set_name(dimension, value_id, name)
+    return index
+
+
+def get_index():
+    """
+    Return this process's facet index, building it on first use and
+    rebuilding it in the calling thread once another process has changed
+    the catalog's facet values.
+    """
+    global _index, _index_version
+    version = current_version()
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index, _index_version = build_index(), version
+        return _index
+
+    if _index_version != version and _index_lock.acquire(blocking=False):
+        try:
+            _index, _index_version = build_index(), version
+        finally:
+            _index_lock.release()
+    return _index
+
+
+def _bump_version(applied_locally):
+    from .models import IndexVersion
+
+    global _index_version
+    version = IndexVersion.bump(VERSION_NAME)
+    if applied_locally and _index_version == version - 1:
+        # This process applied the change in place and had seen every earlier
+        # one; only other processes need to rebuild
+        _index_version = version
+
+
+def changed(applied):
+    """
+    Record the outcome of applying a change to this process's index: None
+    when there is no index to apply it to, else whether facet values changed.
+    """
+    if applied is None or applied:
+        _bump_version(applied_locally=applied is not None)
+
+
+def product_changed(product_id, category_id, subcategory_id, brand_id, price, stock):
+    index = _index
+    changed(None if index is None else index.add(product_id, category_id, subcategory_id, brand_id, price, stock))
+
+
+def product_removed(product_id):
+    index = _index
+    changed(None if index is None else index.remove(product_id))
+
+
+def refresh_products(product_ids):
+    """Reload products whose rows were changed without signals, e.g. stock."""
+    if not product_ids:
+        return
+    index = _index
+    if index is None:
+        changed(None)
+        return
+    from .models import Product
+
+    rows = Product.objects.filter(id__in=product_ids).values_list(
+        'id', 'category_id', 'subcategory_id', 'brand_id', 'price', 'stock'
+    )
+    # Every row is applied; any() would stop at the first change
+    changed(any([index.add(*row) for row in rows]))
+
+
+def label_changed(dimension, value_id, name):
+    index = _index
+    changed(None if index is None else index.set_name(dimension, value_id, name))
+
+
+def label_removed(dimension, value_id):
+    index = _index
+    if index is not None:
+        index.clear_value(dimension, value_id)
+    changed(None if index is None else True)
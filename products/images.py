@@ -0,0 +1,197 @@
+# products/images.py
+
+"""
+Resized derivatives of catalog and banner images.
+
+Every image of a product, brand, subcategory or banner is rendered at a few
+bounding-box sizes, each as WebP and as JPEG, so clients download only the
+size and format they can use instead of the original upload. The names of the
+generated files are stored on the model in `image_variants`:
+
+    {"source": "<image name>", "thumbnail": {"webp": "...", "jpeg": "..."}, ...}
+
+`source` records which upload the derivatives were made from, so a replaced
+image is detected and rendered again. Rendering runs after the saving
+transaction commits, in a thread pool of IMAGE_DERIVATIVE_WORKERS threads
+(Pillow releases the GIL while decoding, resizing and encoding); with 0
+workers it runs inline. `manage.py generate_image_derivatives` backfills
+existing media.
+"""
+
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Name -> longest edge in pixels, largest first; smaller images are not enlarged
+SIZES = {'large': 1200, 'medium': 600, 'thumbnail': 200}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DEFAULT_WORKERS = 2
+
+# Models with an `image` field and an `image_variants` field
+IMAGE_MODELS = ('products.Product', 'products.Brand', 'products.SubCategory', 'settings.Banner')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(name, size, extension):
+    """banners/images/sale.png -> banners/images/derivatives/sale.png/medium.webp"""
+    # The whole file name, so sale.png and sale.jpg in one directory do not share derivatives
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'derivatives', filename, f'{size}.{extension}')
+
+
+def flatten(image):
+    """Return an RGB copy of `image` with any transparency composited on white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(name, sizes=SIZES):
+    """Write every derivative of the stored image `name`; return its variants dict."""
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # JPEG can decode straight to a reduced scale, much cheaper for large photos
+        image.draft('RGB', (max(sizes.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    variants = {'source': name}
+    for size, edge in sizes.items():
+        # Each size is reduced from the previous one
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        variants[size] = {}
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            (image if image_format == 'WEBP' else flatten(image)).save(buffer, format=image_format, **options)
+            path = derivative_name(name, size, extension)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variants[size][extension] = default_storage.save(path, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def sizes_of(variants):
+    """The {size: {format: name}} entries of a variants dict."""
+    return {size: paths for size, paths in variants.items() if size != 'source'}
+
+
+def delete_files(variants):
+    for paths in sizes_of(variants).values():
+        for path in paths.values():
+            default_storage.delete(path)
+
+
+def store(model_label, pk, name, variants):
+    """Record rendered derivatives on the object, unless its image changed meanwhile."""
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None or instance.image.name != name:
+        delete_files(variants)  # Deleted or replaced; the newer save renders its own
+        return False
+    previous = instance.image_variants
+    instance.image_variants = variants
+    instance.save(update_fields=['image_variants'])
+    if previous.get('source') != name:
+        delete_files(previous)
+    return True
+
+
+def try_render(name, sizes=SIZES):
+    """render(), or None when the file is missing or not an image."""
+    try:
+        return render(name, sizes)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not render derivatives of {name}: {e}")
+        return None
+
+
+def generate(model_label, pk, name):
+    """Render the derivatives of one object's image and store their names on it."""
+    variants = try_render(name)
+    if variants is not None and store(model_label, pk, name, variants):
+        return variants
+    return None
+
+
+def _run_in_worker(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception(f"Image job {function.__name__}{args} failed")
+    finally:
+        connection.close()
+
+
+def background(function, *args):
+    """Run function(*args) in the image worker pool, or inline with 0 workers."""
+    workers = getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', DEFAULT_WORKERS)
+    if not workers:
+        function(*args)
+        return
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-derivatives')
+    _executor.submit(_run_in_worker, function, *args)
+
+
+def submit(model_label, pk, name):
+    background(generate, model_label, pk, name)
+
+
+def is_stale(instance):
+    return instance.image_variants.get('source') != (instance.image.name or None)
+
+
+def schedule(instance):
+    """Queue derivatives of `instance`'s image once the current transaction commits."""
+    if not is_stale(instance):
+        return
+    name = instance.image.name
+    if not name:
+        delete_files(instance.image_variants)
+        instance.image_variants = {}
+        instance.save(update_fields=['image_variants'])
+        return
+    model_label = instance._meta.label
+    transaction.on_commit(lambda: submit(model_label, instance.pk, name))
+
+
+def schedule_stale(model_label, pks):
+    """Queue derivatives for objects written without post_save, e.g. by bulk imports."""
+    model = apps.get_model(model_label)
+    instances = model.objects.filter(pk__in=list(pks)).exclude(image='').exclude(image__isnull=True)
+    for instance in instances.only('pk', 'image', 'image_variants'):
+        if is_stale(instance):
+            submit(model_label, instance.pk, instance.image.name)
+
+
+def image_urls(variants, request=None):
+    """Return {size: {format: url}} for a variants dict, absolute when `request` is given."""
+    return {
+        size: {
+            extension: request.build_absolute_uri(default_storage.url(path)) if request else default_storage.url(path)
+            for extension, path in paths.items()
+        }
+        for size, paths in sizes_of(variants).items()
+    }
@@ -0,0 +1,349 @@
+# products/importers.py
+
+"""
+Streaming CSV catalog import.
+
+The file is read row by row and decoded one line at a time, so memory use
+depends on the chunk size, not the file size. Category, subcategory and brand
+names are resolved through dictionaries loaded with one query each. Valid rows
+are collected into chunks; each chunk is written in its own transaction with a
+few bulk queries. Invalid rows are skipped and reported with their line
+number.
+
+Product files have the columns Name, Category, Price, Stock, and optionally
+Subcategory, Brand, Description, Image and Attributes (a JSON list of
+{"name", "value", "additional_price"} objects). Subcategory files have the
+columns Category, Subcategory, Description, by position.
+"""
+
+import codecs
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import Brand, Category, Product, ProductAttribute, SubCategory
+from .signals import products_imported, subcategories_imported
+from .utils import ATTRIBUTE_FIELDS, sync_product_attributes
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+REQUIRED_COLUMNS = ('Name', 'Category', 'Price', 'Stock')
+PRODUCT_FIELDS = ['category', 'subcategory', 'brand', 'name', 'description', 'price', 'stock', 'image']
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message is reported to the user."""
+
+
+@dataclass
+class ImportResult:
+    success_count: int = 0
+    error_count: int = 0
+    rows_processed: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, name, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "name": name, "error": message})
+
+
+def decode_lines(binary_file, encoding='utf-8', fallback=None):
+    """
+    Yield the lines of a binary file as text, decoding one line at a time.
+    A leading byte order mark is dropped. Lines that are not valid `encoding`
+    are decoded with `fallback` if one is given.
+    """
+    binary_file.seek(0)
+    for number, line in enumerate(binary_file):
+        if number == 0:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError:
+            if fallback is None:
+                raise
+            yield line.decode(fallback, errors='ignore')
+
+
+def text_rows(binary_file, fallback=None):
+    """Return a csv.DictReader over an uploaded file, keyed by its header."""
+    return csv.DictReader(decode_lines(binary_file, fallback=fallback))
+
+
+def positional_rows(binary_file, fallback=None):
+    """Yield the rows of an uploaded file as lists, skipping the header."""
+    reader = csv.reader(decode_lines(binary_file, fallback=fallback))
+    next(reader, None)
+    yield from reader
+
+
+class ChunkedImporter:
+    """
+    Parse rows one at a time and write the valid ones in chunks.
+
+    Subclasses implement parse_row(), write_chunk() and row_name().
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def parse_row(self, row):
+        raise NotImplementedError
+
+    def write_chunk(self, chunk):
+        raise NotImplementedError
+
+    def row_name(self, row):
+        return ''
+
+    def flush(self, chunk, result, on_chunk):
+        with transaction.atomic():
+            if chunk:
+                self.write_chunk(chunk)
+                result.success_count += len(chunk)
+            if on_chunk:
+                on_chunk(result)
+
+    def run(self, rows, result=None, on_chunk=None):
+        """
+        Import every row of `rows` and return an ImportResult.
+
+        on_chunk(result) is called inside each chunk's transaction, so progress
+        saved there commits together with the rows. To resume an interrupted
+        import, pass the result saved by its last on_chunk call; the rows it
+        had processed are skipped.
+        """
+        result = result or ImportResult()
+        start_row = result.rows_processed
+        chunk = []
+        for index, row in enumerate(rows):
+            if index < start_row:
+                continue
+            line = index + 2  # 1-based, after the header line
+            try:
+                chunk.append(self.parse_row(row))
+            except RowError as e:
+                result.add_error(line, self.row_name(row), str(e))
+            result.rows_processed = index + 1
+
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk, result, on_chunk)
+                chunk = []
+
+        self.flush(chunk, result, on_chunk)
+        return result
+
+
+class ProductImporter(ChunkedImporter):
+    """
+    Import products from CSV rows.
+
+    With create_missing=False (the API default) unknown categories,
+    subcategories and brands are row errors; with create_missing=True they are
+    created on first use. With update_existing=True a row whose name matches
+    an existing product updates it, and its attributes are brought in line
+    with the row's when the row has any; otherwise every row creates a
+    product.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, create_missing=False, update_existing=False):
+        super().__init__(chunk_size)
+        self.create_missing = create_missing
+        self.update_existing = update_existing
+        self.categories = {name.lower(): pk for pk, name in Category.objects.values_list('id', 'name')}
+        self.subcategories = {
+            (category_id, name.lower()): pk
+            for pk, category_id, name in SubCategory.objects.values_list('id', 'category_id', 'name')
+        }
+        self.brands = {name.lower(): pk for pk, name in Brand.objects.values_list('id', 'name')}
+
+    # --- Name lookups ---
+
+    def category_id(self, name):
+        key = name.lower()
+        if key not in self.categories:
+            if not self.create_missing:
+                raise RowError(f"Category '{name}' does not exist.")
+            self.categories[key] = Category.objects.get_or_create(name=name)[0].pk
+        return self.categories[key]
+
+    def subcategory_id(self, category_id, name):
+        if not name:
+            return None
+        key = (category_id, name.lower())
+        if key not in self.subcategories:
+            if not self.create_missing:
+                raise RowError(f"Subcategory '{name}' does not exist in this category.")
+            self.subcategories[key] = SubCategory.objects.get_or_create(name=name, category_id=category_id)[0].pk
+        return self.subcategories[key]
+
+    def brand_id(self, name):
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.brands:
+            if not self.create_missing:
+                raise RowError(f"Brand '{name}' does not exist.")
+            self.brands[key] = Brand.objects.get_or_create(name=name)[0].pk
+        return self.brands[key]
+
+    # --- Row parsing ---
+
+    def parse_row(self, row):
+        """Return (Product, [ProductAttribute]) for a CSV row or raise RowError."""
+        values = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+        missing = [column for column in REQUIRED_COLUMNS if not values.get(column)]
+        if missing:
+            raise RowError(f"Missing {', '.join(missing)}.")
+
+        try:
+            price = Decimal(values['Price'])
+        except InvalidOperation:
+            raise RowError(f"Invalid price '{values['Price']}'.")
+        try:
+            stock = int(values['Stock'])
+        except ValueError:
+            raise RowError(f"Invalid stock '{values['Stock']}'.")
+        if price < 0 or stock < 0:
+            raise RowError("Price and stock cannot be negative.")
+
+        category_id = self.category_id(values['Category'])
+        product = Product(
+            name=values['Name'],
+            description=values.get('Description', ''),
+            price=price,
+            stock=stock,
+            category_id=category_id,
+            subcategory_id=self.subcategory_id(category_id, values.get('Subcategory') or values.get('SubCategory')),
+            brand_id=self.brand_id(values.get('Brand')),
+            image=values.get('Image') or None,
+        )
+        return product, self.parse_attributes(values.get('Attributes'))
+
+    def row_name(self, row):
+        return (row.get('Name') or '').strip()
+
+    def parse_attributes(self, raw):
+        """Return a list of unsaved attributes, or None when the row has none."""
+        if not raw:
+            return None
+        try:
+            attributes = json.loads(raw)
+        except json.JSONDecodeError:
+            raise RowError("Invalid JSON format for attributes.")
+        if not isinstance(attributes, list):
+            raise RowError("Attributes must be a list of objects.")
+        try:
+            return [
+                ProductAttribute(
+                    name=attr['name'],
+                    value=attr['value'],
+                    additional_price=Decimal(str(attr.get('additional_price', 0))),
+                )
+                for attr in attributes
+            ]
+        except (KeyError, TypeError, InvalidOperation):
+            raise RowError("Each attribute needs a name, a value and a numeric additional_price.")
+
+    # --- Writing ---
+
+    def match_existing(self, chunk):
+        """Give products whose name already exists the existing product's pk."""
+        by_name = {}
+        for product, attributes in chunk:
+            by_name[product.name] = (product, attributes)  # A later row for the same name wins
+        existing = (
+            Product.objects.filter(name__in=list(by_name)).order_by('-id').values_list('name', 'id', 'image')
+        )
+        for name, pk, image in existing:
+            product = by_name[name][0]
+            product.pk = pk
+            if not product.image:
+                product.image = image
+        return list(by_name.values())
+
+    def write_chunk(self, chunk):
+        """Write one chunk of (Product, [ProductAttribute] or None) pairs in one transaction."""
+        with transaction.atomic():
+            if self.update_existing:
+                chunk = self.match_existing(chunk)
+            new = [product for product, _ in chunk if product.pk is None]
+            updated = [product for product, _ in chunk if product.pk is not None]
+            updated_ids = {product.pk for product in updated}
+            # Existing products' attributes are diffed so their ids stay stable
+            replaced = {
+                product.pk: [
+                    {field: getattr(attribute, field) for field in ATTRIBUTE_FIELDS} for attribute in attributes
+                ]
+                for product, attributes in chunk if attributes and product.pk is not None
+            }
+            Product.objects.bulk_create(new)
+            Product.objects.bulk_update(updated, PRODUCT_FIELDS)
+            sync_product_attributes(replaced)
+
+            attributes = []
+            for product, product_attributes in chunk:
+                if product.pk not in updated_ids:
+                    for attribute in product_attributes or ():
+                        attribute.product = product
+                        attributes.append(attribute)
+            ProductAttribute.objects.bulk_create(attributes)
+            products_imported.send(
+                sender=Product, product_ids=[product.pk for product, _ in chunk], created=len(new)
+            )
+
+
+class SubCategoryImporter(ChunkedImporter):
+    """
+    Create or update subcategories from (category, subcategory, description)
+    rows. A subcategory is matched by name, as before; missing categories are
+    created.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.subcategories = {}
+        for pk, name in SubCategory.objects.order_by('-id').values_list('id', 'name'):
+            self.subcategories[name] = pk
+
+    def row_name(self, row):
+        return row[1].strip() if len(row) > 1 else ''
+
+    def parse_row(self, row):
+        if len(row) < 3:
+            raise RowError("Expected category, subcategory and description.")
+        category_name, name, description = (value.strip() for value in row[:3])
+        if not category_name or not name:
+            raise RowError("Category and subcategory names are required.")
+        return category_name, name, description
+
+    def write_chunk(self, chunk):
+        with transaction.atomic():
+            missing = {category for category, _, _ in chunk if category not in self.categories}
+            if missing:
+                Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+                self.categories.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+
+            rows = {name: (category, description) for category, name, description in chunk}
+            subcategories = [
+                SubCategory(
+                    pk=self.subcategories.get(name), name=name,
+                    category_id=self.categories[category], description=description,
+                )
+                for name, (category, description) in rows.items()
+            ]
+            new = [subcategory for subcategory in subcategories if subcategory.pk is None]
+            SubCategory.objects.bulk_create(new)
+            SubCategory.objects.bulk_update(
+                [subcategory for subcategory in subcategories if subcategory.pk is not None],
+                ['category', 'description'],
+            )
+            self.subcategories.update((subcategory.name, subcategory.pk) for subcategory in new)
+            subcategories_imported.send(
+                sender=SubCategory, subcategory_ids=[subcategory.pk for subcategory in subcategories]
+            )
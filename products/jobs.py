@@ -0,0 +1,113 @@
+# products/jobs.py
+
+"""
+Background processing of catalog import jobs.
+
+A worker claims the oldest pending job and leases it by setting
+lease_expires_at; the lease is extended after every committed chunk. A job
+left Running by a worker that died is claimed again once its lease runs out
+and resumes from the rows_processed saved with its last chunk, so no row is
+imported twice. A job that keeps killing its worker is failed after
+IMPORT_JOB_MAX_ATTEMPTS claims.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .importers import ImportResult, ProductImporter, SubCategoryImporter, positional_rows, text_rows
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+DEFAULT_MAX_ATTEMPTS = 3
+
+# kind -> (importer factory, function returning the rows of an open file)
+IMPORTERS = {
+    'products': (
+        lambda: ProductImporter(create_missing=True, update_existing=True),
+        text_rows,
+    ),
+    'subcategories': (
+        SubCategoryImporter,
+        lambda binary_file: positional_rows(binary_file, fallback='ISO-8859-1'),
+    ),
+}
+
+
+def claim_job():
+    """Lease the next runnable job and return it, or None when there is none."""
+    max_attempts = getattr(settings, 'IMPORT_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            job = (
+                ImportJob.objects.select_for_update(skip_locked=True)
+                .filter(Q(status='Pending') | Q(status='Running', lease_expires_at__lt=now))
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            if job.attempts >= max_attempts:
+                job.status = 'Failed'
+                job.last_error = f"Worker stopped during the job {job.attempts} time(s)."
+                job.finished_at = now
+                job.save(update_fields=['status', 'last_error', 'finished_at'])
+                continue
+            job.status = 'Running'
+            job.attempts += 1
+            job.lease_expires_at = now + LEASE
+            job.started_at = job.started_at or now
+            job.save(update_fields=['status', 'attempts', 'lease_expires_at', 'started_at'])
+            return job
+
+
+def save_progress(job, result):
+    job.rows_processed = result.rows_processed
+    job.success_count = result.success_count
+    job.error_count = result.error_count
+    job.errors = result.errors
+    job.lease_expires_at = timezone.now() + LEASE
+    job.save(update_fields=['rows_processed', 'success_count', 'error_count', 'errors', 'lease_expires_at'])
+
+
+def run_job(job):
+    """Import the job's file, resuming after its last committed chunk."""
+    make_importer, read_rows = IMPORTERS[job.kind]
+    result = ImportResult(
+        success_count=job.success_count,
+        error_count=job.error_count,
+        rows_processed=job.rows_processed,
+        errors=list(job.errors),
+    )
+    try:
+        with job.file.open('rb') as binary_file:
+            if job.total_rows is None:
+                job.total_rows = sum(1 for _ in read_rows(binary_file))
+                job.save(update_fields=['total_rows'])
+            make_importer().run(read_rows(binary_file), result=result, on_chunk=lambda r: save_progress(job, r))
+    except Exception as e:
+        logger.exception(f"Import job {job.pk} failed")
+        job.status = 'Failed'
+        job.last_error = str(e)
+    else:
+        job.status = 'Completed'
+        job.last_error = ''
+    job.finished_at = timezone.now()
+    job.lease_expires_at = None
+    job.save(update_fields=['status', 'last_error', 'finished_at', 'lease_expires_at'])
+    return job
+
+
+def process_next():
+    """Claim and run one job. Returns the job, or None when nothing is queued."""
+    job = claim_job()
+    if job is not None:
+        run_job(job)
+    return job
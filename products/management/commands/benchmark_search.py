@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.benchmarks import percentile
+from products import matcher, search
+from products.models import Product
+
+DEFAULT_QUERIES = [
+    'para', 'paracetamol', 'vitamin c', 'cipla tablet', 'syrup 200ml', 'ashwa', 'omega 3 capsule',
+    'himalaya', 'cough relief', 'pack of 2', 'zinc', 'probiotic powder',
+    # Misspellings, for the name matcher
+    'paracetmol', 'azitromycin', 'omga 3 capsul', 'iboprofen syrup',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ranked full-text search and the autocomplete name matcher against "
+        "the icontains scan they replace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', dest='queries', help="Query to time (repeatable).")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def time_queries(self, queries, iterations, run):
+        timings = []
+        for query in queries:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                run(query)
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search needs SQLite FTS5.")
+        queries = options['queries'] or DEFAULT_QUERIES
+        page_size = options['page_size']
+        self.stdout.write(f"{Product.objects.count()} products, {len(queries)} queries")
+
+        def indexed(query):
+            results = search.search(query)
+            results.count()
+            return results[:page_size]
+
+        def scan(query):
+            matches = search.fallback_queryset(query)
+            matches.count()
+            return list(matches[:page_size])
+
+        started = time.perf_counter()
+        name_matcher = matcher.get_matcher()
+        self.stdout.write(f"Built name matcher in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        def autocomplete(query):
+            return name_matcher.match(query, limit=page_size)
+
+        self.stdout.write(f"{'engine':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, run in (('fts5', indexed), ('matcher', autocomplete), ('icontains', scan)):
+            timings = self.time_queries(queries, options['iterations'], run)
+            self.stdout.write(
+                f"{name:<12}{statistics.median(timings):>10.2f}{percentile(timings, 0.95):>10.2f}{max(timings):>10.2f}"
+            )
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from products import images
+
+
+class Command(BaseCommand):
+    help = "Render resized WebP/JPEG derivatives for catalog and banner images that lack current ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', choices=images.IMAGE_MODELS,
+            help="Only this model (repeatable). Defaults to all of them.",
+        )
+        parser.add_argument('--force', action='store_true', help="Render again even when derivatives are current.")
+        parser.add_argument('--workers', type=int, default=4, help="Threads rendering images in parallel.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+        pending = []
+        for model_label in options['model'] or images.IMAGE_MODELS:
+            queryset = apps.get_model(model_label).objects.exclude(image='').exclude(image__isnull=True)
+            for instance in queryset.only('pk', 'image', 'image_variants').iterator():
+                if options['force'] or images.is_stale(instance):
+                    pending.append((model_label, instance.pk, instance.image.name))
+
+        self.stdout.write(f"Rendering derivatives for {len(pending)} image(s)")
+        rendered = failed = 0
+        # Workers only render files; results are stored from this thread
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = executor.map(images.try_render, [name for _, _, name in pending])
+            for (model_label, pk, name), variants in zip(pending, results):
+                if variants is not None and images.store(model_label, pk, name, variants):
+                    rendered += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"  {model_label} {pk}: could not render {name}")
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered}, failed {failed}"))
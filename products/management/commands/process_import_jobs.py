@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.jobs import process_next
+
+
+class Command(BaseCommand):
+    help = "Run queued catalog CSV import jobs, resuming any interrupted ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when nothing is queued.")
+        parser.add_argument('--once', action='store_true', help="Exit once nothing is queued instead of polling.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = process_next()
+            if job is not None:
+                self.stdout.write(
+                    f"job={job.pk} status={job.status} imported={job.success_count} errors={job.error_count}"
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
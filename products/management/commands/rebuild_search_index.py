@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the product full-text search index from the catalog."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING("Full-text search needs SQLite FTS5; nothing to rebuild."))
+            return
+        started = time.perf_counter()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,266 @@
+# products/matcher.py
+
+"""
+Typo-tolerant, in-memory product name matcher for autocomplete.
+
+Product names are split into words. Each distinct word is indexed by its
+character trigrams, and each word keeps a posting list of the products whose
+name contains it, ordered shortest name first. A catalog of 100k SKUs has only
+a few thousand distinct words, so a lookup scores a handful of candidate words
+with a bounded edit distance instead of scanning every product.
+
+Each query word may match a catalog word with a few typos, and is matched as a
+prefix so results appear while the user is still typing ("paracet" and
+"paracetmol" both find "Paracetamol"). A product matches when every query word
+matches one of its words; products are ranked by the summed word scores, then
+by shorter name.
+
+The index is built on first use in each process and updated in place by the
+receivers in products/signals.py. A change made in another process bumps a
+version number stored in the database (IndexVersion), and the next lookup
+here rebuilds the index.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+VERSION_NAME = 'matcher'
+MAX_CANDIDATE_WORDS = 30  # Candidate words rescored with edit distance, per query word
+SCAN_FACTOR = 5  # Products gathered per requested result before the final sort
+
+
+def words_of(text):
+    return WORD_RE.findall(text.lower())
+
+
+def trigrams(word):
+    # Leading padding only: a partially typed word shares its trigrams with the
+    # start of the words it is a prefix of.
+    padded = f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allowed_typos(word):
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 5:
+        return 1
+    if len(word) <= 9:
+        return 2
+    return 3
+
+
+def prefix_distance(query, word, limit):
+    """
+    Edit distance between `query` and the closest prefix of `word`, or None
+    when it exceeds `limit`. Returns (distance, matched the whole word).
+    """
+    previous = list(range(len(word) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i]
+        for j, word_char in enumerate(word, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (query_char != word_char),
+            ))
+        if min(current) > limit:
+            return None
+        previous = current
+    distance = min(previous)
+    if distance > limit:
+        return None
+    return distance, previous[-1] == distance
+
+
+class ProductNameMatcher:
+    def __init__(self):
+        self.names = {}  # product id -> name
+        self.product_words = {}  # product id -> set of words
+        self.postings = defaultdict(list)  # word -> [(len(name), product id)], sorted
+        self.word_products = defaultdict(set)  # word -> product ids, for membership tests
+        self.trigram_index = defaultdict(set)  # trigram -> words
+        self.short_prefixes = defaultdict(set)  # 1 and 2 character prefix -> words
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def build(self, rows):
+        """Index an iterable of (product id, name) pairs."""
+        with self.lock:
+            for product_id, name in rows:
+                self.add(product_id, name)
+
+    def add(self, product_id, name):
+        with self.lock:
+            if product_id in self.names:
+                self.remove(product_id)
+            self.names[product_id] = name
+            words = set(words_of(name))
+            self.product_words[product_id] = words
+            for word in words:
+                if word not in self.postings:
+                    for gram in trigrams(word):
+                        self.trigram_index[gram].add(word)
+                    self.short_prefixes[word[:1]].add(word)
+                    self.short_prefixes[word[:2]].add(word)
+                bisect.insort(self.postings[word], (len(name), product_id))
+                self.word_products[word].add(product_id)
+
+    def remove(self, product_id):
+        with self.lock:
+            name = self.names.pop(product_id, None)
+            if name is None:
+                return
+            for word in self.product_words.pop(product_id):
+                posting = self.postings[word]
+                posting.remove((len(name), product_id))
+                self.word_products[word].discard(product_id)
+                if not posting:
+                    del self.postings[word]
+                    del self.word_products[word]
+                    for gram in trigrams(word):
+                        self.trigram_index[gram].discard(word)
+                    self.short_prefixes[word[:1]].discard(word)
+                    self.short_prefixes[word[:2]].discard(word)
+
+    def candidate_words(self, query_word):
+        """Return {catalog word: score} for words `query_word` may be a (misspelt) prefix of."""
+        if len(query_word) < 3:
+            words = self.short_prefixes.get(query_word, ())
+        else:
+            shared = defaultdict(int)
+            for gram in trigrams(query_word):
+                for word in self.trigram_index.get(gram, ()):
+                    shared[word] += 1
+            words = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATE_WORDS]
+
+        limit = allowed_typos(query_word)
+        scores = {}
+        for word in words:
+            result = prefix_distance(query_word, word, limit)
+            if result is None:
+                continue
+            distance, whole_word = result
+            score = 1 - distance / (len(query_word) + 1)
+            if whole_word:
+                score += 0.25
+            scores[word] = score
+        return scores
+
+    def match_scored(self, query, limit=10):
+        """Return up to `limit` (product id, score) pairs, best first."""
+        query_words = words_of(query)
+        if not query_words:
+            return []
+        with self.lock:
+            matched = [self.candidate_words(word) for word in query_words]
+            if not all(matched):
+                return []
+
+            # Drive the scan from the query word with the fewest products.
+            # Products matching every query word are found with set
+            # intersections, which run in C and cost O(smaller set).
+            sizes = [sum(len(self.postings[word]) for word in scores) for scores in matched]
+            driver_index = sizes.index(min(sizes))
+            driver = matched[driver_index]
+            others = [scores for index, scores in enumerate(matched) if index != driver_index]
+
+            eligible = None
+            if others:
+                eligible = set().union(*(self.word_products[word] for word in driver))
+                for scores in others:
+                    eligible = set().union(*(eligible & self.word_products[word] for word in scores))
+                    if not eligible:
+                        return []
+
+            results = {}
+            wanted = limit * SCAN_FACTOR
+            for word in sorted(driver, key=driver.get, reverse=True):
+                for name_length, product_id in self.postings[word]:
+                    if product_id in results or (eligible is not None and product_id not in eligible):
+                        continue
+                    words = self.product_words[product_id]
+                    total = driver[word] + sum(max(scores[w] for w in words if w in scores) for scores in others)
+                    results[product_id] = (total, name_length)
+                    if len(results) >= wanted:
+                        break
+                if len(results) >= wanted:
+                    break
+
+        ranked = sorted(results.items(), key=lambda item: (-item[1][0], item[1][1], item[0]))
+        return [(product_id, round(score, 3)) for product_id, (score, _) in ranked[:limit]]
+
+    def match(self, query, limit=10):
+        """Return up to `limit` product ids, best match first."""
+        return [product_id for product_id, _ in self.match_scored(query, limit)]
+
+
+_matcher = None
+_matcher_version = None
+_build_lock = threading.Lock()
+
+
+def current_version():
+    from .models import IndexVersion
+
+    return IndexVersion.current(VERSION_NAME)
+
+
+def get_matcher():
+    """Return this process's matcher, building or rebuilding it when stale."""
+    global _matcher, _matcher_version
+    version = current_version()
+    if _matcher is None or _matcher_version != version:
+        with _build_lock:
+            if _matcher is None or _matcher_version != version:
+                from .models import Product
+
+                matcher = ProductNameMatcher()
+                matcher.build(Product.objects.values_list('id', 'name').iterator(chunk_size=5000))
+                _matcher, _matcher_version = matcher, version
+    return _matcher
+
+
+def _bump_version(applied_locally):
+    from .models import IndexVersion
+
+    global _matcher_version
+    version = IndexVersion.bump(VERSION_NAME)
+    if applied_locally and _matcher_version == version - 1:
+        # This process applied the change in place and had seen every earlier
+        # one; only other processes need to rebuild
+        _matcher_version = version
+
+
+def invalidate():
+    """Make every process rebuild on its next lookup, e.g. after bulk_create."""
+    _bump_version(applied_locally=False)
+
+
+def product_changed(product_id, name):
+    matcher = _matcher
+    if matcher is not None:
+        if matcher.names.get(product_id) == name:
+            return
+        matcher.add(product_id, name)
+    _bump_version(applied_locally=matcher is not None)
+
+
+def product_removed(product_id):
+    matcher = _matcher
+    if matcher is not None:
+        matcher.remove(product_id)
+    _bump_version(applied_locally=matcher is not None)
+
+
+def match(query, limit=10):
+    return get_matcher().match(query, limit)
+
+
+def match_scored(query, limit=10):
+    return get_matcher().match_scored(query, limit)
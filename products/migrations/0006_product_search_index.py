@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Frozen copies of the statements in products/search.py as of this migration;
+# later changes there must not change what this migration runs
+CREATE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_product_search USING fts5(
+    name, description, brand, category, attributes,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+DROP_SQL = "DROP TABLE IF EXISTS products_product_search"
+
+INDEX_SQL = """
+INSERT INTO products_product_search (rowid, name, description, brand, category, attributes)
+SELECT
+    p.id,
+    p.name,
+    COALESCE(p.description, ''),
+    COALESCE(b.name, ''),
+    TRIM(COALESCE(c.name, '') || ' ' || COALESCE(s.name, '')),
+    COALESCE((
+        SELECT group_concat(a.name || ' ' || a.value, ' ')
+        FROM products_productattribute a
+        WHERE a.product_id = p.id
+    ), '')
+FROM products_product p
+LEFT JOIN products_category c ON c.id = p.category_id
+LEFT JOIN products_subcategory s ON s.id = p.subcategory_id
+LEFT JOIN products_brand b ON b.id = p.brand_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases use the icontains fallback
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_remove_product_attributes_productattribute'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
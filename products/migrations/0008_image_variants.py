@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
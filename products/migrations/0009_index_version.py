@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,6 +1,7 @@
 # products/models.py
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -14,6 +15,7 @@ class SubCategory(models.Model):
     category = models.ForeignKey(Category, related_name='subcategories', on_delete=models.CASCADE)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='subcategories/images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See products/images.py
 
     def __str__(self):
         return f"{self.name} - {self.category.name}"
@@ -22,6 +24,7 @@ class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='brands/images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See products/images.py
 
     def __str__(self):
         return self.name
@@ -35,8 +38,17 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
     image = models.ImageField(upload_to='products/images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # See products/images.py
     created_at = models.DateTimeField(blank=True, auto_now_add=True)
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored name so a save can tell whether it changed (products/signals.py)
+        if 'name' in field_names:
+            instance._loaded_name = values[field_names.index('name')]
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -48,3 +60,92 @@ class ProductAttribute(models.Model):
 
     def __str__(self):
         return f"{self.product.name} - {self.name}: {self.value}"
+
+
+class ImportJob(models.Model):
+    """
+    A catalog CSV upload processed in the background by
+    `manage.py process_import_jobs`.
+
+    Progress is saved in the same transaction as each imported chunk, so a job
+    whose worker dies resumes after its last committed chunk once the lease
+    runs out. Rows that could not be imported are kept in `errors`.
+    """
+    KIND_CHOICES = [
+        ('products', 'Products'),
+        ('subcategories', 'Sub-categories'),
+    ]
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='import_jobs', on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='import_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import #{self.pk} - {self.status}"
+
+    def as_status(self):
+        """Progress as shown by the admin progress page."""
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'rows_processed': self.rows_processed,
+            'success_count': self.success_count,
+            'error_count': self.error_count,
+            'errors': self.errors[:100],
+            'last_error': self.last_error,
+        }
+
+
+class IndexVersion(models.Model):
+    """
+    Version of a per-process product index: the listing facets
+    (products/facets.py) or the autocomplete name matcher (products/matcher.py).
+    Kept in the database so that a bump reaches every process, whatever cache
+    backend is configured.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} version {self.version}"
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(pk=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Increment the version and return the new one."""
+        with transaction.atomic():
+            if not cls.objects.filter(pk=name).update(version=models.F('version') + 1):
+                _, created = cls.objects.get_or_create(pk=name, defaults={'version': 1})
+                if not created:
+                    cls.objects.filter(pk=name).update(version=models.F('version') + 1)
+            return cls.current(name)
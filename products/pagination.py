@@ -0,0 +1,30 @@
+# products/pagination.py
+
+from rest_framework.pagination import PageNumberPagination
+
+
+class ProductSearchPagination(PageNumberPagination):
+    """
+    Numbered pages over relevance-ranked search results.
+
+    Ranked results have no stable key to resume from, so search uses page
+    numbers; the index serves each page as a LIMIT/OFFSET over the ranking.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ProductListPagination(PageNumberPagination):
+    """
+    Numbered pages for the filtered catalog listing, which also returns facet
+    counts alongside the page.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_paginated_response(self, data, facets=None):
+        response = super().get_paginated_response(data)
+        response.data['facets'] = facets
+        return response
@@ -0,0 +1,212 @@
+# products/search.py
+
+"""
+Ranked full-text product search.
+
+On SQLite the catalog is mirrored into an FTS5 table keyed by product id, with
+one column each for name, description, brand, category (including the
+subcategory) and attribute names and values. The index is kept in step by the
+receivers in products/signals.py; code that writes products with bulk_create
+or raw SQL must call index_products() itself. `manage.py rebuild_search_index`
+recreates it from scratch.
+
+Every search term is matched as a prefix, all terms must match, and results
+are ordered by bm25 with name matches weighted highest. On other databases
+search falls back to icontains filters with a coarse name-based ranking.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Product, ProductAttribute
+
+TABLE = 'products_product_search'
+CHUNK_SIZE = 500  # Stays below SQLite's bound-parameter limit
+
+# bm25 weights, in column order
+WEIGHTS = (10.0, 1.0, 4.0, 2.0, 2.0)
+
+CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+    name, description, brand, category, attributes,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+DROP_SQL = f"DROP TABLE IF EXISTS {TABLE}"
+
+INDEX_SQL = f"""
+INSERT INTO {TABLE} (rowid, name, description, brand, category, attributes)
+SELECT
+    p.id,
+    p.name,
+    COALESCE(p.description, ''),
+    COALESCE(b.name, ''),
+    TRIM(COALESCE(c.name, '') || ' ' || COALESCE(s.name, '')),
+    COALESCE((
+        SELECT group_concat(a.name || ' ' || a.value, ' ')
+        FROM products_productattribute a
+        WHERE a.product_id = p.id
+    ), '')
+FROM products_product p
+LEFT JOIN products_category c ON c.id = p.category_id
+LEFT JOIN products_subcategory s ON s.id = p.subcategory_id
+LEFT JOIN products_brand b ON b.id = p.brand_id
+"""
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every term, each as a prefix."""
+    return ' AND '.join(f'"{token}"*' for token in tokenize(query))
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def index_products(product_ids):
+    """(Re)index the given products; ids that no longer exist are removed."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(product_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", chunk)
+            cursor.execute(f"{INDEX_SQL} WHERE p.id IN ({placeholders})", chunk)
+
+
+def remove_products(product_ids):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(product_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", chunk)
+
+
+def rebuild():
+    """Drop and repopulate the whole index."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_SQL)
+        cursor.execute(CREATE_SQL)
+        cursor.execute(INDEX_SQL)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def ranked_ids(query, offset=0, limit=20):
+    """Return one page of matching product ids, best match first."""
+    match = match_expression(query)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+            f"ORDER BY bm25({TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def count(query):
+    match = match_expression(query)
+    if not match:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s", [match])
+        return cursor.fetchone()[0]
+
+
+def fallback_queryset(query):
+    """icontains search for databases without FTS5; a full scan, ranked by name."""
+    tokens = tokenize(query)
+    if not tokens:
+        return Product.objects.none()
+    queryset = Product.objects.all()
+    for token in tokens:
+        attribute_match = ProductAttribute.objects.filter(product=OuterRef('pk')).filter(
+            Q(name__icontains=token) | Q(value__icontains=token)
+        )
+        queryset = queryset.filter(
+            Q(name__icontains=token) | Q(description__icontains=token) | Q(brand__name__icontains=token)
+            | Q(category__name__icontains=token) | Q(subcategory__name__icontains=token)
+            | Exists(attribute_match)
+        )
+    return queryset.annotate(
+        rank=Case(
+            When(name__istartswith=tokens[0], then=Value(3)),
+            When(name__icontains=tokens[0], then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('-rank', 'id')
+
+
+def filter_queryset(queryset, query):
+    """Restrict `queryset` to products matching `query`, without ranking."""
+    if not is_available():
+        return queryset.filter(pk__in=fallback_queryset(query).values('pk'))
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [match]))
+
+
+class SearchResults:
+    """
+    A lazily evaluated, sliceable sequence of products matching `query`, in
+    rank order. Paginators call count() and slice it, so only the requested
+    page is ever loaded.
+    """
+
+    def __init__(self, query, queryset=None):
+        self.query = query
+        self.queryset = queryset if queryset is not None else Product.objects.all()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if is_available():
+                self._count = count(self.query)
+            else:
+                self._count = fallback_queryset(self.query).count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+        if not is_available():
+            ids = list(fallback_queryset(self.query).values_list('id', flat=True)[start:stop])
+        else:
+            ids = ranked_ids(self.query, offset=start, limit=stop - start)
+        products = self.queryset.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+
+def search(query, queryset=None):
+    return SearchResults(query, queryset)
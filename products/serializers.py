@@ -2,6 +2,19 @@
 import json
 from rest_framework import serializers
 from .models import Category, SubCategory, Brand, Product, ProductAttribute
+from .images import image_urls
+from .utils import sync_product_attributes
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of an image's resized copies: {size: {format: url}}, empty until rendered."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_variants')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return image_urls(value or {}, self.context.get('request'))
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,26 +22,34 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description']
 
 class SubCategorySerializer(serializers.ModelSerializer):
+    image_urls = ImageVariantsField()
+
     class Meta:
         model = SubCategory
-        fields = ['id', 'name', 'category', 'description', 'image']
+        fields = ['id', 'name', 'category', 'description', 'image', 'image_urls']
 
 class BrandSerializer(serializers.ModelSerializer):
+    image_urls = ImageVariantsField()
+
     class Meta:
         model = Brand
-        fields = ['id', 'name', 'description', 'image']
+        fields = ['id', 'name', 'description', 'image', 'image_urls']
 
 class ProductAttributeSerializer(serializers.ModelSerializer):
+    # Writable so updates can refer to an existing row
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = ProductAttribute
         fields = ['id', 'name', 'value', 'additional_price']
 
 class ProductSerializer(serializers.ModelSerializer):
     attributes = ProductAttributeSerializer(many=True, required=False)
+    image_urls = ImageVariantsField()
 
     class Meta:
         model = Product
-        fields = ['id', 'category', 'subcategory', 'brand', 'name', 'description', 'price', 'stock', 'image', 'attributes']
+        fields = ['id', 'category', 'subcategory', 'brand', 'name', 'description', 'price', 'stock', 'image', 'image_urls', 'attributes']
 
     def create(self, validated_data):
         # Extract attributes data
@@ -42,6 +63,7 @@ class ProductSerializer(serializers.ModelSerializer):
             for attr in attributes_data:
                 if isinstance(attr, str):  # Parse JSON string if necessary
                     attr = json.loads(attr)
+                attr.pop('id', None)
                 ProductAttribute.objects.create(product=product, **attr)
 
         return product
@@ -62,10 +84,9 @@ class ProductSerializer(serializers.ModelSerializer):
                 except json.JSONDecodeError:
                     raise serializers.ValidationError("Invalid JSON format for attributes.")
 
-            # Clear existing attributes and add new ones
-            instance.attributes.all().delete()
-            for attr in attributes_data:
-                ProductAttribute.objects.create(product=instance, **attr)
+            # Apply only the differences so attribute ids stay stable
+            sync_product_attributes({instance.pk: attributes_data})
 
+        # Saved after the attributes so the search index picks them up
         instance.save()
         return instance
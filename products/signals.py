@@ -0,0 +1,109 @@
+# products/signals.py
+
+"""
+Receivers that keep the product search index, the autocomplete name matcher,
+the listing facet index and image derivatives in step with the catalog.
+Connected in ProductsConfig.ready().
+"""
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from . import facets, images, matcher, search
+
+# Sent when product stock is changed with a queryset update, which does not
+# send post_save. Arguments: product_ids.
+stock_changed = Signal()
+
+# Sent after products are created or updated in bulk, e.g. by the CSV importer.
+# Arguments: product_ids, created (how many of them are new).
+products_imported = Signal()
+
+# Sent after subcategories are created or updated in bulk by the CSV importer.
+# Arguments: subcategory_ids.
+subcategories_imported = Signal()
+
+LABEL_DIMENSIONS = {'Category': 'category', 'SubCategory': 'subcategory', 'Brand': 'brand'}
+
+
+def name_changed(instance, update_fields):
+    """Whether a save wrote a new name; instances not loaded from the database always count."""
+    if update_fields is not None and 'name' not in update_fields:
+        return False
+    return getattr(instance, '_loaded_name', None) != instance.name
+
+
+def product_saved(sender, instance, update_fields=None, **kwargs):
+    search.index_products([instance.pk])
+    # Price, stock and image saves leave the autocomplete index alone; a bump
+    # would make every other process rebuild it. Like the facet index, it only
+    # sees committed changes
+    if name_changed(instance, update_fields):
+        renamed = (instance.pk, instance.name)
+        transaction.on_commit(lambda: matcher.product_changed(*renamed))
+        instance._loaded_name = instance.name
+    row = (instance.pk, instance.category_id, instance.subcategory_id, instance.brand_id, instance.price, instance.stock)
+    transaction.on_commit(lambda: facets.product_changed(*row))
+
+
+def product_deleted(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+    product_id = instance.pk
+    transaction.on_commit(lambda: matcher.product_removed(product_id))
+    transaction.on_commit(lambda: facets.product_removed(product_id))
+
+
+def attribute_changed(sender, instance, **kwargs):
+    search.index_products([instance.product_id])
+
+
+def catalog_label_saved(sender, instance, created, **kwargs):
+    label = (LABEL_DIMENSIONS[sender.__name__], instance.pk, instance.name)
+    transaction.on_commit(lambda: facets.label_changed(*label))
+    # A new category, subcategory or brand has no products yet; a renamed one
+    # changes the indexed text of every product that points at it.
+    if created:
+        return
+    search.index_products(instance.products.values_list('id', flat=True))
+
+
+def catalog_label_deleted(sender, instance, **kwargs):
+    label = (LABEL_DIMENSIONS[sender.__name__], instance.pk)
+    transaction.on_commit(lambda: facets.label_removed(*label))
+
+
+def product_stock_changed(sender, product_ids, **kwargs):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: facets.refresh_products(product_ids))
+
+
+def products_bulk_created(sender, product_ids, **kwargs):
+    product_ids = list(product_ids)
+    search.index_products(product_ids)
+    transaction.on_commit(matcher.invalidate)
+    transaction.on_commit(lambda: facets.refresh_products(product_ids))
+    transaction.on_commit(lambda: images.schedule_stale('products.Product', product_ids))
+
+
+def image_saved(sender, instance, **kwargs):
+    images.schedule(instance)
+
+
+def connect():
+    from django.db.models.signals import post_delete, post_save
+
+    post_save.connect(product_saved, sender='products.Product', dispatch_uid='search_product_saved')
+    post_delete.connect(product_deleted, sender='products.Product', dispatch_uid='search_product_deleted')
+    post_save.connect(attribute_changed, sender='products.ProductAttribute', dispatch_uid='search_attribute_saved')
+    post_delete.connect(attribute_changed, sender='products.ProductAttribute', dispatch_uid='search_attribute_deleted')
+    for model in LABEL_DIMENSIONS:
+        post_save.connect(
+            catalog_label_saved, sender=f'products.{model}', dispatch_uid=f'search_{model.lower()}_saved',
+        )
+        post_delete.connect(
+            catalog_label_deleted, sender=f'products.{model}', dispatch_uid=f'facets_{model.lower()}_deleted',
+        )
+    stock_changed.connect(product_stock_changed, dispatch_uid='facets_stock_changed')
+    products_imported.connect(products_bulk_created, dispatch_uid='products_bulk_created')
+    for model in ('Product', 'Brand', 'SubCategory'):
+        post_save.connect(image_saved, sender=f'products.{model}', dispatch_uid=f'images_{model.lower()}_saved')
@@ -1,3 +1,583 @@
-from django.test import TestCase
+import csv
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import facets, jobs, matcher
+from .exports import ProductExporter
+from .importers import ProductImporter
+from .matcher import ProductNameMatcher
+from .signals import stock_changed
+from .utils import sync_product_attributes
+from orders.models import Cart, CartItem
+from users.models import User
+from .models import Brand, Category, ImportJob, IndexVersion, Product, ProductAttribute, SubCategory
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Pain Relief')
+        cls.brand = Brand.objects.create(name='Cipla')
+        cls.paracetamol = Product.objects.create(
+            category=category, brand=cls.brand, name='Paracetamol 500mg', price=Decimal('20.00'), stock=10,
+        )
+        cls.combo = Product.objects.create(
+            category=category, name='Cold Relief', description='Contains paracetamol and caffeine',
+            price=Decimal('35.00'), stock=10,
+        )
+        ProductAttribute.objects.create(product=cls.combo, name='size', value='Strip of 15')
+        Product.objects.create(category=category, name='Ibuprofen', price=Decimal('30.00'), stock=10)
+
+    def search(self, query):
+        response = APIClient().get(reverse('product-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.data['results']]
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        self.assertEqual(self.search('parac'), [self.paracetamol.id, self.combo.id])
+        self.assertEqual(self.search('relief strip'), [self.combo.id])
+        self.assertEqual(self.search(''), [])
+
+    def test_index_follows_product_attribute_and_brand_changes(self):
+        self.paracetamol.name = 'Dolo 650'
+        self.paracetamol.save()
+        self.assertEqual(self.search('dolo'), [self.paracetamol.id])
+
+        ProductAttribute.objects.create(product=self.paracetamol, name='pack', value='Family pack')
+        self.assertEqual(self.search('family'), [self.paracetamol.id])
+
+        self.brand.name = 'Micro Labs'
+        self.brand.save()
+        self.assertEqual(self.search('micro'), [self.paracetamol.id])
+
+        self.combo.delete()
+        self.assertEqual(self.search('strip'), [])
+
+
+class ProductNameMatcherTests(TestCase):
+    def setUp(self):
+        self.matcher = ProductNameMatcher()
+        self.matcher.build([
+            (1, 'Paracetamol 500mg Tablet'),
+            (2, 'Paracetamol Syrup 100ml'),
+            (3, 'Pantoprazole 40mg Tablet'),
+            (4, 'Azithromycin 250mg Tablet'),
+            (5, 'Amoxicillin 500mg Capsule'),
+        ])
+
+    def test_misspelt_and_partial_names_match(self):
+        self.assertCountEqual(self.matcher.match('paracetmol'), [1, 2])
+        self.assertEqual(self.matcher.match('azitromycin'), [4])
+        self.assertEqual(self.matcher.match('amoxycilin 500'), [5])
+        self.assertEqual(self.matcher.match('pant'), [3])
+        self.assertEqual(self.matcher.match('paracetamol syrup'), [2])
+        self.assertEqual(self.matcher.match('xylometazoline'), [])
+
+    def test_incremental_updates(self):
+        self.matcher.add(6, 'Cetirizine 10mg Tablet')
+        self.assertEqual(self.matcher.match('cetrizine'), [6])
+        self.matcher.add(6, 'Levocetirizine 5mg Tablet')
+        self.assertEqual(self.matcher.match('cetrizine'), [])
+        self.matcher.remove(4)
+        self.assertEqual(self.matcher.match('azithromycin'), [])
+
+    def test_only_renames_invalidate_other_processes(self):
+        # A process that has not built its matcher
+        self.addCleanup(setattr, matcher, '_matcher', matcher._matcher)
+        matcher._matcher = None
+        category = Category.objects.create(name='Matcher')
+        product = Product.objects.create(category=category, name='Cetirizine', price=Decimal('5.00'), stock=1)
+        version = matcher.current_version()
+
+        product = Product.objects.get(pk=product.pk)
+        product.price = Decimal('6.00')
+        product.save()
+        product.stock = 2
+        product.save(update_fields=['stock'])
+        self.assertEqual(matcher.current_version(), version)
+
+        product.name = 'Levocetirizine'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        # Stored in the database, not in this process's cache
+        cache.clear()
+        self.assertEqual(matcher.current_version(), version + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(matcher.current_version(), version + 1)
+
+    def test_uncommitted_renames_are_not_matched(self):
+        category = Category.objects.create(name='Matcher')
+        product = Product.objects.create(category=category, name='Cetirizine', price=Decimal('5.00'), stock=1)
+        self.addCleanup(setattr, matcher, '_matcher', matcher._matcher)
+        matcher._matcher = None
+        name_matcher = matcher.get_matcher()
+
+        product.name = 'Levocetirizine'
+        with self.captureOnCommitCallbacks(execute=False):
+            product.save()
+        # As if the transaction rolled back: its callbacks never run
+        self.assertEqual(name_matcher.names[product.pk], 'Cetirizine')
+        self.assertIs(matcher.get_matcher(), name_matcher)
+
+
+class ProductListingFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tablets = Category.objects.create(name='Tablets')
+        cls.syrups = Category.objects.create(name='Syrups')
+        cls.cipla = Brand.objects.create(name='Cipla')
+        cls.dabur = Brand.objects.create(name='Dabur')
+        for index, (category, brand, price, stock) in enumerate([
+            (cls.tablets, cls.cipla, '50.00', 10),
+            (cls.tablets, cls.cipla, '150.00', 0),
+            (cls.tablets, cls.dabur, '300.00', 5),
+            (cls.syrups, cls.dabur, '120.00', 8),
+        ]):
+            Product.objects.create(
+                category=category, brand=brand, name=f'Listed {index}', price=Decimal(price), stock=stock,
+            )
+
+    def setUp(self):
+        # Catalog versions restart with every test; drop responses cached by earlier ones
+        cache.clear()
+        facets._index = None
+        self.addCleanup(setattr, facets, '_index', None)
+
+    def get(self, **params):
+        response = APIClient().get(reverse('product-list-create'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, facet_list):
+        return {facet['name']: facet['count'] for facet in facet_list}
+
+    def test_filters_and_facet_counts(self):
+        data = self.get(category=self.tablets.id, in_stock='true')
+
+        self.assertEqual(data['count'], 2)
+        # A dimension's counts ignore its own filter
+        self.assertEqual(self.counts(data['facets']['category']), {'Tablets': 2, 'Syrups': 1})
+        self.assertEqual(self.counts(data['facets']['brand']), {'Cipla': 1, 'Dabur': 1})
+        self.assertEqual(data['facets']['in_stock'], {'true': 2, 'false': 1})
+        self.assertEqual([band['count'] for band in data['facets']['price']], [1, 0, 1, 0, 0])
+
+        data = self.get(brand=f'{self.cipla.id},{self.dabur.id}', min_price='100', max_price='200')
+        self.assertEqual(data['count'], 2)
+
+    def test_facets_follow_catalog_and_stock_changes(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                category=self.syrups, brand=self.cipla, name='Listed 4', price=Decimal('90.00'), stock=3,
+            )
+        self.assertEqual(self.counts(self.get()['facets']['category']), {'Tablets': 3, 'Syrups': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=product.pk).update(stock=0)
+            stock_changed.send(sender=Product, product_ids=[product.pk])
+        cache.clear()  # Listings show stock for up to CATALOG_STOCK_TTL
+        self.assertEqual(self.get()['facets']['in_stock'], {'true': 3, 'false': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dabur.delete()
+        self.assertEqual(self.counts(self.get()['facets']['brand']), {'Cipla': 3})
+
+    def test_uncommitted_changes_are_not_indexed(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=False):
+            Product.objects.create(
+                category=self.syrups, brand=self.cipla, name='Listed 4', price=Decimal('90.00'), stock=3,
+            )
+        # As if the transaction rolled back: its callbacks never run
+        self.assertEqual(self.counts(self.get()['facets']['category']), {'Tablets': 3, 'Syrups': 1})
+
+    def test_index_is_rebuilt_only_after_facet_changes(self):
+        index = facets.get_index()
+        product = Product.objects.get(name='Listed 0')
+
+        # In stock before and after: no process needs to rebuild
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=product.pk).update(stock=4)
+            stock_changed.send(sender=Product, product_ids=[product.pk])
+        self.assertIs(facets.get_index(), index)
+
+        # Applied here in place; this process stays current
+        with self.captureOnCommitCallbacks(execute=True):
+            product.price = Decimal('60.00')
+            product.save()
+        self.assertIs(facets.get_index(), index)
+
+        # Another process changed the catalog; its bump does not live in this process's cache
+        version = facets.current_version()
+        facets.changed(None)
+        cache.clear()
+        self.assertEqual(IndexVersion.objects.get(name=facets.VERSION_NAME).version, version + 1)
+        self.assertIsNot(facets.get_index(), index)
+
+    def test_invalid_filter_is_rejected(self):
+        response = APIClient().get(reverse('product-list-create'), {'category': 'tablets'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkUploadProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='catalog@example.com', username='catalog', password='pass',
+            name='Catalog', phone_number='9876543210',
+        )
+        category = Category.objects.create(name='Vitamins')
+        SubCategory.objects.create(name='Multivitamins', category=category)
+        Brand.objects.create(name='Himalaya')
+
+    def upload(self, lines):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        content = "Name,Category,Subcategory,Brand,Price,Stock,Attributes\n" + "\n".join(lines) + "\n"
+        upload = SimpleUploadedFile('products.csv', content.encode('utf-8'), content_type='text/csv')
+        return client.post(reverse('bulk-upload-products'), {'file': upload}, format='multipart')
+
+    def test_valid_rows_are_bulk_inserted_and_bad_rows_reported(self):
+        rows = [
+            f'Vitamin {index},Vitamins,Multivitamins,Himalaya,{index}.50,10,"[{{""name"": ""size"", ""value"": ""{index}0 tabs""}}]"'
+            for index in range(30)
+        ]
+        rows += [
+            'Bad Price,Vitamins,Multivitamins,Himalaya,abc,10,',
+            'Unknown Brand,Vitamins,Multivitamins,Nobody,5.00,10,',
+        ]
+        self.upload(rows[:1])  # Creates the dashboard totals row
+        with CaptureQueriesContext(connection) as small:
+            response = self.upload(rows[-5:])
+        self.assertEqual(response.status_code, 400)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.upload(rows)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['success_count'], 30)
+        self.assertEqual(
+            [(error['row'], error['name']) for error in response.data['errors']],
+            [(32, 'Bad Price'), (33, 'Unknown Brand')],
+        )
+        self.assertEqual(Product.objects.filter(name__startswith='Vitamin ').count(), 34)
+        self.assertEqual(ProductAttribute.objects.get(product__name='Vitamin 7').value, '70 tabs')
+        # Queries do not grow with the number of rows
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='imports@example.com', username='imports', password='pass',
+            name='Imports', phone_number='9876543211',
+        )
+        cls.category = Category.objects.create(name='Vitamins')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def csv_file(self, lines, header="Category,SubCategory,Brand,Name,Description,Price,Stock,Image,Attributes"):
+        content = header + "\n" + "\n".join(lines) + "\n"
+        return SimpleUploadedFile('catalog.csv', content.encode('utf-8'), content_type='text/csv')
+
+    def test_admin_upload_queues_a_job_that_the_worker_runs(self):
+        existing = Product.objects.create(category=self.category, name='Vitamin C', price=Decimal('10.00'), stock=1)
+        ProductAttribute.objects.create(product=existing, name='size', value='old')
+        upload = self.csv_file([
+            'Vitamins,Chewables,Himalaya,Vitamin C,,55.00,20,,"[{""name"": ""size"", ""value"": ""60 tabs""}]"',
+            'Vitamins,,,Vitamin D3,,80.00,5,,',
+            'Vitamins,,,Broken,,abc,5,,',
+        ])
+
+        response = self.client.post(reverse('admin:upload_products_csv'), {'csv_file': upload})
+
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse('admin:products_importjob_progress', args=[job.pk]))
+        self.assertEqual(job.status, 'Pending')
+        self.assertFalse(Product.objects.filter(name='Vitamin D3').exists())
+        self.assertContains(self.client.get(response.url), f'Products import #{job.pk}')
+
+        self.assertEqual(jobs.process_next(), job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Completed')
+        self.assertEqual((job.total_rows, job.rows_processed, job.success_count, job.error_count), (3, 3, 2, 1))
+        self.assertEqual(job.errors[0]['row'], 4)
+        existing.refresh_from_db()
+        self.assertEqual((existing.price, existing.subcategory.name, existing.brand.name), (Decimal('55.00'), 'Chewables', 'Himalaya'))
+        self.assertEqual(list(existing.attributes.values_list('value', flat=True)), ['60 tabs'])
+        self.assertTrue(Product.objects.filter(name='Vitamin D3').exists())
+
+        status = self.client.get(reverse('admin:products_importjob_status', args=[job.pk])).json()
+        self.assertEqual((status['status'], status['success_count']), ('Completed', 2))
+        self.assertIsNone(jobs.process_next())
+
+    def test_interrupted_job_resumes_after_last_committed_chunk(self):
+        upload = self.csv_file(["Vitamins,Zinc Drops,Note", "Vitamins,Iron Syrup,Note", "Minerals,Calcium,Note"])
+        job = ImportJob.objects.create(
+            kind='subcategories', file=upload, status='Running', attempts=1, total_rows=3,
+            rows_processed=2, success_count=2, lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        # The first two rows were committed before the worker died
+        SubCategory.objects.create(name='Zinc Drops', category=self.category, description='Note')
+        SubCategory.objects.create(name='Iron Syrup', category=self.category, description='Note')
+
+        self.assertEqual(jobs.process_next(), job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.rows_processed, job.success_count), ('Completed', 2, 3, 3))
+        self.assertEqual(SubCategory.objects.count(), 3)
+        self.assertEqual(SubCategory.objects.get(name='Calcium').category.name, 'Minerals')
+
+    def test_job_running_under_a_live_lease_is_not_claimed(self):
+        ImportJob.objects.create(
+            kind='products', file=self.csv_file([]), status='Running',
+            lease_expires_at=timezone.now() + timedelta(minutes=1),
+        )
+        self.assertIsNone(jobs.process_next())
+
+
+def png_upload(name, size=(1600, 800)):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_DERIVATIVE_WORKERS=0)
+class ImageDerivativeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Devices')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_upload_renders_sizes_in_webp_and_jpeg(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                category=self.category, name='Thermometer', price=Decimal('250.00'), stock=3,
+                image=png_upload('thermometer.png'),
+            )
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        for size, expected in (('large', (1200, 600)), ('medium', (600, 300)), ('thumbnail', (200, 100))):
+            for extension, image_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                with default_storage.open(product.image_variants[size][extension]) as file:
+                    image = Image.open(file)
+                    self.assertEqual((image.size, image.format), (expected, image_format))
+
+        data = APIClient().get(reverse('product-detail', args=[product.pk])).json()
+        self.assertTrue(data['image_urls']['thumbnail']['webp'].endswith('/derivatives/thermometer.png/thumbnail.webp'))
+
+        # Replacing the image renders it again and removes the old files
+        old_thumbnail = product.image_variants['thumbnail']['jpeg']
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = png_upload('thermometer-v2.png', size=(300, 300))
+            product.save()
+        product.refresh_from_db()
+        self.assertIn('thermometer-v2', product.image_variants['thumbnail']['jpeg'])
+        self.assertFalse(default_storage.exists(old_thumbnail))
+
+    def test_images_differing_only_in_extension_keep_their_own_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            png = Product.objects.create(
+                category=self.category, name='Sale', price=Decimal('10.00'), stock=1, image=png_upload('sale.png'),
+            )
+            jpeg = Product.objects.create(
+                category=self.category, name='Sale', price=Decimal('10.00'), stock=1,
+                image=png_upload('sale.jpg', size=(300, 300)),
+            )
+        png.refresh_from_db()
+        jpeg.refresh_from_db()
+        self.assertNotEqual(png.image_variants['thumbnail']['webp'], jpeg.image_variants['thumbnail']['webp'])
+
+        # Replacing one image removes only its own derivatives
+        with self.captureOnCommitCallbacks(execute=True):
+            png.image = png_upload('sale-v2.png')
+            png.save()
+        for extension in ('webp', 'jpeg'):
+            with default_storage.open(jpeg.image_variants['thumbnail'][extension]) as file:
+                self.assertEqual(Image.open(file).size, (200, 200))
+
+    def test_backfill_command_renders_missing_derivatives(self):
+        brand = Brand.objects.create(name='Omron')
+        Brand.objects.filter(pk=brand.pk).update(image=default_storage.save('brands/images/omron.png', png_upload('omron.png')))
+
+        call_command('generate_image_derivatives', '--model', 'products.Brand', '--workers', '1', stdout=StringIO())
+
+        brand.refresh_from_db()
+        self.assertEqual(set(brand.image_variants), {'source', 'large', 'medium', 'thumbnail'})
+        self.assertEqual(APIClient().get(reverse('brand-detail', args=[brand.pk])).json()['image_urls'].keys(),
+                         {'large', 'medium', 'thumbnail'})
+
+
+class AttributeSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='attributes@example.com', username='attributes', password='pass',
+            name='Attributes', phone_number='9876543212',
+        )
+        category = Category.objects.create(name='Syrups')
+        cls.product = Product.objects.create(category=category, name='Cough Syrup', price=Decimal('90.00'), stock=5)
+        cls.small = ProductAttribute.objects.create(product=cls.product, name='size', value='100ml')
+        cls.large = ProductAttribute.objects.create(product=cls.product, name='size', value='200ml', additional_price=40)
+        cls.flavour = ProductAttribute.objects.create(product=cls.product, name='flavour', value='Mint')
+        cart = Cart.objects.create(user=cls.admin)
+        cls.cart_item = CartItem.objects.create(cart=cart, product=cls.product, selected_attribute=cls.large, quantity=1)
+
+    def test_update_keeps_ids_of_kept_attributes(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.patch(reverse('product-detail', args=[self.product.pk]), {'attributes': [
+            {'name': 'size', 'value': '100ml', 'additional_price': '0.00'},
+            {'name': 'size', 'value': '200ml', 'additional_price': '45.00'},
+            {'id': self.flavour.pk, 'name': 'flavour', 'value': 'Orange'},
+            {'name': 'size', 'value': '500ml', 'additional_price': '120.00'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        attributes = {(a.name, a.value): a for a in self.product.attributes.all()}
+        self.assertEqual(attributes[('size', '100ml')].pk, self.small.pk)
+        self.assertEqual(attributes[('size', '200ml')].pk, self.large.pk)
+        self.assertEqual(attributes[('size', '200ml')].additional_price, Decimal('45.00'))
+        self.assertEqual(attributes[('flavour', 'Orange')].pk, self.flavour.pk)
+        self.assertIn(('size', '500ml'), attributes)
+        self.cart_item.refresh_from_db()
+        self.assertEqual(self.cart_item.selected_attribute_id, self.large.pk)
+
+        # Multipart requests send the list as a JSON string
+        response = client.patch(
+            reverse('product-detail', args=[self.product.pk]),
+            {'attributes': '[{"name": "size", "value": "200ml", "additional_price": "45.00"}]'}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.product.attributes.values_list('id', flat=True)), [self.large.pk])
+
+    def test_price_edit_across_many_products_uses_a_fixed_number_of_queries(self):
+        category = Category.objects.create(name='Bulk')
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f'Item {index}', price=Decimal('10.00'), stock=1) for index in range(50)
+        ])
+        ProductAttribute.objects.bulk_create([
+            ProductAttribute(product=product, name='pack', value=value) for product in products for value in ('1', '2')
+        ])
+        wanted = {
+            product.pk: [
+                {'name': 'pack', 'value': '1', 'additional_price': 5},
+                {'name': 'pack', 'value': '2', 'additional_price': 9},
+            ]
+            for product in products
+        }
+        with CaptureQueriesContext(connection) as queries:
+            result = sync_product_attributes(wanted)
+        self.assertEqual(result, {'created': 0, 'updated': 100, 'deleted': 0})
+        self.assertLessEqual(len(queries), 5)
+        self.assertEqual(ProductAttribute.objects.filter(product__category=category, additional_price=9).count(), 50)
+
+
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='exports@example.com', username='exports', password='pass',
+            name='Exports', phone_number='9876543210',
+        )
+        cls.category = Category.objects.create(name='Vitamins')
+        other = Category.objects.create(name='Devices')
+        brand = Brand.objects.create(name='Himalaya')
+        for index in range(5):
+            product = Product.objects.create(
+                category=cls.category, brand=brand, name=f'Vitamin {index}', price=Decimal('10.50'), stock=index,
+            )
+            ProductAttribute.objects.create(product=product, name='size', value='30 tabs')
+            ProductAttribute.objects.create(product=product, name='size', value='60 tabs', additional_price=Decimal('8.00'))
+        Product.objects.create(category=other, name='Thermometer', price=Decimal('250.00'), stock=3)
+
+    def export(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get(reverse('product-export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export_uses_the_import_columns(self):
+        rows = list(csv.DictReader(StringIO(self.export(category=self.category.pk))))
+        self.assertEqual([row['Name'] for row in rows], [f'Vitamin {index}' for index in range(5)])
+        self.assertEqual(rows[0]['Brand'], 'Himalaya')
+        self.assertEqual(
+            json.loads(rows[0]['Attributes']),
+            [{'name': 'size', 'value': '30 tabs', 'additional_price': '0.00'},
+             {'name': 'size', 'value': '60 tabs', 'additional_price': '8.00'}],
+        )
+
+        # The export can be uploaded again unchanged
+        text = self.export()
+        result = ProductImporter(update_existing=True).run(csv.DictReader(StringIO(text)))
+        self.assertEqual((result.success_count, result.error_count), (6, 0))
+        self.assertEqual(Product.objects.count(), 6)
+        self.assertEqual(ProductAttribute.objects.count(), 10)
+
+    def test_ndjson_export_nests_attributes(self):
+        records = [json.loads(line) for line in self.export(output='ndjson', in_stock='true').splitlines()]
+        self.assertEqual([record['name'] for record in records], ['Vitamin 1', 'Vitamin 2', 'Vitamin 3', 'Vitamin 4', 'Thermometer'])
+        self.assertEqual([attribute['value'] for attribute in records[0]['attributes']], ['30 tabs', '60 tabs'])
+        self.assertIsNone(records[-1]['brand'])
+
+    def test_queries_grow_with_chunks_not_rows(self):
+        exporter = ProductExporter(Product.objects.all(), chunk_size=2)
+        with CaptureQueriesContext(connection) as queries:
+            lines = ''.join(exporter.csv()).splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(len(queries), 1 + 3)  # The products, then the attributes of each chunk of 2
+
+    def test_rejects_unknown_output_and_non_admins(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get(reverse('product-export'), {'output': 'xml'}).status_code, 400)
+        client.force_authenticate(User.objects.create_user(
+            email='shopper@example.com', username='shopper', password='pass', name='Shopper', phone_number='9876543211',
+        ))
+        self.assertEqual(client.get(reverse('product-export')).status_code, 403)
+
+    def test_admin_action_streams_the_selected_products(self):
+        self.client.force_login(self.admin)
+        selected = Product.objects.filter(name__in=['Vitamin 0', 'Thermometer'])
+        response = self.client.post(reverse('admin:products_product_changelist'), {
+            'action': 'export_csv', '_selected_action': [product.pk for product in selected],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual([row['Name'] for row in rows], ['Vitamin 0', 'Thermometer'])
 
-# Create your tests here.
@@ -11,6 +11,8 @@ urlpatterns = [
     path('brands/', views.BrandListCreateView.as_view(), name='brand-list-create'),
     path('brands/<int:pk>/', views.BrandDetailView.as_view(), name='brand-detail'),
     path('products/', views.ProductListCreateView.as_view(), name='product-list-create'),
+    path('products/search/', views.ProductSearchView.as_view(), name='product-search'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('products/export/', views.ProductExportView.as_view(), name='product-export'),
     path('products/bulk-upload/', views.BulkUploadProductsView.as_view(), name='bulk-upload-products'),
 ]
@@ -1,6 +1,13 @@
 import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
 from .models import ProductAttribute
 
+ATTRIBUTE_FIELDS = ['name', 'value', 'additional_price']
+
 def create_product_attributes(product, attributes_data):
     """
     Parse and create ProductAttribute instances for a given product.
@@ -26,3 +33,65 @@ def create_product_attributes(product, attributes_data):
             value=attr.get('value', ''),
             additional_price=attr.get('additional_price', 0.00)
         )
+
+
+def sync_product_attributes(wanted):
+    """
+    Make each product's attributes match a submitted list, writing only the
+    differences.
+
+    :param wanted: {product id: [{"id"?, "name", "value", "additional_price"?}, ...]}
+    :return: {"created": n, "updated": n, "deleted": n}
+
+    A submitted attribute with the id of one of the product's rows updates
+    that row; otherwise it reuses an unclaimed row with the same name and
+    value, so a price change keeps the row. Rows nothing claims are deleted.
+    Row ids therefore stay stable, and cart and order lines that reference an
+    attribute keep it. All products are handled with one select, one
+    bulk_update, one bulk_create and one delete. The bulk writes send no
+    signals; callers save or announce the products afterwards.
+    """
+    existing = defaultdict(list)
+    for attribute in ProductAttribute.objects.filter(product_id__in=list(wanted)).order_by('id'):
+        existing[attribute.product_id].append(attribute)
+
+    to_create, to_update, to_delete = [], [], []
+    for product_id, items in wanted.items():
+        rows = {row.pk: row for row in existing.get(product_id, [])}
+        matches = []
+        unmatched = []
+        for item in items:
+            values = {
+                'name': item['name'],
+                'value': item['value'],
+                'additional_price': Decimal(str(item.get('additional_price') or 0)),
+            }
+            row = rows.pop(item.get('id'), None)
+            if row is not None:
+                matches.append((row, values))
+            else:
+                unmatched.append(values)
+
+        free = defaultdict(list)
+        for row in rows.values():
+            free[(row.name, row.value)].append(row)
+        for values in unmatched:
+            candidates = free.get((values['name'], values['value']))
+            if candidates:
+                matches.append((candidates.pop(0), values))
+            else:
+                to_create.append(ProductAttribute(product_id=product_id, **values))
+        to_delete.extend(row.pk for candidates in free.values() for row in candidates)
+
+        for row, values in matches:
+            if any(getattr(row, field) != values[field] for field in ATTRIBUTE_FIELDS):
+                for field in ATTRIBUTE_FIELDS:
+                    setattr(row, field, values[field])
+                to_update.append(row)
+
+    with transaction.atomic():
+        if to_delete:
+            ProductAttribute.objects.filter(pk__in=to_delete).delete()
+        ProductAttribute.objects.bulk_update(to_update, ATTRIBUTE_FIELDS)
+        ProductAttribute.objects.bulk_create(to_create)
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
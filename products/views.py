@@ -4,16 +4,25 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from .models import Category, SubCategory, Brand, Product, ProductAttribute
+from .models import Category, SubCategory, Brand, Product
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ValidationError
+from .pagination import ProductListPagination, ProductSearchPagination
+from . import facets, search
+from .exports import ProductExporter
+from .importers import ProductImporter, text_rows
+from settings.catalog import CatalogCacheMixin
+from settings.exports import CONTENT_TYPES
 from .serializers import (
     CategorySerializer,
     SubCategorySerializer,
     BrandSerializer,
+    ProductAttributeSerializer,
     ProductSerializer
 )
 
 # --- Category Views ---
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all().order_by("id")
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -26,7 +35,7 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # --- SubCategory Views ---
-class SubCategoryListCreateView(generics.ListCreateAPIView):
+class SubCategoryListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     queryset = SubCategory.objects.all().order_by("id")
     serializer_class = SubCategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -39,7 +48,7 @@ class SubCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # --- Brand Views ---
-class BrandListCreateView(generics.ListCreateAPIView):
+class BrandListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     queryset = Brand.objects.all().order_by("id")
     serializer_class = BrandSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -52,10 +61,67 @@ class BrandDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # --- Product Views ---
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductFilterMixin:
+    """
+    Catalog filters read from the query string: category, subcategory and
+    brand (ids; repeat the parameter or comma-separate to select several),
+    min_price, max_price and in_stock (true/false).
+    """
+    def get_filters(self):
+        params = self.request.query_params
+        filters = {}
+        try:
+            for dimension in facets.DIMENSIONS:
+                values = [value for param in params.getlist(dimension) for value in param.split(',') if value]
+                if values:
+                    filters[dimension] = [int(value) for value in values]
+            for bound in ('min_price', 'max_price'):
+                if params.get(bound):
+                    filters[bound] = Decimal(params[bound])
+        except (ValueError, InvalidOperation):
+            raise ValidationError({"detail": "Invalid filter value."})
+        in_stock = params.get('in_stock')
+        if in_stock is not None:
+            if in_stock.lower() not in ('true', 'false', '1', '0'):
+                raise ValidationError({"detail": "in_stock must be true or false."})
+            filters['in_stock'] = in_stock.lower() in ('true', '1')
+        return filters
+
+    def filter_products(self, queryset, filters):
+        for dimension in facets.DIMENSIONS:
+            if dimension in filters:
+                queryset = queryset.filter(**{f'{dimension}_id__in': filters[dimension]})
+        if 'min_price' in filters:
+            queryset = queryset.filter(price__gte=filters['min_price'])
+        if 'max_price' in filters:
+            queryset = queryset.filter(price__lte=filters['max_price'])
+        if filters.get('in_stock') is True:
+            queryset = queryset.filter(stock__gt=0)
+        elif filters.get('in_stock') is False:
+            queryset = queryset.filter(stock=0)
+        return queryset
+
+
+class ProductListCreateView(ProductFilterMixin, CatalogCacheMixin, generics.ListCreateAPIView):
+    """
+    Paginated catalog listing with filters and facet counts.
+
+    Takes the ProductFilterMixin filters. The response carries `facets` with
+    the number of products each category, subcategory, brand, price band and
+    stock state would return, computed from the in-memory facet index.
+    """
+    catalog_shows_stock = True
     queryset = Product.objects.all().order_by("id")
     serializer_class = ProductSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    pagination_class = ProductListPagination
+
+    def list(self, request, *args, **kwargs):
+        filters = self.get_filters()
+        queryset = self.filter_products(self.get_queryset().prefetch_related('attributes'), filters)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data, facets=facets.get_index().counts(filters))
 
     def create(self, request, *args, **kwargs):
         attributes = request.data.get("attributes")
@@ -69,6 +135,21 @@ class ProductListCreateView(generics.ListCreateAPIView):
         return super().create(request, *args, **kwargs)
 
 
+class ProductSearchView(generics.ListAPIView):
+    """
+    Relevance-ranked product search: /products/search/?q=<text>
+
+    Matches name, description, brand, category and attribute values; each
+    term is matched as a prefix and all terms must match.
+    """
+    serializer_class = ProductSerializer
+    pagination_class = ProductSearchPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        return search.search(query, Product.objects.prefetch_related('attributes'))
+
+
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -76,24 +157,24 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def update(self, request, *args, **kwargs):
+        # Multipart requests send attributes as a JSON string, which the nested
+        # serializer skips; validate it separately and pass it to save().
+        extra = {}
         attributes = request.data.get("attributes")
         if attributes and isinstance(attributes, str):
             try:
                 attributes = json.loads(attributes)
             except json.JSONDecodeError:
                 return Response({"error": "Invalid JSON format for attributes."}, status=status.HTTP_400_BAD_REQUEST)
+            attribute_serializer = ProductAttributeSerializer(data=attributes, many=True)
+            attribute_serializer.is_valid(raise_exception=True)
+            extra["attributes"] = attribute_serializer.validated_data
 
         partial = kwargs.pop("partial", False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        instance = serializer.save()
-
-        if attributes is not None:
-            instance.attributes.all().delete()
-            for attr in attributes:
-                ProductAttribute.objects.create(product=instance, **attr)
-
+        serializer.save(**extra)
         return Response(serializer.data)
 
 
@@ -101,6 +182,9 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
 class BulkUploadProductsView(APIView):
     """
     Handle bulk uploading of products via CSV file.
+
+    The upload is parsed as a stream and written in chunked bulk inserts by
+    ProductImporter; rows that fail validation are skipped and reported.
     """
     permission_classes = [permissions.IsAdminUser]
 
@@ -108,53 +192,39 @@ class BulkUploadProductsView(APIView):
         if "file" not in request.FILES:
             return Response({"error": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-        file = request.FILES["file"]
-        decoded_file = file.read().decode("utf-8").splitlines()
-        reader = csv.DictReader(decoded_file)
-
-        errors = []
-        success_count = 0
-
-        for row in reader:
-            try:
-                # Fetch related objects by name
-                category = Category.objects.get(name=row["Category"].strip())
-                subcategory = SubCategory.objects.get(name=row["Subcategory"].strip(), category=category)
-                brand = Brand.objects.get(name=row["Brand"].strip())
-
-                # Create product
-                product = Product.objects.create(
-                    name=row["Name"].strip(),
-                    description=row.get("Description", "").strip(),
-                    price=float(row["Price"]),
-                    stock=int(row["Stock"]),
-                    category=category,
-                    subcategory=subcategory,
-                    brand=brand,
-                )
-
-                # Add attributes if present
-                if "Attributes" in row and row["Attributes"]:
-                    attributes = json.loads(row["Attributes"])
-                    for attr in attributes:
-                        ProductAttribute.objects.create(
-                            product=product,
-                            name=attr["name"],
-                            value=attr["value"],
-                            additional_price=float(attr.get("additional_price", 0)),
-                        )
-
-                success_count += 1
-
-            except Exception as e:
-                errors.append({"row": row, "error": str(e)})
+        try:
+            result = ProductImporter().run(text_rows(request.FILES["file"]))
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": f"Could not read CSV file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
         response_data = {
-            "success_count": success_count,
-            "errors": errors,
+            "success_count": result.success_count,
+            "error_count": result.error_count,
+            "errors": result.errors,
         }
 
-        if errors:
+        if result.error_count:
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(response_data, status=status.HTTP_201_CREATED)
+
+
+# --- Export ---
+class ProductExportView(ProductFilterMixin, APIView):
+    """
+    Stream the catalog with attributes as CSV (the bulk upload columns) or
+    NDJSON, chosen with ?output=csv|ndjson. Takes the same filters as the
+    product list.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    # The export format comes from ?output=, whatever the Accept header says
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'csv')
+        if output not in CONTENT_TYPES:
+            return Response({"detail": "output must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_products(Product.objects.all(), self.get_filters())
+        return ProductExporter(queryset).response(output, 'products')
@@ -0,0 +1,125 @@
+# settings/catalog.py
+
+"""
+Versioned response caching and conditional GET for catalog endpoints.
+
+Catalog reads vastly outnumber catalog writes, so every write bumps a single
+version number (settings/signals.py) and GET responses of catalog list views
+are cached under that version. A response carries an ETag made of the version
+and the request URL; a client that sends it back in If-None-Match gets an
+empty 304 while the catalog is unchanged, and other clients get the cached
+data without a query or serializer run. Entries of older versions are never
+read again and expire after CATALOG_CACHE_TIMEOUT seconds.
+
+The version lives in the database rather than the cache so that every process
+sees a bump as soon as it commits. Writes bump it once their transaction
+commits, once per transaction however many catalog rows it saved. Stock
+changes do not bump it: checkout would then write the version row in every
+order. Views whose responses show stock set `catalog_shows_stock`, and their
+cached responses are replaced every CATALOG_STOCK_TTL seconds instead.
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CatalogVersion
+
+DEFAULT_TIMEOUT = 3600
+DEFAULT_MAX_AGE = 0
+DEFAULT_STOCK_TTL = 30
+
+
+def current_version():
+    return CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def bump():
+    if CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        return
+    _, created = CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+    if not created:
+        CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1)
+
+
+class PendingBump:
+    """
+    A bump shared by the on_commit callbacks of one transaction: the first of
+    them to run bumps the version, the rest do nothing.
+    """
+
+    def __init__(self):
+        self.done = False
+
+    def __call__(self):
+        if self.done:
+            return
+        self.done = True
+        if getattr(_pending, 'bump', None) is self:
+            _pending.bump = None
+        bump()
+
+
+_pending = threading.local()
+
+
+def bump_on_commit():
+    """Bump the version when the current transaction commits, once however often it is called."""
+    # Every call registers a callback, so a rolled-back savepoint cannot drop
+    # the bump of the writes that remain. A bump whose callbacks were all
+    # rolled back is never done, and is simply reused by the next transaction.
+    pending = getattr(_pending, 'bump', None)
+    if pending is None or pending.done:
+        pending = _pending.bump = PendingBump()
+    transaction.on_commit(pending)
+
+
+class CatalogCacheMixin:
+    """
+    View mixin: serve GET from the versioned cache and answer a matching
+    If-None-Match with 304. Only for views whose responses do not depend on
+    the requesting user. Views that show stock set `catalog_shows_stock`.
+    """
+    catalog_shows_stock = False
+
+    def get(self, request, *args, **kwargs):
+        version = current_version()
+        timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+        if self.catalog_shows_stock:
+            # A new cache key, and ETag, every CATALOG_STOCK_TTL seconds
+            timeout = getattr(settings, 'CATALOG_STOCK_TTL', DEFAULT_STOCK_TTL)
+            version = f"{version}.{int(time.time() // timeout)}"
+        # Absolute URL: serialized image URLs include the host
+        variant = f"{request.build_absolute_uri()}|{request.accepted_media_type}"
+        digest = hashlib.md5(variant.encode()).hexdigest()[:16]
+        etag = f'"{version}-{digest}"'
+
+        if_none_match = [tag.removeprefix('W/') for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f"catalog:{version}:{digest}"
+            data = cache.get(key)
+            if data is None:
+                response = super().get(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, timeout)
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(
+            response, private=True, must_revalidate=True,
+            max_age=getattr(settings, 'CATALOG_CACHE_MAX_AGE', DEFAULT_MAX_AGE),
+        )
+        return response
@@ -0,0 +1,88 @@
+# settings/exports.py
+
+"""
+Streaming CSV and NDJSON exports, shared by the catalog (products/exports.py)
+and order (orders/exports.py) exports.
+
+An exporter walks its queryset with `.iterator(chunk_size=...)`, which reads
+the rows through a server-side cursor where the database has one, and runs
+its prefetches once per chunk. Each record is written as soon as it is read
+and the output is handed to a StreamingHttpResponse in pieces of about
+BUFFER_SIZE characters, so memory use depends on the chunk size, not the
+table size. NDJSON has one JSON object per line with the related rows nested;
+the CSV layout is up to each exporter.
+"""
+
+import csv
+import json
+from io import StringIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+DEFAULT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Exporter:
+    """Base class: subclasses set `header` and implement prepare(), record() and rows()."""
+    header = ()
+
+    def __init__(self, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    def prepare(self, queryset):
+        """Add the joins and prefetches record() needs, and a stable order."""
+        return queryset
+
+    def record(self, obj):
+        """Return the NDJSON object for `obj`."""
+        raise NotImplementedError
+
+    def rows(self, record):
+        """Yield the CSV rows of a record."""
+        raise NotImplementedError
+
+    def records(self):
+        for obj in self.prepare(self.queryset).iterator(chunk_size=self.chunk_size):
+            yield self.record(obj)
+
+    def csv(self):
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.header)
+        for record in self.records():
+            writer.writerows(self.rows(record))
+            if buffer.tell() >= BUFFER_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def ndjson(self):
+        lines = []
+        size = 0
+        for record in self.records():
+            line = json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+            lines.append(line)
+            size += len(line) + 1
+            if size >= BUFFER_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+                size = 0
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    def response(self, output, name):
+        """A StreamingHttpResponse downloading the export as `name`-<timestamp>.<output>."""
+        content = self.csv() if output == 'csv' else self.ndjson()
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[output])
+        filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
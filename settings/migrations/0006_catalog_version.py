@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings', '0005_ordersettings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings', '0006_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banner',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies; see products/images.py'),
+        ),
+    ]
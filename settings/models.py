@@ -21,6 +21,7 @@ class Banner(models.Model):
 
     banner_type = models.IntegerField(choices=BANNER_TYPES, help_text="Type of banner")
     image = models.ImageField(upload_to='banners/images/', blank=True, null=True, help_text="Image for the banner")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized copies; see products/images.py")
     redirect_url = models.URLField(blank=True, null=True, help_text="Optional URL to redirect when banner is clicked")
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -37,4 +38,16 @@ class OrderSettings(models.Model):
         return settings
 
     def __str__(self):
-        return f"COD: {self.cod_enabled}, Wallet: {self.wallet_enabled}, Razorpay: {self.razorpay_enabled}"
\ No newline at end of file
+        return f"COD: {self.cod_enabled}, Wallet: {self.wallet_enabled}, Razorpay: {self.razorpay_enabled}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Counter bumped on every write to the catalog: categories, subcategories,
+    brands, products, their attributes and banners. Cached catalog responses
+    and their ETags are keyed by it; see settings/catalog.py.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
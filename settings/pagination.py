@@ -0,0 +1,18 @@
+# settings/pagination.py
+
+from rest_framework.pagination import CursorPagination
+
+
+class FeedCursorPagination(CursorPagination):
+    """
+    Base cursor pagination for feeds and queues; subclasses set `ordering`
+    and, if they need another default, `page_size`.
+
+    The cursor records the first ordering field of the last row seen, plus an
+    offset past the rows that share it, so every page is an indexed range scan
+    no matter how deep the client has paged. End the ordering with `id` to
+    make it total.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -7,11 +7,14 @@ class ConversionsSerializer(serializers.ModelSerializer):
         fields = ['referral_reward_points', 'point_to_cash_conversion_rate']
 # settings/serializers.py
 from rest_framework import serializers
+from products.serializers import ImageVariantsField
 
 class BannerSerializer(serializers.ModelSerializer):
+    image_urls = ImageVariantsField()
+
     class Meta:
         model = Banner
-        fields = ['id', 'banner_type', 'image', 'redirect_url']
+        fields = ['id', 'banner_type', 'image', 'image_urls', 'redirect_url']
 class OrderSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderSettings
@@ -0,0 +1,30 @@
+# settings/signals.py
+
+"""
+Receivers that bump the catalog version on every catalog write and render
+banner image derivatives. Connected in SettingsConfig.ready().
+"""
+
+from . import catalog
+
+CATALOG_MODELS = (
+    'products.Category', 'products.SubCategory', 'products.Brand', 'products.Product',
+    'products.ProductAttribute', 'settings.Banner',
+)
+
+
+def catalog_changed(sender, **kwargs):
+    catalog.bump_on_commit()
+
+
+def connect():
+    from django.db.models.signals import post_delete, post_save
+
+    from products.signals import image_saved, products_imported, subcategories_imported
+
+    for model in CATALOG_MODELS:
+        post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_{model}_saved')
+        post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_{model}_deleted')
+    products_imported.connect(catalog_changed, dispatch_uid='catalog_products_imported')
+    subcategories_imported.connect(catalog_changed, dispatch_uid='catalog_subcategories_imported')
+    post_save.connect(image_saved, sender='settings.Banner', dispatch_uid='images_banner_saved')
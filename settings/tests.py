@@ -1,3 +1,104 @@
-from django.test import TestCase
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from products.models import Category, Product, ProductAttribute
+from products.signals import stock_changed
+from .catalog import current_version
+from .models import Banner
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Pain Relief')
+        cls.product = Product.objects.create(category=cls.category, name='Paracetamol', price=Decimal('20.00'), stock=10)
+        Banner.objects.create(banner_type=1, redirect_url='https://example.com/offer')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_unchanged_catalog_is_served_from_cache_and_revalidated(self):
+        url = reverse('category-list-create')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url)
+        self.assertEqual(len(queries), 1)  # The catalog version only
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_catalog_writes_bump_the_version(self):
+        url = reverse('banners-by-type', args=[1])
+        etag = self.client.get(url)['ETag']
+
+        version = current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Vitamins')
+        with self.captureOnCommitCallbacks(execute=True):
+            Banner.objects.create(banner_type=1, redirect_url='https://example.com/new')
+        self.assertEqual(current_version(), version + 2)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_a_transaction_bumps_the_version_once(self):
+        version = current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal('25.00')
+            self.product.save()
+            ProductAttribute.objects.create(product=self.product, name='size', value='10 tablets')
+            ProductAttribute.objects.create(product=self.product, name='size', value='20 tablets')
+        self.assertEqual(current_version(), version + 1)
+
+    def test_rolled_back_writes_do_not_hold_back_later_bumps(self):
+        version = current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                Category.objects.create(name='Dropped')
+                raise ValueError
+        self.assertEqual(current_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Kept')
+            with self.assertRaises(ValueError), transaction.atomic():
+                Category.objects.create(name='Dropped')
+                raise ValueError
+        self.assertEqual(current_version(), version + 1)
+
+    def test_stock_changes_do_not_bump_the_version(self):
+        version = current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).update(stock=3)
+            stock_changed.send(sender=Product, product_ids=[self.product.pk])
+        self.assertEqual(current_version(), version)
+
+    def test_product_list_shows_stock_at_most_one_ttl_old(self):
+        url = reverse('product-list-create')
+        with override_settings(CATALOG_STOCK_TTL=0.05):
+            self.assertEqual(self.client.get(url).json()['results'][0]['stock'], 10)
+            Product.objects.filter(pk=self.product.pk).update(stock=3)
+            time.sleep(0.1)
+            self.assertEqual(self.client.get(url).json()['results'][0]['stock'], 3)
+
+    def test_etag_depends_on_the_query_string(self):
+        url = reverse('product-list-create')
+        etag = self.client.get(url)['ETag']
+        filtered = self.client.get(url, {'category': self.category.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(filtered.status_code, 200)
+        self.assertEqual(filtered.json()['count'], 1)
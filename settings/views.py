@@ -5,6 +5,7 @@ from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Banner
+from .catalog import CatalogCacheMixin
 
 
 class ConversionsListView(generics.ListAPIView):
@@ -12,12 +13,15 @@ class ConversionsListView(generics.ListAPIView):
     serializer_class = ConversionsSerializer
     permission_classes = [permissions.IsAdminUser]  # Restrict access to admins
 
-class BannersByTypeView(APIView):
+class BannersByTypeView(CatalogCacheMixin, generics.ListAPIView):
+    serializer_class = BannerSerializer
     permission_classes = [permissions.AllowAny]
-    def get(self, request, banner_type):
-        banners = Banner.objects.filter(banner_type=banner_type)
-        serializer = BannerSerializer(banners, many=True)
-        return Response(serializer.data)
+    pagination_class = None
+
+    def get_queryset(self):
+        return Banner.objects.filter(banner_type=self.kwargs['banner_type'])
+
+
 class OrderSettingsView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users import uploads
+
+
+class Command(BaseCommand):
+    help = "Delete upload sessions untouched for UPLOAD_SESSION_TTL_HOURS, with their staged chunks."
+
+    def handle(self, *args, **options):
+        purged = uploads.purge_stale()
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} upload session(s)"))
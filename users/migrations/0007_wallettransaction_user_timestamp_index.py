@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_remove_user_latitude_remove_user_longitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='wallet_txn_user_time_idx'),
+        ),
+    ]
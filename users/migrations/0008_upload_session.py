@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-18 07:53
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_wallettransaction_user_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('purpose', models.CharField(choices=[('prescription', 'Prescription'), ('profile_photo', 'Profile photo')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('Uploading', 'Uploading'), ('Completed', 'Completed')], default='Uploading', max_length=20)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
 from django.core.validators import RegexValidator
@@ -70,5 +72,49 @@ class WalletTransaction(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='wallet_txn_user_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.transaction_type} - ₹{self.amount}"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload; see users/uploads.py.
+
+    `offset` is the number of bytes received so far; the staging file may be
+    longer if a chunk was cut off, and is truncated to it before the next one.
+    `result` records what the completed file was attached to.
+    """
+    PURPOSE_CHOICES = (
+        ('prescription', 'Prescription'),
+        ('profile_photo', 'Profile photo'),
+    )
+    STATUS_CHOICES = (
+        ('Uploading', 'Uploading'),
+        ('Completed', 'Completed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, related_name='upload_sessions', on_delete=models.CASCADE)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Uploading')
+    result = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.filename} ({self.offset}/{self.size})"
+
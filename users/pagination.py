@@ -0,0 +1,8 @@
+# users/pagination.py
+
+from settings.pagination import FeedCursorPagination
+
+
+class WalletTransactionCursorPagination(FeedCursorPagination):
+    """Wallet transactions by (timestamp, id), newest first."""
+    ordering = ('-timestamp', '-id')
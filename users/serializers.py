@@ -1,5 +1,11 @@
+import os
+import re
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
-from .models import User, Address, Referral
+from .models import User, Address, Referral, UploadSession
+from . import uploads
 from settings.models import Conversions  # Import Conversions
 
 class UserSerializer(serializers.ModelSerializer):
@@ -97,4 +103,34 @@ from .models import WalletTransaction
 class WalletTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = WalletTransaction
-        fields = ['id', 'transaction_type', 'amount', 'timestamp', 'description']
\ No newline at end of file
+        fields = ['id', 'transaction_type', 'amount', 'timestamp', 'description']
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    max_chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'purpose', 'filename', 'size', 'sha256', 'offset', 'status', 'result', 'max_chunk_size', 'created_at']
+        read_only_fields = ['offset', 'status', 'result', 'created_at']
+
+    def get_max_chunk_size(self, obj):
+        return uploads.max_chunk_size()
+
+    def validate_filename(self, value):
+        try:
+            return get_valid_filename(os.path.basename(value.replace('\\', '/')))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError("Invalid file name.")
+
+    def validate_size(self, value):
+        if not 0 < value <= uploads.max_size():
+            raise serializers.ValidationError(f"Size must be between 1 and {uploads.max_size()} bytes.")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError("Must be a hex SHA-256 digest.")
+        return value
+
@@ -1,3 +1,168 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from prescriptions.models import Prescription
+from . import uploads
+from .models import UploadSession, User, WalletTransaction
+
+
+class WalletHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='wallet@example.com', username='wallet', password='pass',
+            name='Wallet', phone_number='9876543210',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def credit(self, count):
+        return [
+            WalletTransaction.objects.create(user=self.user, transaction_type='credit', amount=index + 1)
+            for index in range(count)
+        ]
+
+    def test_transaction_pages_are_stable_while_transactions_arrive(self):
+        transactions = self.credit(5)
+        WalletTransaction.objects.filter(pk=transactions[1].pk).update(timestamp=transactions[2].timestamp)
+        url = reverse('wallet')
+
+        first = self.client.get(url, {'page_size': 2}).data
+        self.assertIsNone(first['previous'])
+        self.credit(1)
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+
+        seen = [row['id'] for page in (first, second, third) for row in page['transactions']]
+        self.assertEqual(sorted(seen), sorted(transaction.pk for transaction in transactions))
+        self.assertIsNone(third['next'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual([row['id'] for row in back['transactions']], [row['id'] for row in first['transactions']])
+
+
+def jpeg_bytes(size=(400, 300)):
+    buffer = BytesIO()
+    Image.effect_noise(size, 60).convert('RGB').save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_STAGING_DIR=tempfile.mkdtemp(), IMAGE_DERIVATIVE_WORKERS=0,
+)
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='uploader@example.com', username='uploader', password='pass',
+            name='Uploader', phone_number='9876543210',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(settings.UPLOAD_STAGING_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def open_upload(self, content, purpose='prescription', **overrides):
+        data = {
+            'purpose': purpose, 'filename': '../IMG 0042.jpg', 'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest(), **overrides,
+        }
+        response = self.client.post(reverse('upload-create'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put_chunk(self, upload_id, offset, chunk):
+        return self.client.put(
+            reverse('upload-detail', args=[upload_id]), chunk,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_interrupted_upload_resumes_and_becomes_a_prescription(self):
+        content = jpeg_bytes()
+        upload_id = self.open_upload(content)
+        third = len(content) // 3
+
+        self.assertEqual(self.put_chunk(upload_id, 0, content[:third])['Upload-Offset'], str(third))
+        # A retry of a chunk that already arrived is refused with the offset to resume from
+        response = self.put_chunk(upload_id, 0, content[:third])
+        self.assertEqual((response.status_code, response.data['offset']), (409, third))
+        # The connection drops halfway through the second chunk
+        session = UploadSession.objects.get(pk=upload_id)
+        uploads.append(session, third, BytesIO(content[third:third + 100]), third)
+
+        offset = self.client.get(reverse('upload-detail', args=[upload_id])).data['offset']
+        self.assertEqual(offset, third + 100)
+        self.assertEqual(self.client.post(reverse('upload-complete', args=[upload_id])).status_code, 409)
+        self.assertEqual(self.put_chunk(upload_id, offset, content[offset:]).status_code, 200)
+
+        response = self.client.post(reverse('upload-complete', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+        prescription = Prescription.objects.get(pk=response.data['result']['prescription_id'])
+        self.assertEqual(prescription.user, self.user)
+        self.assertTrue(prescription.image.name.startswith('prescriptions/IMG_0042'))
+        with prescription.image.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(os.path.exists(uploads.staging_path(session)))
+
+        # Completing again returns the same result instead of a second prescription
+        again = self.client.post(reverse('upload-complete', args=[upload_id]))
+        self.assertEqual(again.data['result'], response.data['result'])
+        self.assertEqual(Prescription.objects.count(), 1)
+
+    def test_profile_photo_upload(self):
+        content = jpeg_bytes((64, 64))
+        upload_id = self.open_upload(content, purpose='profile_photo')
+        self.put_chunk(upload_id, 0, content)
+        response = self.client.post(reverse('upload-complete', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(default_storage.exists(self.user.profile_photo.name))
+
+    def test_checksum_mismatch_restarts_the_upload(self):
+        content = jpeg_bytes((64, 64))
+        upload_id = self.open_upload(content, sha256=hashlib.sha256(b'other').hexdigest())
+        self.put_chunk(upload_id, 0, content)
+        response = self.client.post(reverse('upload-complete', args=[upload_id]))
+        self.assertEqual((response.status_code, response.data['offset']), (400, 0))
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).offset, 0)
+
+    def test_sessions_are_private_and_bounded(self):
+        upload_id = self.open_upload(b'x' * 10)
+        self.assertEqual(self.put_chunk(upload_id, 0, b'x' * 11).status_code, 400)
+        response = self.client.post(reverse('upload-create'), {
+            'purpose': 'prescription', 'filename': 'a.jpg', 'size': uploads.max_size() + 1, 'sha256': '0' * 64,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other = User.objects.create_user(
+            email='other@example.com', username='other', password='pass', name='Other', phone_number='9876543211',
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(reverse('upload-detail', args=[upload_id])).status_code, 404)
+
+    def test_purge_removes_stale_sessions_and_their_chunks(self):
+        upload_id = self.open_upload(b'x' * 10)
+        self.put_chunk(upload_id, 0, b'x' * 5)
+        session = UploadSession.objects.get(pk=upload_id)
+        UploadSession.objects.filter(pk=upload_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_upload_sessions', stdout=StringIO())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(uploads.staging_path(session)))
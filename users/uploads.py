@@ -0,0 +1,192 @@
+# users/uploads.py
+
+"""
+Resumable chunked uploads of prescription and profile photos.
+
+The client opens an UploadSession with the file's name, size and SHA-256,
+then PUTs the bytes in order, each request naming the offset it starts at in
+an Upload-Offset header. Request bodies are copied to a staging file under
+UPLOAD_STAGING_DIR in blocks of BLOCK_SIZE, so no request holds a whole chunk
+in memory, and the bytes that arrived before a dropped connection are kept.
+A client that lost its connection asks for the session's offset and carries
+on from there. Once every byte is in, completing the session checks the
+SHA-256 and that the file is an image, attaches it to its target and removes
+the staging file.
+
+Sessions left unfinished for UPLOAD_SESSION_TTL_HOURS are removed by
+`manage.py purge_upload_sessions`.
+"""
+
+import fcntl
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import UploadSession
+
+BLOCK_SIZE = 64 * 1024
+DEFAULT_MAX_SIZE = 25 * 1024 * 1024
+DEFAULT_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_TTL_HOURS = 24
+
+
+class UploadError(Exception):
+    """A request the session cannot accept; `offset` tells the client where to resume."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def max_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def max_chunk_size():
+    return getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', DEFAULT_MAX_CHUNK_SIZE)
+
+
+def staging_path(session):
+    directory = getattr(settings, 'UPLOAD_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'medzy-uploads'))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{session.pk}.part')
+
+
+def remove_staging_file(session):
+    try:
+        os.remove(staging_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def append(session, offset, stream, length):
+    """
+    Write `length` bytes read from `stream` at `offset` of the session's file
+    and return the new offset. Bytes read before the stream ends early are
+    kept, so the client resumes after them.
+    """
+    if session.status != 'Uploading':
+        raise UploadError("The upload is already complete.", status=409)
+    if length > max_chunk_size():
+        raise UploadError(f"Chunks can be at most {max_chunk_size()} bytes.", status=413, offset=session.offset)
+    if offset + length > session.size:
+        raise UploadError("The chunk runs past the declared size.", offset=session.offset)
+
+    path = staging_path(session)
+    with open(path, 'ab+') as staging:
+        try:
+            fcntl.flock(staging, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("Another chunk of this upload is being received.", status=409, offset=session.offset)
+        # Re-read under the lock: a concurrent request may have moved it
+        session.refresh_from_db(fields=['offset', 'status'])
+        if session.status != 'Uploading':
+            raise UploadError("The upload is already complete.", status=409)
+        if offset != session.offset:
+            raise UploadError("The chunk does not start at the upload's offset.", status=409, offset=session.offset)
+        staging.truncate(offset)  # Drop the tail of a chunk that was cut off
+        received = 0
+        while received < length:
+            block = stream.read(min(BLOCK_SIZE, length - received))
+            if not block:
+                break
+            staging.write(block)
+            received += len(block)
+        staging.flush()
+        os.fsync(staging.fileno())
+        session.offset = offset + received
+        session.save(update_fields=['offset', 'updated_at'])
+    return session.offset
+
+
+def file_sha256(staged):
+    digest = hashlib.sha256()
+    staged.seek(0)
+    for block in iter(lambda: staged.read(BLOCK_SIZE), b''):
+        digest.update(block)
+    staged.seek(0)
+    return digest.hexdigest()
+
+
+def restart(session):
+    remove_staging_file(session)
+    session.offset = 0
+    session.save(update_fields=['offset', 'updated_at'])
+
+
+def attach_prescription(user, upload):
+    from prescriptions.models import Prescription
+
+    prescription = Prescription.objects.create(user=user, image=upload)
+    return {'prescription_id': prescription.pk}
+
+
+def attach_profile_photo(user, upload):
+    user.profile_photo = upload
+    user.save(update_fields=['profile_photo'])
+    return {'profile_photo': user.profile_photo.name}
+
+
+# purpose -> function(user, django File) returning the session's result
+TARGETS = {
+    'prescription': attach_prescription,
+    'profile_photo': attach_profile_photo,
+}
+
+
+def complete(session):
+    """Verify the received file, attach it to the session's target and return the result."""
+    if session.status == 'Completed':
+        return session.result
+    if session.offset != session.size:
+        raise UploadError("The upload is not finished.", status=409, offset=session.offset)
+
+    try:
+        staged = open(staging_path(session), 'rb')
+    except FileNotFoundError:
+        restart(session)
+        raise UploadError("The received bytes were lost; upload the file again.", status=409, offset=0)
+    with staged:
+        try:
+            fcntl.flock(staged, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("The upload is being completed.", status=409, offset=session.offset)
+        session.refresh_from_db(fields=['status', 'result'])
+        if session.status == 'Completed':
+            return session.result
+
+        if file_sha256(staged) != session.sha256:
+            restart(session)
+            raise UploadError("The file does not match its SHA-256; upload it again.", offset=0)
+        try:
+            with Image.open(staged) as image:
+                image.verify()
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            raise UploadError("The file is not a supported image.")
+        staged.seek(0)
+
+        with transaction.atomic():
+            session.result = TARGETS[session.purpose](session.user, File(staged, name=session.filename))
+            session.status = 'Completed'
+            session.save(update_fields=['result', 'status', 'updated_at'])
+        remove_staging_file(session)
+    return session.result
+
+
+def purge_stale(now=None):
+    """Delete sessions untouched for the TTL with their staging files; return how many."""
+    hours = getattr(settings, 'UPLOAD_SESSION_TTL_HOURS', DEFAULT_TTL_HOURS)
+    cutoff = (now or timezone.now()) - timedelta(hours=hours)
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in stale:
+        remove_staging_file(session)
+    UploadSession.objects.filter(pk__in=[session.pk for session in stale]).delete()
+    return len(stale)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import UserListView,WalletView,WalletTopUpView,WalletTopUpConfirmView, UserRegisterView, UserProfileView, LogoutView, AddressListView, AddressUpdateView, ReferralView, ConvertPointsView, LoginView
+from .views import UserListView,WalletView,WalletTopUpView,WalletTopUpConfirmView, UserRegisterView, UserProfileView, LogoutView, AddressListView, AddressUpdateView, ReferralView, ConvertPointsView, LoginView, UploadSessionCreateView, UploadSessionView, UploadSessionCompleteView
 
 urlpatterns = [
     path('register/', UserRegisterView.as_view(), name='user-register'),
@@ -14,4 +14,7 @@ urlpatterns = [
     path('wallet/', WalletView.as_view(), name='wallet'),
     path('wallet/topup/', WalletTopUpView.as_view(), name='wallet-topup'),
     path('wallet/topup/confirm/', WalletTopUpConfirmView.as_view(), name='wallet-topup-confirm'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadSessionView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:pk>/complete/', UploadSessionCompleteView.as_view(), name='upload-complete'),
 ]
@@ -1,8 +1,11 @@
 from rest_framework import generics, permissions, views, status,serializers
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from .models import User, Address, Referral,WalletTransaction
-from .serializers import UserSerializer, AddressSerializer, ReferralSerializer,WalletTransactionSerializer
+from django.shortcuts import get_object_or_404
+from .models import User, Address, Referral,WalletTransaction, UploadSession
+from .serializers import UserSerializer, AddressSerializer, ReferralSerializer,WalletTransactionSerializer, UploadSessionSerializer
+from . import uploads
+from .pagination import WalletTransactionCursorPagination
 from settings.models import Conversions
 from rest_framework.views import APIView
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
@@ -166,14 +169,17 @@ class WalletView(APIView):
 
     def get(self, request):
         user = request.user
-        transactions = WalletTransaction.objects.filter(user=user).order_by('-timestamp')
-        serializer = WalletTransactionSerializer(transactions, many=True)
+        transactions = WalletTransaction.objects.filter(user=user).order_by('-timestamp', '-id')
+        paginator = WalletTransactionCursorPagination()
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        serializer = WalletTransactionSerializer(page, many=True)
         return Response({
             "wallet_balance": user.wallet_balance,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
             "transactions": serializer.data
         })
-import razorpay
-from django.conf import settings
+from orders import gateway
 
 class WalletTopUpView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -184,12 +190,12 @@ class WalletTopUpView(APIView):
         if not amount or float(amount) <= 0:
             return Response({"error": "Invalid amount"}, status=status.HTTP_400_BAD_REQUEST)
 
-        client = razorpay.Client(auth=(settings.RAZORPAY_API_KEY, settings.RAZORPAY_API_SECRET))
-        razorpay_order = client.order.create({
-            "amount": int(float(amount) * 100),  # Amount in paise
-            "currency": "INR",
-            "payment_capture": 1
-        })
+        try:
+            razorpay_order = gateway.create_order(amount)
+        except gateway.GatewayRejected as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except gateway.GatewayUnavailable:
+            return Response({"error": "Payment gateway unavailable"}, status=status.HTTP_502_BAD_GATEWAY)
 
         return Response({
             "order_id": razorpay_order["id"],
@@ -218,3 +224,71 @@ class WalletTopUpConfirmView(APIView):
         )
 
         return Response({"message": "Wallet balance updated successfully", "wallet_balance": user.wallet_balance})
+
+
+# --- Chunked uploads (see users/uploads.py) ---
+def upload_response(session, status_code=status.HTTP_200_OK):
+    response = Response(UploadSessionSerializer(session).data, status=status_code)
+    response['Upload-Offset'] = str(session.offset)
+    return response
+
+
+def upload_error_response(error):
+    if error.offset is None:
+        return Response({"detail": str(error)}, status=error.status)
+    response = Response({"detail": str(error), "offset": error.offset}, status=error.status)
+    response['Upload-Offset'] = str(error.offset)
+    return response
+
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """Open an upload: purpose (prescription or profile_photo), filename, size and sha256."""
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(user=request.user)
+        return upload_response(session, status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    """
+    GET returns the upload with the offset to resume from. PUT appends the
+    request body, which must start at the offset given in Upload-Offset.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        return upload_response(get_object_or_404(UploadSession, pk=pk, user=request.user))
+
+    def put(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk, user=request.user)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({"detail": "An Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if length <= 0:
+            return Response({"detail": "The chunk is empty."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # The body is read from the stream block by block, never as a whole
+            uploads.append(session, offset, request.stream, length)
+        except uploads.UploadError as e:
+            return upload_error_response(e)
+        return upload_response(session)
+
+
+class UploadSessionCompleteView(APIView):
+    """Verify a fully received upload and attach it to its prescription or profile."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        session = get_object_or_404(UploadSession.objects.select_related('user'), pk=pk, user=request.user)
+        try:
+            uploads.complete(session)
+        except uploads.UploadError as e:
+            return upload_error_response(e)
+        return upload_response(session)
+